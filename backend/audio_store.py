@@ -0,0 +1,101 @@
+"""Serving and garbage collection for generated TTS audio.
+
+Synthesis writes ``<name>.part`` while chunks arrive and renames it to
+``<name>`` when complete. ``follow_audio`` lets a client start playback from a
+file that is still being written; ``sweep_audio_dir`` keeps AUDIO_DIR within
+a size and age budget.
+"""
+import os
+import re
+import time
+import asyncio
+
+AUDIO_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+\.mp3$")
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 64 * 1024
+
+
+def part_path(path: str) -> str:
+    return path + PART_SUFFIX
+
+
+async def follow_audio(path: str, poll_interval: float = 0.05, idle_timeout: float = 60):
+    """Yield bytes from ``<path>.part`` as they are written, ending once synthesis renames it to ``path``.
+
+    Stops early if the partial file disappears without a finished file (failed
+    synthesis) or stops growing for ``idle_timeout`` seconds.
+    """
+    try:
+        f = open(part_path(path), "rb")
+    except FileNotFoundError:
+        if os.path.exists(path):
+            f = open(path, "rb")
+        else:
+            return
+    with f:
+        idle_since = time.monotonic()
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if chunk:
+                idle_since = time.monotonic()
+                yield chunk
+                continue
+            if os.path.exists(path):
+                # Renamed into place: anything still unread is already on disk
+                rest = f.read()
+                if rest:
+                    yield rest
+                return
+            if not os.path.exists(part_path(path)) or time.monotonic() - idle_since > idle_timeout:
+                return
+            await asyncio.sleep(poll_interval)
+
+
+def sweep_audio_dir(audio_dir: str, max_bytes: int, max_age: float, stale_part_age: float = 3600) -> dict:
+    """Delete audio older than ``max_age``, then the oldest files until under ``max_bytes``.
+
+    Partial files are only removed once they have not been touched for
+    ``stale_part_age`` seconds, so in-flight synthesis is never disturbed.
+    """
+    now = time.time()
+    files = []
+    removed = 0
+    freed = 0
+    try:
+        names = os.listdir(audio_dir)
+    except FileNotFoundError:
+        return {"removed": 0, "freed_bytes": 0, "files": 0, "bytes": 0}
+    for name in names:
+        path = os.path.join(audio_dir, name)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if not os.path.isfile(path):
+            continue
+        age = now - st.st_mtime
+        in_progress = name.endswith(PART_SUFFIX) or name.endswith(".tmp")
+        expired = age > (stale_part_age if in_progress else max_age)
+        if expired:
+            try:
+                os.remove(path)
+                removed += 1
+                freed += st.st_size
+            except FileNotFoundError:
+                pass
+        elif not in_progress:
+            files.append((st.st_mtime, path, st.st_size))
+    total = sum(size for _, _, size in files)
+    remaining = len(files)
+    for _, path, size in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+            freed += size
+        except FileNotFoundError:
+            pass
+        total -= size
+        remaining -= 1
+    return {"removed": removed, "freed_bytes": freed, "files": remaining, "bytes": total}
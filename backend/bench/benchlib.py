@@ -0,0 +1,104 @@
+"""Shared helpers for the benchmark scripts: timing summaries, RSS sampling and output."""
+import os
+import sys
+import json
+import time
+import math
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_backend_imports():
+    """Make the backend modules importable from a script in bench/."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = (len(sorted_values) - 1) * q
+    low, high = math.floor(index), math.ceil(index)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (index - low)
+
+
+def summarize(latencies: list, elapsed: float = None) -> dict:
+    """p50/p95/p99/mean/max in milliseconds, plus throughput when ``elapsed`` is given."""
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3)
+    summary = {
+        "count": len(values),
+        "p50_ms": ms(percentile(values, 0.50)),
+        "p95_ms": ms(percentile(values, 0.95)),
+        "p99_ms": ms(percentile(values, 0.99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "max_ms": ms(values[-1]) if values else None,
+    }
+    if elapsed:
+        summary["per_second"] = round(len(values) / elapsed, 2)
+    return summary
+
+
+def time_calls(fn, iterations: int, warmup: int = 0) -> dict:
+    """Call ``fn(i)`` repeatedly and summarize per-call latency."""
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def rss_bytes(pid: int, include_children: bool = True) -> int:
+    """Resident set size of a process (and its descendants) from /proc; None where unavailable."""
+    total = 0
+    pending = [pid]
+    found = False
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        found = True
+                        break
+        except OSError:
+            continue
+        if include_children:
+            pending.extend(_children(current))
+    return total if found else None
+
+
+def self_rss_bytes() -> int:
+    return rss_bytes(os.getpid(), include_children=False)
+
+
+def mb(value) -> float:
+    return round(value / (1024 * 1024), 1) if value is not None else None
+
+
+def print_table(rows: list, columns: list):
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+
+
+def write_json(path: str, payload: dict):
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Results written to {path}")
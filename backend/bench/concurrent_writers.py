@@ -0,0 +1,163 @@
+"""Stress the shared stores with concurrent writer processes, then check nothing was lost.
+
+Every process does what one web worker does per request: adds scrolls, bumps
+seeker scroll counts, flushes token usage for a shared set of visitors,
+appends to the oracle log, and races the others to claim the same ingestion
+blobs. Afterwards every total must match exactly what was written.
+
+    python bench/concurrent_writers.py --processes 8 --iterations 500
+    python bench/concurrent_writers.py --app-url http://127.0.0.1:8000 --processes 16
+
+With --app-url it instead drives a running (multi-worker) app over HTTP with
+concurrent uploads and registrations and checks /scrolls/count afterwards.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from benchlib import use_backend_imports, print_table
+
+SEEKERS = 20
+VISITORS = 50
+BLOBS = 50
+TOKENS = 7
+
+
+def writer(index: int, args, data_dir: str, start, results):
+    os.environ["TEMPLE_DATA_DIR"] = data_dir
+    use_backend_imports()
+    import uuid
+    import datetime
+    from sqlalchemy.exc import OperationalError
+    import store
+    from oracle_log import OracleLogWriter
+
+    log = OracleLogWriter(os.path.join(data_dir, "oracle_log"))
+    log.start()
+    owner = f"bench-{index}"
+    today = str(datetime.date.today())
+    errors = 0
+    claimed = 0
+    start.wait()
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        try:
+            store.add_scroll({"scroll_id": str(uuid.uuid4()), "uploader_id": f"seeker-{i % SEEKERS}",
+                              "filename": f"w{index}-{i}.txt", "timestamp": str(datetime.datetime.now())})
+            store.increment_seeker_scroll_count(f"seeker-{i % SEEKERS}")
+            store.record_token_usage([{"kind": "visitor", "id": f"visitor-{(index + i) % VISITORS}", "date": today,
+                                       "tokens": TOKENS, "limit_state": "ok"}])
+            if i < BLOBS:
+                claimed += store.claim_blob(f"blob-{i}", owner)
+        except OperationalError as e:
+            errors += 1
+            print(f"writer {index}: {e}")
+        log.write({"writer": index, "i": i})
+    log.close()
+    results.put({"writer": index, "seconds": round(time.perf_counter() - started, 2), "errors": errors, "claimed": claimed})
+
+
+def run_processes(args):
+    data_dir = tempfile.mkdtemp(prefix="temple-writers-")
+    os.environ["TEMPLE_DATA_DIR"] = data_dir
+    use_backend_imports()
+    import datetime
+    import store
+    from database import SessionLocal
+    from sqlalchemy import select, func
+    from models import Scroll, Seeker, Visitor, ScrollBlob
+    from oracle_log import iter_log_entries
+
+    try:
+        store.init_store()
+        now = str(datetime.datetime.now())
+        store.upsert_seekers([{"seeker_id": f"seeker-{i}", "created_at": now, "scroll_count": 0, "donation_total": 0.0,
+                               "eligibility_flags": []} for i in range(SEEKERS)])
+        for i in range(BLOBS):
+            store.get_or_create_blob(f"blob-{i}", f"blobs/{i}", 0)
+
+        ctx = multiprocessing.get_context("spawn")
+        start, results = ctx.Event(), ctx.Queue()
+        processes = [ctx.Process(target=writer, args=(i, args, data_dir, start, results)) for i in range(args.processes)]
+        for p in processes:
+            p.start()
+        time.sleep(1)  # Let every process finish importing before the race starts
+        started = time.perf_counter()
+        start.set()
+        rows = sorted((results.get() for _ in processes), key=lambda r: r["writer"])
+        elapsed = time.perf_counter() - started
+        for p in processes:
+            p.join()
+
+        expected = args.processes * args.iterations
+        with SessionLocal() as session:
+            checks = {
+                "scroll rows": (session.scalar(select(func.count()).select_from(Scroll)), expected),
+                "scroll counter": (store.count_scrolls(), expected),
+                "seeker scroll_count": (session.scalar(select(func.sum(Seeker.scroll_count))), expected),
+                "visitor tokens": (session.scalar(select(func.sum(Visitor.token_used_total))), expected * TOKENS),
+                "claimed blobs": (sum(r["claimed"] for r in rows), min(BLOBS, args.iterations)),
+                "blobs with an owner": (session.scalar(select(func.count()).select_from(ScrollBlob)
+                                                       .where(ScrollBlob.owner.is_not(None))),
+                                        min(BLOBS, args.iterations)),
+            }
+        checks["log entries"] = (sum(1 for _ in iter_log_entries(os.path.join(data_dir, "oracle_log"))), expected)
+
+        print_table(rows, ["writer", "seconds", "errors", "claimed"])
+        print(f"\n{expected} iterations by {args.processes} processes in {elapsed:.2f}s "
+              f"({expected / elapsed:.0f}/s)\n")
+        return report(checks, sum(r["errors"] for r in rows))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def run_http(args):
+    import httpx
+    from concurrent.futures import ThreadPoolExecutor
+    base = args.app_url.rstrip("/")
+    before = httpx.get(f"{base}/scrolls/count").json()["count"]
+
+    def work(index):
+        ok = 0
+        with httpx.Client(base_url=base, timeout=120) as client:
+            for i in range(args.iterations):
+                content = f"writer {index} scroll {i} {time.time()}".encode()
+                r = client.post("/upload_scroll", files={"scroll": (f"w{index}-{i}.txt", content, "text/plain")})
+                client.post("/register", json={"display_name": f"w{index}-{i}"})
+                ok += r.status_code == 200
+        return ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.processes) as pool:
+        uploaded = sum(pool.map(work, range(args.processes)))
+    elapsed = time.perf_counter() - started
+    after = httpx.get(f"{base}/scrolls/count").json()["count"]
+    print(f"{uploaded} uploads in {elapsed:.2f}s ({uploaded / elapsed:.0f}/s)\n")
+    failed = args.processes * args.iterations - uploaded
+    return report({"scroll count delta": (after - before, uploaded)}, failed)
+
+
+def report(checks: dict, errors: int) -> int:
+    failed = errors > 0
+    for name, (actual, expected) in checks.items():
+        status = "ok" if actual == expected else "MISMATCH"
+        failed = failed or actual != expected
+        print(f"{name:<22} {actual!s:>10} expected {expected!s:>10}  {status}")
+    print(f"{'errors':<22} {errors:>10}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent writers against the shared stores")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--app-url", help="Drive a running app over HTTP instead of the store directly")
+    args = parser.parse_args()
+    return run_http(args) if args.app_url else run_processes(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
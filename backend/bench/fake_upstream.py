@@ -0,0 +1,151 @@
+"""Local stand-in for the xAI and OpenAI APIs.
+
+Serves OpenAI-shaped chat completions (plain and streamed) and text-to-speech
+with configurable latency and failure injection, so the governor, retries and
+circuit breaker can be exercised without spending tokens. Point the temple at
+it with:
+
+    python bench/fake_upstream.py --port 8099
+    XAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_BASE_URL=http://127.0.0.1:8099/v1 \\
+        XAI_API_KEY=fake OPENAI_API_KEY=fake uvicorn main:app
+
+Settings can be changed while it runs, e.g. to make the backend fail and then
+recover:
+
+    curl -X POST localhost:8099/_control -d '{"error_rate": 1}'
+    curl -X POST localhost:8099/_control -d '{"error_rate": 0}'
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import collections
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+settings = {
+    "latency": 0.2,  # Seconds before the first byte
+    "jitter": 0.05,  # Uniform extra latency, seconds
+    "token_delay": 0.01,  # Seconds between streamed chunks
+    "error_rate": 0.0,  # Fraction of requests that fail
+    "error_status": 503,
+    "retry_after": None,  # Retry-After header sent with failures
+    "answer": "The scrolls remember what the seeker has forgotten, and the temple keeps its silence.",
+    "audio_bytes": 48000,
+}
+counts = collections.Counter()
+
+app = FastAPI()
+
+
+async def delay():
+    await asyncio.sleep(settings["latency"] + random.uniform(0, settings["jitter"]))
+
+
+def injected_failure():
+    if random.random() >= settings["error_rate"]:
+        return None
+    headers = {"retry-after": str(settings["retry_after"])} if settings["retry_after"] is not None else {}
+    return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}},
+                        status_code=settings["error_status"], headers=headers)
+
+
+def completion(model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-fake-{counts['chat']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def chunk(model: str, content: str = None, finish: str = None) -> str:
+    delta = {"content": content} if content is not None else {}
+    return "data: " + json.dumps({
+        "id": f"chatcmpl-fake-{counts['chat']}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }) + "\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counts["chat"] += 1
+    model = body.get("model", "fake")
+    await delay()
+    failure = injected_failure()
+    if failure is not None:
+        counts["failed"] += 1
+        return failure
+    answer = settings["answer"]
+    if not body.get("stream"):
+        return completion(model, answer)
+
+    async def events():
+        for word in answer.split(" "):
+            yield chunk(model, word + " ")
+            await asyncio.sleep(settings["token_delay"])
+        yield chunk(model, finish="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request):
+    await request.json()
+    counts["speech"] += 1
+    await delay()
+    failure = injected_failure()
+    if failure is not None:
+        counts["failed"] += 1
+        return failure
+
+    async def audio():
+        remaining = settings["audio_bytes"]
+        while remaining > 0:
+            size = min(8192, remaining)
+            remaining -= size
+            yield b"\xff" * size
+            await asyncio.sleep(settings["token_delay"])
+
+    return StreamingResponse(audio(), media_type="audio/mpeg")
+
+
+@app.get("/_control")
+def get_control():
+    return {"settings": settings, "counts": counts}
+
+
+@app.post("/_control")
+async def set_control(request: Request):
+    updates = await request.json()
+    unknown = set(updates) - set(settings)
+    if unknown:
+        return JSONResponse({"error": f"Unknown settings: {sorted(unknown)}"}, status_code=400)
+    settings.update(updates)
+    return {"settings": settings}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    for name in ("latency", "jitter", "token_delay", "error_rate"):
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=settings[name])
+    parser.add_argument("--error-status", type=int, default=settings["error_status"])
+    args = parser.parse_args()
+    settings.update({name: getattr(args, name) for name in ("latency", "jitter", "token_delay", "error_rate", "error_status")})
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Load test the temple against a local fake upstream.
+
+Starts bench/fake_upstream.py and the app under uvicorn with a throwaway
+TEMPLE_DATA_DIR, then drives each scenario at each concurrency level and
+reports latency percentiles, throughput, error counts and the app's peak RSS
+(including worker processes).
+
+    python bench/load_test.py --concurrency 1,8,32 --requests 200
+    python bench/load_test.py --scenarios ask,scrolls --upstream-latency 0.5 --json results.json
+
+/whisper runs the real Whisper model in the app, so it needs whisper and
+ffmpeg installed; it is skipped unless named in --scenarios.
+"""
+import os
+import io
+import sys
+import math
+import time
+import wave
+import socket
+import struct
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import httpx
+from benchlib import BACKEND_DIR, summarize, rss_bytes, mb, print_table, write_json
+
+DEFAULT_SCENARIOS = ("register", "ask", "upload_scroll", "scrolls", "scroll_count")
+ALL_SCENARIOS = DEFAULT_SCENARIOS + ("whisper",)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def synthetic_wav(seconds: float = 2.0, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        frames = (int(8000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(int(seconds * rate)))
+        w.writeframes(b"".join(struct.pack("<h", f) for f in frames))
+    return buffer.getvalue()
+
+
+def synthetic_scroll(i: int, size: int) -> bytes:
+    line = f"Scroll {i}: the seeker asks and the temple answers in measured verse.\n".encode()
+    return (line * (size // len(line) + 1))[:size]
+
+
+class Scenario:
+    def __init__(self, name: str, args, audio: bytes):
+        self.name = name
+        self.args = args
+        self.audio = audio
+
+    async def request(self, client: httpx.AsyncClient, i: int) -> httpx.Response:
+        if self.name == "ask":
+            deity = ("Hathor", "Moses")[i % 2]
+            return await client.post("/ask", json={
+                "question": f"What does scroll {i % self.args.distinct_questions} teach?",
+                "deity": deity,
+                "visitor_id": f"bench-visitor-{i % 100}",
+            })
+        if self.name == "whisper":
+            return await client.post("/whisper", files={"file": ("bench.wav", self.audio, "audio/wav")},
+                                     data={"voice": "Moses", "visitor_id": f"bench-visitor-{i % 100}"})
+        if self.name == "upload_scroll":
+            content = synthetic_scroll(i if not self.args.duplicate_uploads else 0, self.args.scroll_bytes)
+            return await client.post("/upload_scroll", files={"scroll": (f"bench-{i}.txt", content, "text/plain")})
+        if self.name == "scrolls":
+            return await client.get("/scrolls")
+        if self.name == "scroll_count":
+            return await client.get("/scrolls/count")
+        if self.name == "register":
+            return await client.post("/register", json={"display_name": f"bench{i}"})
+        raise ValueError(f"Unknown scenario {self.name}")
+
+
+async def sample_rss(pid: int, stop: asyncio.Event, peak: list):
+    while not stop.is_set():
+        value = rss_bytes(pid)
+        if value is not None:
+            peak[0] = max(peak[0], value)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(base_url: str, scenario: Scenario, concurrency: int, total: int, app_pid: int) -> dict:
+    latencies = []
+    statuses = {}
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    peak = [(rss_bytes(app_pid) or 0) if app_pid else 0]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(app_pid, stop, peak)) if app_pid else None
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        async def worker():
+            for i in counter:
+                started = time.perf_counter()
+                try:
+                    response = await scenario.request(client, i)
+                    key = str(response.status_code)
+                except httpx.HTTPError as e:
+                    key = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    stop.set()
+    if sampler:
+        await sampler
+    ok = sum(n for code, n in statuses.items() if code.startswith("2"))
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        **summarize(latencies, elapsed),
+        "ok": ok,
+        "errors": total - ok,
+        "statuses": statuses,
+        "peak_rss_mb": mb(peak[0]) if app_pid else None,
+    }
+
+
+def start_process(cmd: list, env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready in {timeout}s")
+
+
+async def run(args, base_url: str, app_pid: int) -> list:
+    audio = synthetic_wav(args.audio_seconds)
+    results = []
+    for name in args.scenarios:
+        scenario = Scenario(name, args, audio)
+        for concurrency in args.concurrency:
+            total = args.requests if name != "whisper" else min(args.requests, args.whisper_requests)
+            result = await run_level(base_url, scenario, concurrency, total, app_pid)
+            results.append(result)
+            print(f"{name:<14} c={concurrency:<4} p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+                  f"p99={result['p99_ms']}ms {result['per_second']}/s errors={result['errors']} "
+                  f"rss={result['peak_rss_mb']}MB")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the temple against a fake upstream")
+    parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS),
+                        help=f"Comma-separated, from {', '.join(ALL_SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and level")
+    parser.add_argument("--whisper-requests", type=int, default=20)
+    parser.add_argument("--upstream-latency", type=float, default=0.2)
+    parser.add_argument("--upstream-jitter", type=float, default=0.05)
+    parser.add_argument("--distinct-questions", type=int, default=1_000_000,
+                        help="Lower this to exercise the answer cache")
+    parser.add_argument("--scroll-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--duplicate-uploads", action="store_true", help="Upload identical content every time")
+    parser.add_argument("--audio-seconds", type=float, default=2.0)
+    parser.add_argument("--app-url", help="Benchmark an already running app instead of starting one")
+    parser.add_argument("--app-pid", type=int, help="PID to sample RSS from when using --app-url")
+    parser.add_argument("--uvicorn-workers", type=int, default=1)
+    parser.add_argument("--retrieval", action="store_true", help="Leave scroll retrieval enabled")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c]
+    unknown = set(args.scenarios) - set(ALL_SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    processes = []
+    try:
+        if args.app_url:
+            base_url, app_pid = args.app_url.rstrip("/"), args.app_pid
+        else:
+            data_dir = tempfile.mkdtemp(prefix="temple-bench-")
+            upstream_port, app_port = free_port(), free_port()
+            upstream = start_process(
+                [sys.executable, os.path.join("bench", "fake_upstream.py"), "--port", str(upstream_port),
+                 "--latency", str(args.upstream_latency), "--jitter", str(args.upstream_jitter)],
+                dict(os.environ), os.path.join(data_dir, "upstream.log"))
+            processes.append(upstream)
+            wait_ready(f"http://127.0.0.1:{upstream_port}/_control", upstream)
+
+            upstream_url = f"http://127.0.0.1:{upstream_port}/v1"
+            env = {
+                **os.environ,
+                "TEMPLE_DATA_DIR": data_dir,
+                "XAI_BASE_URL": upstream_url,
+                "OPENAI_BASE_URL": upstream_url,
+                "XAI_API_KEY": "bench",
+                "OPENAI_API_KEY": "bench",
+                "VISITOR_DAILY_TOKEN_LIMIT": "0",
+                "SEEKER_DAILY_TOKEN_LIMIT": "0",
+            }
+            if not args.retrieval:
+                env["RETRIEVAL_ENABLED"] = "false"
+            app = start_process(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port),
+                 "--workers", str(args.uvicorn_workers), "--log-level", "warning"],
+                env, os.path.join(data_dir, "app.log"))
+            processes.append(app)
+            base_url, app_pid = f"http://127.0.0.1:{app_port}", app.pid
+            wait_ready(f"{base_url}/scrolls", app)
+            print(f"App on {base_url} (data in {data_dir}), fake upstream latency {args.upstream_latency}s")
+
+        results = asyncio.run(run(args, base_url, app_pid))
+        print()
+        print_table(results, ["scenario", "concurrency", "count", "p50_ms", "p95_ms", "p99_ms",
+                              "per_second", "errors", "peak_rss_mb"])
+        if args.json:
+            write_json(args.json, {"args": vars(args), "results": results})
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
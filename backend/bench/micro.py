@@ -0,0 +1,319 @@
+"""Microbenchmarks for the per-request hot paths, against large synthetic data.
+
+    python bench/micro.py                 # full sizes
+    python bench/micro.py --quick         # smaller data, for a fast sanity run
+    python bench/micro.py --only save_log,update_visitor --json micro.json
+
+save_log        OracleLogWriter.write latency with an already large log, and
+                end-to-end flush throughput.
+update_visitor  TokenBudget.charge (what update_visitor does per answer), its
+                batched flush, and a direct per-call store.record_visitor_tokens
+                for comparison, against a visitors table with many rows.
+extraction      extract_text_from_scroll on a large .txt, .docx and .pdf.
+router          ShadowRouter.observe per request (question alone and with
+                retrieved passages) and score_batch throughput.
+log_schema      Bytes and serialization CPU per oracle log entry: the
+                original pretty-printed JSON, full entries on one line, and
+                compact profile-referencing entries; plus expanding on read.
+log_export      export_log.py over a large log: full export, an incremental
+                run with nothing new, and filtered scans of the export.
+
+All data lives in a temporary TEMPLE_DATA_DIR that is removed afterwards.
+"""
+import os
+import sys
+import time
+import uuid
+import random
+import shutil
+import datetime
+import argparse
+import tempfile
+
+DATA_DIR = tempfile.mkdtemp(prefix="temple-micro-")
+os.environ["TEMPLE_DATA_DIR"] = DATA_DIR  # Must be set before the backend modules are imported
+
+from benchlib import use_backend_imports, summarize, time_calls, self_rss_bytes, mb, print_table, write_json
+
+use_backend_imports()
+
+BENCHMARKS = ("save_log", "update_visitor", "extraction", "router", "log_schema", "log_export")
+
+
+# Entries are logged as a deployment with LLaMA shadow routing on writes them
+LLAMA_ENABLED = True
+_shadow_router = None
+
+
+def sample_question(i: int) -> str:
+    return f"What does the temple teach about patience, question {i}?"
+
+
+def llama_observation(question: str, passages: list = None) -> dict:
+    global _shadow_router
+    if not LLAMA_ENABLED:
+        return None
+    if _shadow_router is None:
+        from router import ShadowRouter
+        _shadow_router = ShadowRouter()
+    return _shadow_router.observe(question, passages)
+
+
+def sample_entry(i: int, profile_id: str) -> dict:
+    """Built the way record_interaction builds its compact, profile-referencing entries."""
+    from log_schema import architect_observe_v3
+    deity = ("Hathor", "Moses")[i % 2]
+    session_id = str(uuid.UUID(int=i))
+    question = sample_question(i)
+    answer = "Patience is the silence in which the answer ripens. " * 8
+    return {
+        "log_profile": profile_id,
+        "timestamp": str(datetime.datetime.now()),
+        "session_id": session_id,
+        "seeker_id": None,
+        "visitor_id": f"visitor-{i % 5000}",
+        "question": question,
+        "oracle_used": deity,
+        "answer": answer,
+        "architect_observation": architect_observe_v3(deity, session_id),
+        "llama_observation": llama_observation(question),
+        "source_model": ("xAI", "OpenAI")[i % 2],
+        "personal_retrieval_score": None,
+        "global_retrieval_score": 0.61,
+        "estimated_tokens": (len(question) + len(answer)) // 4,
+        "usage_class": "anonymous",
+    }
+
+
+def log_writer(log_dir: str, max_pending: int):
+    from oracle_log import OracleLogWriter
+    from log_schema import log_profile
+    return OracleLogWriter(log_dir, max_pending=max_pending, profile=log_profile(LLAMA_ENABLED))
+
+
+def bench_save_log(args) -> list:
+    writer = log_writer(os.path.join(DATA_DIR, "oracle_log"), args.log_entries + args.iterations)
+    writer.start()
+    # Pre-existing history: the old JSON log got slower with every entry, segments should not
+    started = time.perf_counter()
+    for i in range(args.log_entries):
+        writer.write(sample_entry(i, writer.profile_id))
+    writer.flush()
+    prefill = time.perf_counter() - started
+
+    entries = [sample_entry(i, writer.profile_id) for i in range(args.iterations)]
+    rows = [{"benchmark": "save_log.write", **time_calls(lambda i: writer.write(entries[i]), args.iterations)}]
+    rows.append({"benchmark": "save_log.write+flush (prefill)", "count": args.log_entries,
+                 "per_second": round(args.log_entries / prefill, 2)})
+    writer.close()
+    return rows
+
+
+def bench_update_visitor(args) -> list:
+    import store
+    from budget import TokenBudget
+    store.init_store()
+    today = str(datetime.date.today())
+    now = str(datetime.datetime.now())
+    batch = []
+    for i in range(args.visitors):
+        batch.append({"visitor_id": f"visitor-{i}", "created_at": now, "last_seen": now, "last_seen_date": today,
+                      "token_used_total": 1000, "token_used_today": 100, "limit_state": "ok"})
+        if len(batch) == 5000:
+            store.upsert_visitors(batch)
+            batch = []
+    store.upsert_visitors(batch)
+
+    budget = TokenBudget({"visitor": 10_000_000, "seeker": 0}, store.get_tokens_today, store.record_token_usage)
+    ids = [f"visitor-{random.randrange(args.visitors)}" for _ in range(args.iterations)]
+    rows = [{"benchmark": "update_visitor.charge", **time_calls(lambda i: budget.charge("visitor", ids[i], 120), args.iterations)}]
+
+    flushes = []
+    for round_ in range(20):
+        for i in range(args.flush_batch):
+            budget.charge("visitor", ids[(round_ * args.flush_batch + i) % len(ids)], 120)
+        started = time.perf_counter()
+        budget.flush()
+        flushes.append(time.perf_counter() - started)
+    rows.append({"benchmark": f"update_visitor.flush ({args.flush_batch} charges)", **summarize(flushes)})
+
+    direct = min(args.iterations, 2000)
+    rows.append({"benchmark": "store.record_visitor_tokens (per call)",
+                 **time_calls(lambda i: store.record_visitor_tokens(ids[i], 120), direct)})
+    return rows
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 40):
+    """Minimal text PDF written by hand, so the benchmark needs no PDF authoring library."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        text = " T* ".join(f"(Page {p} line {n}: the seeker asks and the temple answers.) Tj" for n in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {len(objects)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def bench_extraction(args) -> list:
+    from extraction import extract_text_from_scroll
+    scrolls_dir = os.path.join(DATA_DIR, "scrolls")
+    os.makedirs(scrolls_dir)
+    line = "The seeker asks and the temple answers in measured verse, line after line.\n"
+
+    txt = os.path.join(scrolls_dir, "large.txt")
+    with open(txt, "w") as f:
+        f.write(line * (int(args.text_mb * 1024 * 1024) // len(line)))
+
+    docx_path = os.path.join(scrolls_dir, "large.docx")
+    from docx import Document
+    doc = Document()
+    for i in range(args.docx_paragraphs):
+        doc.add_paragraph(f"{i}: {line.strip()}")
+    doc.save(docx_path)
+
+    pdf = os.path.join(scrolls_dir, "large.pdf")
+    write_pdf(pdf, args.pdf_pages)
+
+    rows = []
+    for label, path in ((f"extraction.txt ({args.text_mb} MB)", txt),
+                        (f"extraction.docx ({args.docx_paragraphs} paragraphs)", docx_path),
+                        (f"extraction.pdf ({args.pdf_pages} pages)", pdf)):
+        rows.append({"benchmark": label, **time_calls(lambda i: extract_text_from_scroll(path), args.extract_repeats)})
+    return rows
+
+
+def bench_router(args) -> list:
+    from router import ShadowRouter
+    started = time.perf_counter()
+    router = ShadowRouter()
+    compile_ms = round((time.perf_counter() - started) * 1000, 3)
+    questions = [sample_question(i) + (" Is love a sin under the law?" if i % 3 == 0 else "")
+                 for i in range(args.iterations)]
+    passages = [{"text": "The righteous keep the commandments of God with joyful hearts. " * 20}] * 4
+
+    rows = [{"benchmark": "router.compile", "count": 1, "mean_ms": compile_ms}]
+    rows.append({"benchmark": "router.observe", **time_calls(lambda i: router.observe(questions[i]), args.iterations,
+                                                             warmup=100)})
+    rows.append({"benchmark": "router.observe (4 passages)",
+                 **time_calls(lambda i: router.observe(questions[i], passages), args.iterations, warmup=100)})
+    batch = questions * max(1, args.batch_texts // len(questions))
+    started = time.perf_counter()
+    router.suggest_batch(batch)
+    elapsed = time.perf_counter() - started
+    rows.append({"benchmark": "router.suggest_batch", "count": len(batch), "mean_ms": round(elapsed * 1000, 3),
+                 "per_second": round(len(batch) / elapsed, 2)})
+    return rows
+
+
+def bench_log_schema(args) -> list:
+    import json
+    import oracle_log
+    from log_schema import log_profile
+    log_dir = os.path.join(DATA_DIR, "schema_log")
+    profile_id = oracle_log.save_profile(log_dir, log_profile(LLAMA_ENABLED))
+    profiles = oracle_log.LogProfiles(log_dir)
+    compact = [sample_entry(i, profile_id) for i in range(args.iterations)]
+    full = [oracle_log.expand_entry(entry, profiles) for entry in compact]
+
+    variants = (
+        ("pretty JSON, full entry (original)", full,
+         lambda e: (json.dumps(e, indent=2, ensure_ascii=False, default=str) + ",\n").encode("utf-8")),
+        ("JSON line, full entry", full,
+         lambda e: (json.dumps(e, ensure_ascii=False, default=str) + "\n").encode("utf-8")),
+        ("orjson line, full entry", full, oracle_log._serialize),
+        ("orjson line, compact entry", compact, oracle_log._serialize),
+    )
+    rows = []
+    for label, entries, serialize in variants:
+        size = sum(len(serialize(e)) for e in entries) / len(entries)
+        rows.append({"benchmark": f"log_schema.{label}", "bytes": round(size),
+                     **time_calls(lambda i: serialize(entries[i]), args.iterations, warmup=100)})
+    lines = [oracle_log._serialize(e) for e in compact]
+    rows.append({"benchmark": "log_schema.read + expand compact",
+                 **time_calls(lambda i: oracle_log.expand_entry(oracle_log._loads(lines[i]), profiles),
+                              args.iterations, warmup=100)})
+    return rows
+
+
+def bench_log_export(args) -> list:
+    import export_log
+    log_dir = os.path.join(DATA_DIR, "export_source")
+    writer = log_writer(log_dir, args.log_entries)
+    for i in range(args.log_entries):
+        writer.write(sample_entry(i, writer.profile_id))
+    writer.close()
+
+    rows = []
+    out_dir = os.path.join(DATA_DIR, "export")
+    for label in ("full", "incremental (nothing new)"):
+        started = time.perf_counter()
+        result = export_log.export_log(out_dir, log_dir)
+        elapsed = time.perf_counter() - started
+        rows.append({"benchmark": f"log_export.export {label} ({result['format']})", "count": result["scanned"],
+                     "mean_ms": round(elapsed * 1000, 3),
+                     "per_second": round(result["scanned"] / elapsed, 2) if result["scanned"] else None})
+    for label, filters in (("all", None),
+                           ("oracle+visitor", export_log.Filters(oracle_used=["Moses"], visitor_id=["visitor-7"]))):
+        started = time.perf_counter()
+        count = sum(1 for _ in export_log.iter_export(out_dir, filters, ["timestamp", "oracle_used"]))
+        elapsed = time.perf_counter() - started
+        rows.append({"benchmark": f"log_export.scan {label}", "count": count, "mean_ms": round(elapsed * 1000, 3),
+                     "per_second": round(args.log_entries / elapsed, 2)})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the temple hot paths")
+    parser.add_argument("--only", help=f"Comma-separated subset of {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="Small data sizes for a fast run")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--log-entries", type=int, default=200000, help="Entries already in the log")
+    parser.add_argument("--visitors", type=int, default=100000, help="Rows already in the visitors table")
+    parser.add_argument("--flush-batch", type=int, default=500)
+    parser.add_argument("--text-mb", type=float, default=50)
+    parser.add_argument("--docx-paragraphs", type=int, default=20000)
+    parser.add_argument("--pdf-pages", type=int, default=300)
+    parser.add_argument("--extract-repeats", type=int, default=3)
+    parser.add_argument("--batch-texts", type=int, default=1_000_000, help="Questions scored by router.suggest_batch")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    if args.quick:
+        args.iterations, args.log_entries, args.visitors = 2000, 10000, 5000
+        args.text_mb, args.docx_paragraphs, args.pdf_pages, args.extract_repeats = 5, 2000, 30, 1
+        args.batch_texts = 100_000
+    selected = args.only.split(",") if args.only else BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    rows = []
+    try:
+        for name in BENCHMARKS:
+            if name in selected:
+                print(f"Running {name}...", flush=True)
+                rows.extend(globals()[f"bench_{name}"](args))
+        print()
+        print_table(rows, ["benchmark", "count", "bytes", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "per_second"])
+        print(f"\nPeak process RSS: {mb(self_rss_bytes())} MB")
+        if args.json:
+            write_json(args.json, {"args": vars(args), "results": rows})
+    finally:
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
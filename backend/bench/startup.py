@@ -0,0 +1,110 @@
+"""Startup cost of the app: import time, resident memory and which heavy packages load.
+
+Imports main in fresh interpreters (with ``-X importtime``) and a throwaway
+TEMPLE_DATA_DIR, and fails when a run crosses a threshold, so a regression
+shows up as a non-zero exit in CI:
+
+    python bench/startup.py                          # 5 runs, default thresholds
+    python bench/startup.py --max-import-ms 1000 --max-rss-mb 100 --json startup.json
+    python bench/startup.py --env LLAMA_ENABLED=true --allow numpy
+
+Heavy packages (torch, whisper, openai, the PDF/.docx readers, chromadb,
+NumPy, tiktoken) are imported by the features that use them, on first use;
+any of them present right after ``import main`` counts as a regression unless
+named in --allow.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+import statistics
+from benchlib import BACKEND_DIR, print_table, write_json
+
+HEAVY_MODULES = ("torch", "whisper", "openai", "PyPDF2", "docx", "chromadb", "numpy", "tiktoken", "onnxruntime")
+
+# Runs in the child: time the import, then report RSS and the heavy modules it pulled in
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+import main
+seconds = time.perf_counter() - started
+sys.path.insert(0, {bench_dir!r})
+from benchlib import self_rss_bytes
+print("STARTUP " + json.dumps({{"seconds": seconds, "rss": self_rss_bytes(),
+                               "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="temple-startup-")
+    try:
+        code = CHILD.format(bench_dir=os.path.dirname(os.path.abspath(__file__)), heavy=HEAVY_MODULES)
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR,
+                                env={**os.environ, **env, "TEMPLE_DATA_DIR": data_dir},
+                                capture_output=True, text=True, timeout=300)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    lines = [line for line in result.stdout.splitlines() if line.startswith("STARTUP ")]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+    return {**json.loads(lines[-1][len("STARTUP "):]), "importtime": parse_importtime(result.stderr)}
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Cumulative microseconds per module imported directly by main (-X importtime output)."""
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total_us, name = line.split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        # A module is listed after everything it imported, one level deeper
+        if level == 1:
+            children[name.strip()] = int(total_us)
+        elif level == 0:
+            if name.strip() == "main":
+                return children
+            children = {}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and memory of the app at startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500, help="Fail above this median import time")
+    parser.add_argument("--max-rss-mb", type=float, default=150, help="Fail above this median RSS after import")
+    parser.add_argument("--allow", action="append", default=[], help="Heavy module allowed at startup; repeatable")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the app; repeatable")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+    env = dict(item.split("=", 1) for item in args.env)
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    import_ms = statistics.median(r["seconds"] for r in runs) * 1000
+    rss_mb = statistics.median(r["rss"] for r in runs) / (1024 * 1024) if all(r["rss"] for r in runs) else None
+    heavy = sorted({m for r in runs for m in r["heavy"]} - set(args.allow))
+    slowest = sorted(runs[-1]["importtime"].items(), key=lambda item: -item[1])[:args.top]
+
+    print_table([{"module": name, "cumulative_ms": round(us / 1000, 1)} for name, us in slowest],
+                ["module", "cumulative_ms"])
+    checks = [
+        ("import main (median ms)", round(import_ms, 1), args.max_import_ms, import_ms <= args.max_import_ms),
+        ("RSS after import (median MB)", rss_mb and round(rss_mb, 1), args.max_rss_mb,
+         rss_mb is None or rss_mb <= args.max_rss_mb),
+        ("heavy modules loaded", ",".join(heavy) or "none", "none", not heavy),
+    ]
+    print()
+    print_table([{"check": name, "value": value, "limit": limit, "status": "ok" if ok else "REGRESSION"}
+                 for name, value, limit, ok in checks], ["check", "value", "limit", "status"])
+    if args.json:
+        write_json(args.json, {"args": vars(args), "import_ms": import_ms, "rss_mb": rss_mb, "heavy": heavy,
+                               "slowest": dict(slowest)})
+    return 0 if all(ok for *_, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
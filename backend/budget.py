@@ -0,0 +1,164 @@
+"""Daily token budgets for visitors and seekers.
+
+Usage is counted in memory per (kind, id) and flushed to the database in
+batches, so answering a question never waits on a ledger write. Each counter
+starts from the stored total for today the first time an id is seen and
+rolls over at midnight; a counter idle for ``idle_ttl`` is dropped once it
+is flushed and reloaded if the id comes back. ``check`` is called before any
+upstream model call; ``charge`` after an answer is produced.
+
+Counters are per process. Every flush writes this process's deltas and reads
+back the stored daily totals, so workers converge on the shared total within
+one flush interval.
+"""
+import time
+import datetime
+import threading
+
+# How long to count with the estimate after the tokenizer failed to load, before trying again
+ENCODING_RETRY_INTERVAL = 300
+
+_encoding = None
+_encoding_retry_at = 0.0
+_encoding_lock = threading.Lock()
+
+
+def load_encoding(name: str):
+    """Load the tokenizer, or return None if it is unavailable.
+
+    tiktoken fetches its BPE file on first use, so call this off the event loop
+    (the app does at startup). A failure is retried after ENCODING_RETRY_INTERVAL;
+    until then ``count_tokens`` estimates.
+    """
+    global _encoding, _encoding_retry_at
+    if _encoding is None and time.monotonic() >= _encoding_retry_at:
+        with _encoding_lock:
+            if _encoding is None and time.monotonic() >= _encoding_retry_at:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(name)
+                except Exception as e:
+                    print(f"Tokenizer {name} unavailable, estimating tokens for {ENCODING_RETRY_INTERVAL}s: {e}")
+                    _encoding_retry_at = time.monotonic() + ENCODING_RETRY_INTERVAL
+    return _encoding
+
+
+def count_tokens(text: str, encoding: str = "cl100k_base") -> int:
+    if not text:
+        return 0
+    enc = load_encoding(encoding)
+    if enc is None:
+        return len(text) // 4
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def seconds_until_midnight() -> int:
+    now = datetime.datetime.now()
+    tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return max(1, int((tomorrow - now).total_seconds()))
+
+
+class TokenBudget:
+    """In-memory daily token counters with batched persistence."""
+
+    def __init__(self, limits: dict, load, flush, idle_ttl: float = 600):
+        self.limits = limits  # kind ("visitor"/"seeker") -> daily limit, 0 for unlimited
+        self._load = load  # (kind, id, date) -> tokens already stored for that date
+        self._flush = flush  # (usages: list of dicts) -> {(kind, id): stored tokens today}
+        self.idle_ttl = idle_ttl  # Flushed counters unused this long are dropped and reloaded if seen again
+        self._lock = threading.Lock()
+        self._counters = {}  # (kind, id) -> {"date": str, "today": int, "seen": monotonic time}
+        self._pending = {}  # (kind, id, date) -> tokens not yet written
+        self.rejected = 0
+
+    def _counter(self, kind: str, subject_id: str) -> dict:
+        today = str(datetime.date.today())
+        key = (kind, subject_id)
+        with self._lock:
+            counter = self._counters.get(key)
+        if counter is None:
+            stored = self._load(kind, subject_id, today)
+            with self._lock:
+                counter = self._counters.setdefault(key, {"date": today, "today": stored})
+        with self._lock:
+            if counter["date"] != today:
+                counter.update(date=today, today=0)
+            counter["seen"] = time.monotonic()
+        return counter
+
+    def check(self, kind: str, subject_id: str, tokens: int = 0):
+        """Return (allowed, usage dict). ``tokens`` is the cost about to be incurred."""
+        limit = self.limits.get(kind) or 0
+        if not subject_id or not limit:
+            return True, None
+        counter = self._counter(kind, subject_id)
+        with self._lock:
+            used = counter["today"]
+            allowed = used < limit and used + tokens <= limit
+            if not allowed:
+                self.rejected += 1
+        return allowed, {"used_today": used, "daily_limit": limit, "remaining": max(0, limit - used)}
+
+    def charge(self, kind: str, subject_id: str, tokens: int):
+        if not subject_id or tokens <= 0:
+            return
+        counter = self._counter(kind, subject_id)
+        with self._lock:
+            counter["today"] += tokens
+            key = (kind, subject_id, counter["date"])
+            self._pending[key] = self._pending.get(key, 0) + tokens
+
+    def limit_state(self, kind: str, used: int) -> str:
+        limit = self.limits.get(kind) or 0
+        return "exceeded" if limit and used >= limit else "ok"
+
+    def flush(self) -> int:
+        """Persist pending usage in one batch. Returns the number of rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            usages = []
+            for (kind, sid, date), tokens in pending.items():
+                counter = self._counters.get((kind, sid), {})
+                used = counter.get("today", 0) if counter.get("date") == date else 0
+                usages.append({"kind": kind, "id": sid, "date": date, "tokens": tokens,
+                               "limit_state": self.limit_state(kind, used)})
+        if not usages:
+            self._evict()
+            return 0
+        try:
+            stored = self._flush(usages)
+        except Exception:
+            # Put the usage back so the next flush retries it
+            with self._lock:
+                for key, tokens in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + tokens
+            raise
+        today = str(datetime.date.today())
+        with self._lock:
+            for key, total in stored.items():
+                counter = self._counters.get(key)
+                if counter is not None and counter["date"] == today:
+                    # Picks up usage recorded by other workers since this counter was loaded
+                    unflushed = self._pending.get((*key, today), 0)
+                    counter["today"] = max(counter["today"], total + unflushed)
+        self._evict()
+        return len(usages)
+
+    def _evict(self):
+        """Forget counters from previous days, and idle ones with nothing left to flush, so the map stays small."""
+        today = str(datetime.date.today())
+        idle_before = time.monotonic() - self.idle_ttl
+        with self._lock:
+            unflushed = {(kind, sid) for kind, sid, _ in self._pending}
+            for key in [k for k, c in self._counters.items()
+                        if c["date"] != today or (c.get("seen", 0) < idle_before and k not in unflushed)]:
+                del self._counters[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limits": dict(self.limits),
+                "tracked": len(self._counters),
+                "pending_tokens": sum(self._pending.values()),
+                "rejected": self.rejected,
+            }
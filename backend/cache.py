@@ -0,0 +1,211 @@
+"""Caches in front of the paid upstream calls.
+
+``OracleCache`` keeps recent answers keyed on the normalized question, deity,
+system prompt version and retrieved scroll context, with LRU + TTL eviction
+and an optional semantic match for near-identical wording. ``TTSAudioCache``
+maps (model, voice, answer hash) to an mp3 already in AUDIO_DIR so repeated
+answers are voiced once.
+"""
+import os
+import re
+import time
+import hashlib
+import threading
+import collections
+from cachetools import TTLCache
+
+
+def normalize_question(question: str) -> str:
+    text = re.sub(r"\s+", " ", (question or "").strip().lower())
+    return text.rstrip(" ?!.")
+
+
+def _counters() -> dict:
+    return {"hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+
+
+def _hit_rate(counters: dict):
+    lookups = counters["hits"] + counters["misses"]
+    return round(counters["hits"] / lookups, 4) if lookups else None
+
+
+class OracleCache:
+    """LRU + TTL cache of oracle answers with optional semantic matching."""
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 86400, semantic_threshold: float = None, embed=None):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.semantic_threshold = semantic_threshold
+        self.embed = embed  # Callable[[list[str]], list[vector]] used for semantic matching
+        self._vectors = {}  # key -> (bucket, unit vector)
+        self.counters = _counters()
+
+    @staticmethod
+    def make_key(question: str, deity: str, prompt_version: str, context_key: str = "") -> str:
+        raw = "\x1f".join((normalize_question(question), deity, prompt_version, context_key))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, question: str = None, bucket: str = None):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self.counters["hits"] += 1
+                return value
+        if self.semantic_threshold and self.embed and question and bucket:
+            value = self._semantic_get(question, bucket)
+            if value is not None:
+                with self._lock:
+                    self.counters["hits"] += 1
+                    self.counters["semantic_hits"] += 1
+                return value
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def put(self, key: str, value, question: str = None, bucket: str = None):
+        vector = None
+        if self.semantic_threshold and self.embed and question and bucket:
+            vector = self._unit(self.embed([normalize_question(question)])[0])
+        with self._lock:
+            self._entries[key] = value
+            self.counters["stores"] += 1
+            if vector is not None:
+                self._vectors[key] = (bucket, vector)
+            # Drop vectors whose entries were evicted or expired
+            for stale in [k for k in self._vectors if k not in self._entries]:
+                del self._vectors[stale]
+
+    def record_bypass(self):
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def _semantic_get(self, question: str, bucket: str):
+        import numpy as np
+        with self._lock:
+            candidates = [(k, v) for k, (b, v) in self._vectors.items() if b == bucket and k in self._entries]
+        if not candidates:
+            return None
+        query = self._unit(self.embed([normalize_question(question)])[0])
+        scores = np.stack([v for _, v in candidates]) @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.semantic_threshold:
+            return None
+        with self._lock:
+            return self._entries.get(candidates[best][0])
+
+    @staticmethod
+    def _unit(vector):
+        import numpy as np
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "hit_rate": _hit_rate(self.counters),
+                "entries": len(self._entries),
+                "maxsize": self._entries.maxsize,
+                "ttl_seconds": self._entries.ttl,
+                "semantic": bool(self.semantic_threshold and self.embed),
+            }
+
+
+class TTSAudioCache:
+    """Reuses synthesized mp3 files in AUDIO_DIR, evicting by total size and age."""
+
+    PREFIX = "tts-"
+
+    def __init__(self, audio_dir: str, max_bytes: int = 512 * 1024 * 1024, ttl: float = 7 * 86400):
+        self.audio_dir = audio_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._files = collections.OrderedDict()  # filename -> size, least recently used first
+        self._bytes = 0
+        self.counters = _counters()
+        self._scan()
+
+    def _scan(self):
+        try:
+            names = [n for n in os.listdir(self.audio_dir) if n.startswith(self.PREFIX) and n.endswith(".mp3")]
+        except FileNotFoundError:
+            return
+        entries = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.audio_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._bytes += size
+
+    @classmethod
+    def filename(cls, model: str, voice: str, answer: str) -> str:
+        digest = hashlib.sha256(f"{model}\x1f{voice}\x1f{answer}".encode("utf-8")).hexdigest()[:32]
+        return f"{cls.PREFIX}{voice}-{digest}.mp3"
+
+    def get(self, name: str):
+        """Return the cached file name if it exists and is fresh, else None."""
+        path = os.path.join(self.audio_dir, name)
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self._forget(name)
+                self.counters["misses"] += 1
+                return None
+            if time.time() - st.st_mtime > self.ttl:
+                self._remove(name)
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            self._files[name] = st.st_size
+            self._files.move_to_end(name)
+            return name
+
+    def put(self, name: str):
+        """Register a freshly written file and evict until under the size budget."""
+        path = os.path.join(self.audio_dir, name)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._forget(name)
+            self._files[name] = size
+            self._bytes += size
+            self.counters["stores"] += 1
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                oldest = next(iter(self._files))
+                self._remove(oldest)
+
+    def record_bypass(self):
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def _forget(self, name: str):
+        size = self._files.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _remove(self, name: str):
+        self._forget(name)
+        try:
+            os.remove(os.path.join(self.audio_dir, name))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "hit_rate": _hit_rate(self.counters),
+                "files": len(self._files),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
@@ -1,2 +0,0 @@
-x
-
@@ -0,0 +1,126 @@
+"""Coordination between the worker processes of one deployment.
+
+Each worker (``uvicorn --workers N`` or gunicorn, see gunicorn.conf.py) imports
+the app itself and owns its own models, clients and pools. The stores are
+SQLite in WAL mode, the oracle log writes one segment per process and TTS
+claims its ``.part`` file with O_EXCL, so requests need no locks of their own.
+A store write can wait up to the busy timeout on another worker's, though, so
+handlers call the store through ``asyncio.to_thread`` rather than on the event
+loop (tests/test_concurrent_writers.py checks no update is lost). What remains
+is work that must happen once per deployment rather than once per worker:
+
+- one-time startup migrations run under ``startup_lock()``, one worker after
+  another, so the first does the work and the rest find nothing left to do;
+- housekeeping (requeueing interrupted ingestion, index sync, the audio
+  sweep) runs only in the worker holding the leader lock; if it exits, the
+  OS releases the lock and another worker takes over;
+- every worker holds a lock named after its WORKER_ID while it lives, so the
+  leader can tell a blob claimed by a live worker from one orphaned by a
+  crash.
+
+The locks are filelock locks under ``<TEMPLE_DATA_DIR>/locks``, so all workers
+must share one host (or a filesystem with working POSIX locks).
+"""
+import os
+import socket
+import asyncio
+from filelock import FileLock, Timeout
+from database import DATA_DIR
+
+LOCK_DIR = os.path.join(DATA_DIR, "locks")
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}"
+# Web worker processes sharing this host's CPUs; gunicorn.conf.py sets it for its workers
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+_worker_lock = None
+
+
+def _lock(name: str, timeout: float = -1) -> FileLock:
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    # Not thread-local: the leader lock is acquired in a worker thread and released on the event loop
+    return FileLock(os.path.join(LOCK_DIR, f"{name}.lock"), timeout=timeout, thread_local=False)
+
+
+def cpu_share() -> int:
+    """CPUs one worker should size its process pools for."""
+    return max(1, (os.cpu_count() or 1) // WEB_WORKERS)
+
+
+def startup_lock(timeout: float = 600) -> FileLock:
+    """Serializes one-time startup work across workers: ``with startup_lock(): ...``."""
+    return _lock("startup", timeout)
+
+
+def hold_worker_lock():
+    """Mark this worker alive for as long as the process runs."""
+    global _worker_lock
+    if _worker_lock is None:
+        _worker_lock = _lock(f"worker-{WORKER_ID}")
+        _worker_lock.acquire()
+
+
+def release_worker_lock():
+    global _worker_lock
+    if _worker_lock is not None:
+        _worker_lock.release()
+        _remove(_worker_lock.lock_file)
+        _worker_lock = None
+
+
+def worker_alive(worker_id: str) -> bool:
+    if worker_id == WORKER_ID:
+        return True
+    lock = _lock(f"worker-{worker_id}")
+    try:
+        lock.acquire(timeout=0)
+    except Timeout:
+        return True
+    # Nobody holds it: the worker is gone, and so is the need for its lock file
+    lock.release()
+    _remove(lock.lock_file)
+    return False
+
+
+def prune_worker_locks() -> int:
+    """Remove the lock files of workers that have exited. Returns how many were removed."""
+    try:
+        names = os.listdir(LOCK_DIR)
+    except FileNotFoundError:
+        return 0
+    dead = [n[len("worker-"):-len(".lock")] for n in names if n.startswith("worker-") and n.endswith(".lock")]
+    return sum(not worker_alive(worker_id) for worker_id in dead)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class LeaderElection:
+    """Holds the leader lock for one worker at a time and runs housekeeping there."""
+
+    def __init__(self, name: str = "leader", poll_interval: float = 5):
+        self._lock = _lock(name)
+        self.poll_interval = poll_interval
+        self.is_leader = False
+
+    async def run(self, on_elected):
+        """Wait to become leader, then await ``on_elected()`` for as long as this worker lives."""
+        while not self.is_leader:
+            try:
+                await asyncio.to_thread(self._lock.acquire, timeout=self.poll_interval)
+                self.is_leader = True
+            except Timeout:
+                continue
+        print(f"Worker {WORKER_ID} is the leader")
+        try:
+            await on_elected()
+        finally:
+            self.resign()
+
+    def resign(self):
+        if self.is_leader:
+            self.is_leader = False
+            self._lock.release()
@@ -0,0 +1,459 @@
+"""Export the oracle log to compact shards for analysis and training sets.
+
+    python export_log.py export exports/training                       # everything, incrementally
+    python export_log.py export exports/moses --oracle Moses --since 2026-01-01
+    python export_log.py scan exports/training --source-model xAI --columns question,answer
+    python export_log.py summary exports/training --since 2026-06-01
+
+``export`` reads the log segments in write order and writes shards of at
+most --shard-rows entries: Parquet when pyarrow is installed (or asked for),
+gzip-compressed NDJSON otherwise. Entries are streamed line by line, so memory
+stays bounded however large the log is. Filters on timestamp, oracle_used,
+source_model and visitor_id are pushed down as far as they go: segments that
+start after --until are never opened, lines that cannot match are dropped
+before they are parsed, and the manifest records per-shard value ranges so
+``scan`` skips whole shards (Parquet row groups as well).
+
+Each export directory keeps a manifest.json with its shards, its filters and
+a checkpoint of how far every segment has been read. Running ``export`` again
+only appends what was logged since; the checkpoint advances only after the
+shard holding those entries is safely renamed into place.
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import datetime
+from oracle_log import SEGMENT_PREFIX, PROFILE_KEY, LogProfiles, expand_entry, list_segments
+from database import DATA_DIR
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+LOG_DIR = os.path.join(DATA_DIR, "oracle_log")
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+SHARD_ROWS = 100_000
+ROW_GROUP_ROWS = 10_000
+MAX_VISITOR_SET = 256  # Shards with more distinct visitors record none and are always scanned
+# Entries wait in the writer's queue before the segment they land in is opened
+SEGMENT_OPEN_SLACK = datetime.timedelta(hours=1)
+
+# Typed columns for Parquet; nested observations are stored as JSON text
+COLUMNS = {
+    "timestamp": "string",
+    "session_id": "string",
+    "seeker_id": "string",
+    "visitor_id": "string",
+    "question": "string",
+    "oracle_used": "string",
+    "answer": "string",
+    "architect_observation": "json",
+    "llama_observation": "json",
+    "source_model": "string",
+    "phase": "string",
+    "corpus_intent": "string",
+    "personal_retrieval_score": "float",
+    "global_retrieval_score": "float",
+    "shadow_delta": "json",
+    "influence_state": "string",
+    "estimated_tokens": "int",
+    "usage_class": "string",
+}
+EXTRA_COLUMN = "extra"  # Any other keys, as JSON text
+
+
+def _have_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class Filters:
+    """Row predicates, plus the cheaper checks that let whole lines, segments and shards be skipped."""
+
+    KEYS = ("oracle_used", "source_model", "visitor_id")
+
+    def __init__(self, since: str = None, until: str = None, oracle_used=(), source_model=(), visitor_id=()):
+        self.since = since  # Inclusive; timestamps compare as strings, so a date prefix works
+        self.until = until  # Exclusive
+        self.values = {"oracle_used": set(oracle_used or ()), "source_model": set(source_model or ()),
+                       "visitor_id": set(visitor_id or ())}
+        # A matching line must contain one of these JSON-encoded values
+        self._needles = [[_dumps(v).encode("utf-8") for v in values] for values in self.values.values() if values]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Filters":
+        return cls(data.get("since"), data.get("until"),
+                   **{key: data.get(key) or () for key in cls.KEYS})
+
+    def to_dict(self) -> dict:
+        return {"since": self.since, "until": self.until, **{k: sorted(v) for k, v in self.values.items()}}
+
+    def __bool__(self):
+        return bool(self.since or self.until or self._needles)
+
+    def may_match_line(self, line: bytes) -> bool:
+        return all(any(needle in line for needle in needles) for needles in self._needles)
+
+    def matches(self, entry: dict) -> bool:
+        timestamp = entry.get("timestamp") or ""
+        if self.since and timestamp < self.since:
+            return False
+        if self.until and timestamp >= self.until:
+            return False
+        return all(entry.get(key) in values for key, values in self.values.items() if values)
+
+    def may_match_segment(self, name: str) -> bool:
+        """Segments are named after the moment they were opened: one opened well after --until has nothing older."""
+        if not self.until:
+            return True
+        start = _segment_start(name)
+        return start is None or str(start - SEGMENT_OPEN_SLACK) < self.until
+
+    def may_match_shard(self, shard: dict) -> bool:
+        if self.since and shard["max_timestamp"] is not None and shard["max_timestamp"] < self.since:
+            return False
+        if self.until and shard["min_timestamp"] is not None and shard["min_timestamp"] >= self.until:
+            return False
+        for key, values in self.values.items():
+            seen = shard.get(key)
+            if values and seen is not None and not values.intersection(seen):
+                return False
+        return True
+
+    def arrow_expression(self):
+        import pyarrow.dataset as ds
+        expression = None
+        clauses = []
+        if self.since:
+            clauses.append(ds.field("timestamp") >= self.since)
+        if self.until:
+            clauses.append(ds.field("timestamp") < self.until)
+        clauses += [ds.field(key).isin(sorted(values)) for key, values in self.values.items() if values]
+        for clause in clauses:
+            expression = clause if expression is None else expression & clause
+        return expression
+
+
+def _segment_start(name: str):
+    """'oracle-20260101T120000123456-42.jsonl' -> datetime(2026, 1, 1, 12, 0, 0, 123456)."""
+    stamp = name[len(SEGMENT_PREFIX):].split("-", 1)[0]
+    try:
+        return datetime.datetime.strptime(stamp, "%Y%m%dT%H%M%S%f")
+    except ValueError:
+        return None  # The legacy segment, or a name we did not write
+
+
+class _ShardStats:
+    def __init__(self):
+        self.rows = 0
+        self.min_timestamp = None
+        self.max_timestamp = None
+        self.seen = {key: set() for key in Filters.KEYS}
+
+    def add(self, entry: dict):
+        self.rows += 1
+        timestamp = entry.get("timestamp")
+        if timestamp is not None:
+            timestamp = str(timestamp)
+            if self.min_timestamp is None or timestamp < self.min_timestamp:
+                self.min_timestamp = timestamp
+            if self.max_timestamp is None or timestamp > self.max_timestamp:
+                self.max_timestamp = timestamp
+        for key, seen in self.seen.items():
+            if seen is not None:
+                seen.add(entry.get(key))
+                if key == "visitor_id" and len(seen) > MAX_VISITOR_SET:
+                    self.seen[key] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "min_timestamp": self.min_timestamp,
+            "max_timestamp": self.max_timestamp,
+            **{key: sorted(seen, key=str) if seen is not None else None for key, seen in self.seen.items()},
+        }
+
+
+class _NdjsonShard:
+    suffix = ".ndjson.gz"
+
+    def __init__(self, path: str):
+        self._file = gzip.open(path, "wb", compresslevel=6)
+
+    def write(self, entry: dict, line: bytes):
+        self._file.write(line)  # The logged line as is, unless export_log had to expand it
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetShard:
+    suffix = ".parquet"
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        types = {"string": pa.string(), "json": pa.string(), "float": pa.float64(), "int": pa.int64()}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS.items()] + [(EXTRA_COLUMN, pa.string())])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+        self._columns = {name: [] for name in self._schema.names}
+
+    def write(self, entry: dict, line: bytes):
+        extra = {k: v for k, v in entry.items() if k not in COLUMNS}
+        for name, kind in COLUMNS.items():
+            self._columns[name].append(_to_column(entry.get(name), kind))
+        self._columns[EXTRA_COLUMN].append(_dumps(extra) if extra else None)
+        if len(self._columns[EXTRA_COLUMN]) >= ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if self._columns[EXTRA_COLUMN]:
+            self._writer.write_table(self._pa.table(self._columns, schema=self._schema))
+            self._columns = {name: [] for name in self._schema.names}
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def _to_column(value, kind: str):
+    if value is None:
+        return None
+    if kind == "json":
+        return _dumps(value)
+    try:
+        if kind == "float":
+            return float(value)
+        if kind == "int":
+            return int(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def _from_parquet_row(row: dict) -> dict:
+    """Undo the Parquet column mapping, giving back the entry as it was logged."""
+    extra = row.pop(EXTRA_COLUMN, None)
+    for name, kind in COLUMNS.items():
+        if kind == "json" and row.get(name) is not None:
+            row[name] = json.loads(row[name])
+    if extra:
+        row.update(json.loads(extra))
+    return row
+
+
+def load_manifest(out_dir: str):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_manifest(out_dir: str, manifest: dict):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def export_log(out_dir: str, log_dir: str = LOG_DIR, fmt: str = "auto", filters: Filters = None,
+               shard_rows: int = SHARD_ROWS) -> dict:
+    """Append everything logged since the last checkpoint to ``out_dir``. Returns a summary."""
+    filters = filters or Filters()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    created = manifest is None
+    if created:
+        if fmt == "auto":
+            fmt = "parquet" if _have_pyarrow() else "ndjson"
+        manifest = {"version": MANIFEST_VERSION, "format": fmt, "filters": filters.to_dict(),
+                    "checkpoint": {}, "shards": []}
+    else:
+        if fmt not in ("auto", manifest["format"]):
+            raise ValueError(f"{out_dir} holds a {manifest['format']} export; cannot continue it as {fmt}")
+        if filters.to_dict() != manifest["filters"]:
+            raise ValueError(f"{out_dir} was exported with filters {manifest['filters']}; use the same filters "
+                             "or a new directory")
+        fmt = manifest["format"]
+    if fmt == "parquet" and not _have_pyarrow():
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow), or use --format ndjson")
+    shard_class = _ParquetShard if fmt == "parquet" else _NdjsonShard
+    # Leftovers of an interrupted run were never recorded in the manifest
+    for name in os.listdir(out_dir):
+        if name.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, name))
+
+    positions = dict(manifest["checkpoint"])
+    profiles = LogProfiles(log_dir)
+    started = time.perf_counter()
+    scanned = exported = 0
+    shard = stats = shard_path = None
+
+    def close_shard():
+        nonlocal shard, stats
+        shard.close()
+        final = shard_path[:-len(".tmp")]
+        os.replace(shard_path, final)
+        manifest["shards"].append({"file": os.path.basename(final), **stats.to_dict()})
+        manifest["checkpoint"] = dict(positions)
+        _save_manifest(out_dir, manifest)
+        shard = stats = None
+
+    for path in list_segments(log_dir):
+        name = os.path.basename(path)
+        if not filters.may_match_segment(name):
+            continue
+        offset = positions.get(name, 0)
+        if offset >= os.path.getsize(path):
+            continue
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Still being written; the next run picks it up whole
+                offset += len(line)
+                positions[name] = offset
+                if not line.strip():
+                    continue
+                scanned += 1
+                if not filters.may_match_line(line):
+                    continue
+                try:
+                    entry = _loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(entry, dict) or not filters.matches(entry):
+                    continue
+                if PROFILE_KEY in entry:
+                    # Shards hold full entries, so they read the same whatever profiles the log used
+                    entry = expand_entry(entry, profiles)
+                    line = (_dumps(entry) + "\n").encode("utf-8")
+                if shard is None:
+                    shard_path = os.path.join(out_dir, f"part-{len(manifest['shards']):06d}{shard_class.suffix}.tmp")
+                    shard, stats = shard_class(shard_path), _ShardStats()
+                shard.write(entry, line)
+                stats.add(entry)
+                exported += 1
+                if stats.rows >= shard_rows:
+                    close_shard()
+
+    if shard is not None:
+        close_shard()
+    elif created or positions != manifest["checkpoint"]:
+        # Nothing matched, but the lines read need not be read again
+        manifest["checkpoint"] = positions
+        _save_manifest(out_dir, manifest)
+    return {"format": fmt, "scanned": scanned, "exported": exported, "shards": len(manifest["shards"]),
+            "seconds": round(time.perf_counter() - started, 2)}
+
+
+def iter_export(out_dir: str, filters: Filters = None, columns: list = None):
+    """Yield exported entries matching ``filters``, reading only the shards that can match."""
+    filters = filters or Filters()
+    manifest = load_manifest(out_dir)
+    if manifest is None:
+        raise ValueError(f"No export in {out_dir}")
+    for shard in manifest["shards"]:
+        if not filters.may_match_shard(shard):
+            continue
+        path = os.path.join(out_dir, shard["file"])
+        if manifest["format"] == "parquet":
+            yield from _iter_parquet(path, filters, columns)
+            continue
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                if not filters.may_match_line(line):
+                    continue
+                entry = _loads(line)
+                if filters.matches(entry):
+                    yield {c: entry.get(c) for c in columns} if columns else entry
+
+
+def _iter_parquet(path: str, filters: Filters, columns: list = None):
+    import pyarrow.dataset as ds
+    # Only the requested columns are read, unless one of them can only be in the extra JSON
+    wanted = columns if columns and all(c in COLUMNS for c in columns) else None
+    for batch in ds.dataset(path, format="parquet").to_batches(columns=wanted, filter=filters.arrow_expression()):
+        for row in batch.to_pylist():
+            entry = _from_parquet_row(row)
+            yield {c: entry.get(c) for c in columns} if columns else entry
+
+
+def summarize_export(out_dir: str, filters: Filters = None) -> dict:
+    """Entry counts per oracle, source model, usage class and day, plus metered tokens."""
+    totals = {"entries": 0, "estimated_tokens": 0, "by_oracle": {}, "by_source_model": {}, "by_usage_class": {},
+              "by_day": {}}
+    columns = ["timestamp", "oracle_used", "source_model", "usage_class", "estimated_tokens"]
+    for entry in iter_export(out_dir, filters, columns):
+        totals["entries"] += 1
+        totals["estimated_tokens"] += entry["estimated_tokens"] or 0
+        for key, value in (("by_oracle", entry["oracle_used"]), ("by_source_model", entry["source_model"]),
+                           ("by_usage_class", entry["usage_class"]), ("by_day", str(entry["timestamp"] or "")[:10])):
+            totals[key][value] = totals[key].get(value, 0) + 1
+    return totals
+
+
+def _filters_from_args(args) -> Filters:
+    return Filters(args.since, args.until, args.oracle, args.source_model, args.visitor)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export and analyze the oracle log")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("export", "Append new log entries to an export directory"),
+                            ("scan", "Print matching exported entries as JSON lines"),
+                            ("summary", "Aggregate counts over matching exported entries")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("out_dir")
+        command.add_argument("--since", help="Inclusive, e.g. 2026-01-01 or '2026-01-01 12:00'")
+        command.add_argument("--until", help="Exclusive")
+        command.add_argument("--oracle", action="append", help="oracle_used; repeatable")
+        command.add_argument("--source-model", action="append", help="Repeatable")
+        command.add_argument("--visitor", action="append", help="visitor_id; repeatable")
+        if name == "export":
+            command.add_argument("--log-dir", default=LOG_DIR)
+            command.add_argument("--format", choices=("auto", "parquet", "ndjson"), default="auto")
+            command.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+        if name == "scan":
+            command.add_argument("--columns", help="Comma-separated fields to print")
+            command.add_argument("--count", action="store_true", help="Only print the number of matches")
+    args = parser.parse_args(argv)
+    filters = _filters_from_args(args)
+
+    try:
+        if args.command == "export":
+            result = export_log(args.out_dir, args.log_dir, args.format, filters, args.shard_rows)
+            print(f"Exported {result['exported']} of {result['scanned']} new entries in {result['seconds']}s "
+                  f"({result['format']}, {result['shards']} shards total)")
+        elif args.command == "scan":
+            columns = args.columns.split(",") if args.columns else None
+            if args.count:
+                print(sum(1 for _ in iter_export(args.out_dir, filters, columns or ["timestamp"])))
+            else:
+                for entry in iter_export(args.out_dir, filters, columns):
+                    sys.stdout.write(_dumps(entry) + "\n")
+        else:
+            print(json.dumps(summarize_export(args.out_dir, filters), indent=2, ensure_ascii=False))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
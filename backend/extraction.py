@@ -0,0 +1,51 @@
+"""Text extraction for uploaded scrolls.
+
+Kept free of app state so the functions can run inside worker processes.
+PDFs can be read in page ranges, which lets the ingestion pipeline spread a
+large document across several workers. The PDF and .docx readers are imported
+on first use, in the pool processes that need them rather than in the app.
+"""
+import os
+
+TEXT_EXTENSIONS = (".txt", ".md", ".rtf")
+
+
+def count_units(file_path: str) -> int:
+    """Number of independently extractable units: pages for PDFs, 1 for everything else."""
+    if os.path.splitext(file_path)[1].lower() == ".pdf":
+        from PyPDF2 import PdfReader
+        return len(PdfReader(file_path).pages)
+    return 1
+
+
+def extract_range(file_path: str, start: int, end: int) -> str:
+    """Extract units [start, end) of a scroll. Non-PDF files only have unit 0."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        from PyPDF2 import PdfReader
+        reader = PdfReader(file_path)
+        return "".join(reader.pages[i].extract_text() or "" for i in range(start, min(end, len(reader.pages))))
+    if start > 0:
+        return ""
+    if ext == ".docx":
+        from docx import Document
+        doc = Document(file_path)
+        return "".join(para.text + "\n" for para in doc.paragraphs)
+    if ext in TEXT_EXTENSIONS:
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
+    return ""
+
+
+def extract_document(file_path: str):
+    """(units, text) for a whole scroll in one call; errors propagate."""
+    units = count_units(file_path)
+    return units, extract_range(file_path, 0, units).strip()
+
+
+def extract_text_from_scroll(file_path):
+    try:
+        return extract_range(file_path, 0, count_units(file_path)).strip()
+    except Exception as e:
+        print(f"Failed to extract text: {e}")
+        return ""
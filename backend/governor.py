@@ -0,0 +1,302 @@
+"""Per-backend governor for upstream oracle calls.
+
+Each backend gets a bounded number of in-flight calls, a bounded wait queue
+that rejects immediately when full, jittered retries on 429/5xx/transport
+errors, and a circuit breaker that stops calling a backend after repeated
+failures and lets a single probe through once ``reset_timeout`` has passed.
+Every call also has an overall ``deadline``: timeouts are not retried by
+default, and a Retry-After the deadline cannot wait out fails the call at
+once. When an upstream slows down, requests fail fast instead of piling up
+behind it.
+"""
+import sys
+import time
+import random
+import asyncio
+import httpx
+from metrics import UPSTREAM_RETRIES, UPSTREAM_REJECTIONS, CIRCUIT_STATE
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamError(Exception):
+    """An upstream answered with an error status."""
+
+    def __init__(self, message: str, status_code: int = None, retry_after: float = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling the backend: its queue is full or its circuit is open."""
+
+    def __init__(self, backend: str, reason: str, retry_after: float = 1):
+        super().__init__(f"{backend} is unavailable ({reason.replace('_', ' ')}), please try again shortly")
+        self.backend = backend
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    if isinstance(exc, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    # Only consult openai if it is already loaded; it raised the error if it is the client in use
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(exc, openai.APIConnectionError)
+
+
+def is_timeout(exc: BaseException) -> bool:
+    if isinstance(exc, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return True
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(exc, openai.APITimeoutError)
+
+
+def retry_after_hint(exc: BaseException) -> float:
+    hint = getattr(exc, "retry_after", None)
+    if hint is not None:
+        return hint
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    return parse_retry_after(headers.get("retry-after")) if headers is not None else None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def allow(self):
+        """Return (allowed, probe). ``probe`` is True for the single call let through
+        while half-open; only that caller may end the probe with ``release_probe``.
+        """
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                return False, False
+            self._probing = True
+            return True, True
+        return self.state != OPEN, False
+
+    def retry_in(self) -> float:
+        if self.state != OPEN:
+            return 1
+        return max(1, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """The probe call has finished, with or without a verdict."""
+        self._probing = False
+
+
+class UpstreamGovernor:
+    """Concurrency limit, wait queue, retries and circuit breaker for one backend."""
+
+    def __init__(self, name: str, max_concurrency: int = 16, max_queue: int = 64, queue_timeout: float = 10,
+                 max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8,
+                 failure_threshold: int = 5, reset_timeout: float = 30, deadline: float = 60,
+                 retry_timeouts: bool = False):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline  # Seconds for a whole call: queueing, attempts and backoff
+        self.retry_timeouts = retry_timeouts  # A hung upstream usually hangs again
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self.counters = {"calls": 0, "succeeded": 0, "failed": 0, "retries": 0, "rejected": 0}
+        CIRCUIT_STATE.labels(name).set(0)
+
+    def check(self):
+        """Raise UpstreamUnavailable if a call would be refused right now, without taking a slot."""
+        if self.breaker.state == OPEN and time.monotonic() - self.breaker.opened_at < self.breaker.reset_timeout:
+            self._reject("circuit_open", self.breaker.retry_in())
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._reject("queue_full")
+
+    def _reject(self, reason: str, retry_after: float = 1):
+        self.counters["rejected"] += 1
+        UPSTREAM_REJECTIONS.labels(self.name, reason).inc()
+        raise UpstreamUnavailable(self.name, reason, retry_after)
+
+    async def _acquire(self) -> bool:
+        """Take a slot, waiting in the queue if needed. Returns whether this call is the probe."""
+        self.check()
+        allowed, probe = self.breaker.allow()
+        if not allowed:
+            self._reject("circuit_open", self.breaker.retry_in())
+        try:
+            if self._semaphore.locked():
+                self._waiting += 1
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self._reject("queue_timeout")
+                finally:
+                    self._waiting -= 1
+            else:
+                await self._semaphore.acquire()  # A slot is free, so this returns without suspending
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        self._in_flight += 1
+        return probe
+
+    def _release(self, probe: bool):
+        self._in_flight -= 1
+        self._semaphore.release()
+        # However the probe ended (verdict, client error, the client went away), the next one may go.
+        # Calls admitted before the circuit opened never touch it.
+        if probe:
+            self.breaker.release_probe()
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hint = retry_after_hint(exc)
+        if hint is not None:
+            return hint  # The upstream said when it will be ready; retrying sooner only fails again
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, exc: BaseException = None):
+        if exc is None:
+            self.counters["succeeded"] += 1
+            self.breaker.record_success()
+        else:
+            self.counters["failed"] += 1
+            # Bad requests say nothing about the backend's health
+            if is_retryable(exc):
+                self.breaker.record_failure()
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[self.breaker.state])
+
+    async def _attempt(self, awaitable, deadline: float):
+        return await asyncio.wait_for(awaitable, max(0, deadline - time.monotonic()))
+
+    async def _retry_wait(self, attempt: int, exc: BaseException, deadline: float) -> bool:
+        if attempt >= self.max_retries or not is_retryable(exc):
+            return False
+        if is_timeout(exc) and not self.retry_timeouts:
+            return False
+        if self._backoff(attempt, exc) >= deadline - time.monotonic():
+            return False
+        self.counters["retries"] += 1
+        UPSTREAM_RETRIES.labels(self.name).inc()
+        await asyncio.sleep(self._backoff(attempt, exc))
+        return True
+
+    def _give_up(self, exc: BaseException, deadline: float):
+        """Raise UpstreamUnavailable for a failure the client should back off from, else return."""
+        if isinstance(exc, asyncio.TimeoutError):
+            raise UpstreamUnavailable(self.name, "timeout") from exc
+        hint = retry_after_hint(exc)
+        if hint is not None and hint >= deadline - time.monotonic():
+            raise UpstreamUnavailable(self.name, "upstream_busy", hint) from exc
+
+    async def call(self, make_call):
+        """Await ``make_call()`` (a coroutine factory) under the governor, retrying transient failures."""
+        deadline = time.monotonic() + self.deadline
+        probe = await self._acquire()
+        self.counters["calls"] += 1
+        try:
+            attempt = 0
+            while True:
+                try:
+                    result = await self._attempt(make_call(), deadline)
+                except Exception as e:
+                    if await self._retry_wait(attempt, e, deadline):
+                        attempt += 1
+                        continue
+                    self._record(e)
+                    self._give_up(e, deadline)
+                    raise
+                self._record()
+                return result
+        finally:
+            self._release(probe)
+
+    async def stream(self, make_stream):
+        """Iterate ``make_stream()`` (an async generator factory) under the governor.
+
+        The slot is held for the whole stream. Failures are only retried before
+        the first item arrives, since nothing has been sent to the client yet;
+        the deadline likewise covers the wait for the first item.
+        """
+        deadline = time.monotonic() + self.deadline
+        probe = await self._acquire()
+        self.counters["calls"] += 1
+        try:
+            attempt = 0
+            while True:
+                upstream = make_stream()
+                try:
+                    first = await self._attempt(upstream.__anext__(), deadline)
+                except StopAsyncIteration:
+                    self._record()
+                    return
+                except Exception as e:
+                    await upstream.aclose()
+                    if await self._retry_wait(attempt, e, deadline):
+                        attempt += 1
+                        continue
+                    self._record(e)
+                    self._give_up(e, deadline)
+                    raise
+                break
+            try:
+                yield first
+                async for item in upstream:
+                    yield item
+            except Exception as e:
+                self._record(e)
+                raise
+            finally:
+                await upstream.aclose()
+            self._record()
+        finally:
+            self._release(probe)
+
+    def status(self) -> dict:
+        if self.breaker.state == OPEN and time.monotonic() - self.breaker.opened_at >= self.breaker.reset_timeout:
+            state = HALF_OPEN  # The next call will probe
+        else:
+            state = self.breaker.state
+        return {
+            "state": state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self._in_flight,
+            "queued": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            **self.counters,
+        }
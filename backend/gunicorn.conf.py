@@ -0,0 +1,42 @@
+"""Multi-worker launch configuration.
+
+    cd backend && gunicorn main:app -c gunicorn.conf.py
+
+Runs WEB_CONCURRENCY uvicorn workers (default: one per CPU, at most 8). The
+app is not preloaded, so every worker imports it after the fork and owns its
+own models, HTTP clients and process pools; see coordination.py for how the
+workers share the stores and elect one to run housekeeping.
+
+Plain ``uvicorn main:app --workers N`` also works if WEB_CONCURRENCY=N and, for
+aggregated metrics, PROMETHEUS_MULTIPROC_DIR are set by hand.
+"""
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count(), 8))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = False  # Models and pools must be created in each worker, never shared across a fork
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))  # Whisper and long streamed answers hold a request open
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")  # e.g. "-" for stdout; off by default
+
+# Workers inherit these: the app sizes its pools to its share of the CPUs, and
+# every worker's metrics land in one directory for /metrics to aggregate
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "temple-prometheus"))
+
+
+def on_starting(server):
+    # Samples left by a previous run would be counted again
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
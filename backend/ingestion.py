@@ -0,0 +1,121 @@
+"""Background ingestion of uploaded scrolls.
+
+Uploads are stored and acknowledged immediately with status "pending". A small
+number of job runners pick content blobs off a queue; each job splits its
+document into page ranges, extracts them in parallel on a process pool and
+streams the text into the store in page order as ranges finish, so progress is
+visible through ``store.get_scroll_status`` while the job runs. A blob is
+extracted once no matter how many scrolls share it.
+"""
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import store
+import extraction
+from metrics import timed
+
+
+class IngestionQueue:
+    """Queue of scroll extraction jobs backed by a process pool."""
+
+    def __init__(self, workers: int = 2, pages_per_task: int = 8, concurrent_jobs: int = 2, on_ready=None):
+        self.workers = max(1, workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.concurrent_jobs = max(1, concurrent_jobs)
+        self.on_ready = on_ready  # Called in a thread with the finished blob dict
+        self._pool = None
+        self._queue = None
+        self._runners = []
+        self._completed = 0
+        self._failed = 0
+
+    def start(self):
+        if self._pool is not None:
+            return
+        self._pool = self._make_pool()
+        self._queue = asyncio.Queue()
+        self._runners = [asyncio.create_task(self._run()) for _ in range(self.concurrent_jobs)]
+
+    def _make_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def close(self):
+        for task in self._runners:
+            task.cancel()
+        self._runners = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, sha256: str, file_path: str):
+        if self._pool is None:
+            self.start()
+        await self._queue.put((sha256, file_path))
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "completed": self._completed,
+            "failed": self._failed,
+        }
+
+    async def _run(self):
+        while True:
+            sha256, file_path = await self._queue.get()
+            try:
+                await self._ingest(sha256, file_path)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Scroll ingestion failed for {sha256}: {e}")
+
+    async def _ingest(self, sha256: str, file_path: str):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        pool = self._pool
+        try:
+            with timed("extraction", "count_units"):
+                total = await loop.run_in_executor(pool, extraction.count_units, file_path)
+            await asyncio.to_thread(store.start_blob_ingestion, sha256, total)
+
+            ranges = [(start, min(start + self.pages_per_task, total)) for start in range(0, total, self.pages_per_task)]
+
+            async def extract(index, start, end):
+                with timed("extraction", "extract_range"):
+                    return index, await loop.run_in_executor(pool, extraction.extract_range, file_path, start, end)
+
+            finished = {}
+            next_index = 0
+            pages_done = 0
+            for future in asyncio.as_completed([extract(i, start, end) for i, (start, end) in enumerate(ranges)]):
+                index, text = await future
+                finished[index] = text
+                pages_done += ranges[index][1] - ranges[index][0]
+                # Only contiguous ranges are appended so the stored text stays in page order
+                chunk = []
+                while next_index in finished:
+                    chunk.append(finished.pop(next_index))
+                    next_index += 1
+                if chunk:
+                    await asyncio.to_thread(store.append_blob_text, sha256, "".join(chunk), pages_done)
+                else:
+                    await asyncio.to_thread(store.set_blob_progress, sha256, pages_done)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool) and self._pool is pool:
+                # An extraction process died (e.g. OOM on a hostile file); replace the pool so later uploads proceed
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._make_pool()
+            self._failed += 1
+            await asyncio.to_thread(store.finish_blob_ingestion, sha256, f"{type(e).__name__}: {e}")
+            raise
+        blob = await asyncio.to_thread(store.finish_blob_ingestion, sha256)
+        self._completed += 1
+        print(f"📜 Scroll blob {sha256[:12]} extracted: {total} pages in {time.perf_counter() - started:.2f}s")
+        if blob and self.on_ready:
+            try:
+                await asyncio.to_thread(self.on_ready, blob)
+            except Exception as e:
+                print(f"Post-ingestion hook failed for {sha256}: {e}")
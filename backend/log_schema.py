@@ -0,0 +1,61 @@
+"""Shape of the oracle log entries written for every answer.
+
+``log_profile`` holds the fields that only change with the phase or the
+deployment's configuration; OracleLogWriter stores it once and each entry
+refers to it by id (see oracle_log.py). ``architect_observe_v3`` returns
+only the per-request part of the architect observation, which the reader
+merges back into the profile's constant part.
+"""
+import uuid
+import datetime
+
+PHASE = "3.0"
+
+
+def architect_state(llama_enabled: bool) -> dict:
+    """The constant part of the Phase 3.0 architect observation."""
+    return {
+        "phase": PHASE,
+        "role": "observer",
+        "authority_context": {
+            "seeker_choice_explicit": True,  # User selects via form
+            "override_attempted": False,
+            "override_performed": False,
+        },
+        "system_state": {
+            "llama_status": "shadow" if llama_enabled else "disabled",
+            "architect_status": "observer_only",
+            "routing_active": False,
+            "synthetic_generation": False,
+        },
+        "compliance_check": {
+            "phase_compliant": True,
+            "authority_compliant": True,
+            "oracle_authoritative": True,
+            "notes": "All constraints honored",
+        },
+    }
+
+
+def log_profile(llama_enabled: bool) -> dict:
+    return {
+        "architect_observation": architect_state(llama_enabled),
+        "phase": PHASE,
+        "corpus_intent": "authoritative_training_data",
+        # Phase 3.1 influence fields (defaults)
+        "shadow_delta": None,
+        "influence_state": "disabled",
+    }
+
+
+def architect_observe_v3(deity: str, session_id: str) -> dict:
+    """The per-request part of the Phase 3.0 architect observation."""
+    return {
+        "authority_context": {"oracle_selected": deity},
+        "temporal_context": {
+            "timestamp": datetime.datetime.now().isoformat(),
+            "session_id": session_id,
+            "interaction_id": str(uuid.uuid4()),
+        },
+    }
+
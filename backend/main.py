@@ -1,21 +1,42 @@
 import os
 import uuid
 import json
+import base64
 import tempfile
 import shutil
-from typing import List
-from fastapi import FastAPI, Request, UploadFile, File, Form, Query
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+import hashlib
+from typing import List, Optional
+from fastapi import FastAPI, Request, Response, UploadFile, File, Form, Query
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-import whisper
-from openai import OpenAI
-from PyPDF2 import PdfReader
-from docx import Document
 from dotenv import load_dotenv
 import datetime
-import httpx  # For X.ai API calls
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from oracle_log import OracleLogWriter, migrate_json_log
+import store
+from database import DATA_DIR
+from transcription import TranscriptionService, ClipTooLong, decode_audio
+from oracle_clients import get_http_client, get_openai_client, close_clients
+from retrieval import ScrollIndex
+from ingestion import IngestionQueue
+from cache import OracleCache, TTSAudioCache
+from audio_store import AUDIO_NAME_RE, CHUNK_SIZE as AUDIO_CHUNK_SIZE, part_path, follow_audio, sweep_audio_dir
+from migrate_json_store import migrate_all as migrate_json_store
+from uploads import UploadLimitMiddleware, UploadTooLarge, copy_limited
+from budget import TokenBudget, count_tokens, load_encoding, seconds_until_midnight
+from coordination import (WORKER_ID, WEB_WORKERS, LeaderElection, startup_lock, hold_worker_lock, release_worker_lock,
+                          worker_alive, prune_worker_locks, cpu_share)
+from log_schema import log_profile, architect_observe_v3
+from governor import UpstreamGovernor, UpstreamError, UpstreamUnavailable, parse_retry_after
+from metrics import (MetricsMiddleware, timed, timed_oracle, instrument_module, init_tracing, shutdown_tracing,
+                     render as render_metrics, ERRORS, TOKENS, CACHE_LOOKUPS, ORACLE_LATENCY, ORACLE_FIRST_TOKEN,
+                     BUDGET_REJECTIONS, ORACLE_LOG_DROPPED)
+
+instrument_module(store, "store")
 
 load_dotenv()
 
@@ -23,8 +44,43 @@ print("XAI key loaded:", bool(os.getenv("XAI_API_KEY")))
 print("OpenAI key loaded:", bool(os.getenv("OPENAI_API_KEY")))
 
 LLAMA_ENABLED = os.getenv("LLAMA_ENABLED", "false").lower() == "true"
+shadow_router = None
+if LLAMA_ENABLED:
+    # Only loaded (and NumPy with it) when LLaMA observes
+    from router import ShadowRouter
+    shadow_router = ShadowRouter(scroll_weight=float(os.getenv("ROUTER_SCROLL_WEIGHT", "0.25")))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_tracing()
+    hold_worker_lock()
+    # With several workers, the first one through does the migrations; the rest find nothing to do
+    with startup_lock():
+        migrated = migrate_json_log(TRANSCRIPT_LOG, LOG_DIR)
+        if migrated:
+            print(f"Migrated {migrated} entries from oracle_log.json into {LOG_DIR}")
+        imported = migrate_json_store()
+        if any(imported.values()):
+            print("Imported JSON stores into SQLite:", imported)
+    log_writer.start()
+    # tiktoken may download its BPE file here; requests count tokens in threads and estimate if it failed
+    await asyncio.to_thread(load_encoding, TOKEN_ENCODING)
+    app.state.leader = asyncio.create_task(leader.run(run_housekeeping))
+    app.state.budget_flusher = asyncio.create_task(flush_budget_forever())
+    if os.getenv("WHISPER_PRELOAD", "false").lower() == "true":
+        transcription_service.start()
+    yield
+    app.state.leader.cancel()
+    app.state.budget_flusher.cancel()
+    await asyncio.to_thread(token_budget.flush)
+    await transcription_service.close()
+    await ingestion_queue.close()
+    await close_clients()
+    log_writer.close()
+    release_worker_lock()
+    shutdown_tracing()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 import os
 from fastapi.staticfiles import StaticFiles
@@ -35,282 +91,612 @@ app.mount("/static", StaticFiles(directory=static_path), name="static")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
 
-UPLOAD_DIR = os.path.join(BASE_DIR, "scrolls_uploads")
-AUDIO_DIR = os.path.join(BASE_DIR, "audio")
-TRANSCRIPT_LOG = os.path.join(BASE_DIR, "oracle_log.json")
-SCROLL_DB = os.path.join(BASE_DIR, "scroll_data.json")
-SEEKERS_DB = os.path.join(BASE_DIR, "seekers.json")
-VISITORS_DB = os.path.join(BASE_DIR, "visitors.json")
+UPLOAD_DIR = os.path.join(DATA_DIR, "scrolls_uploads")
+AUDIO_DIR = os.path.join(DATA_DIR, "audio")
+TRANSCRIPT_LOG = os.path.join(DATA_DIR, "oracle_log.json")  # Legacy JSON array, migrated on startup
+LOG_DIR = os.path.join(DATA_DIR, "oracle_log")
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(AUDIO_DIR, exist_ok=True)
-openai_client = None  # Lazy load
-
-def get_openai_client():
-    global openai_client
-    if openai_client is None:
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not set")
-        openai_client = OpenAI(api_key=api_key)
-    return openai_client
 xai_api_key = os.getenv("XAI_API_KEY")  # For Hathor oracle
-whisper_model = None  # Lazy load
+# Every web worker owns its own pools and models, sized to its share of the CPUs
+transcription_service = TranscriptionService(
+    model_name=os.getenv("WHISPER_MODEL", "base"),
+    workers=int(os.getenv("WHISPER_WORKERS", str(max(1, cpu_share() // 4)))),
+    batch_size=int(os.getenv("WHISPER_BATCH_SIZE", "4")),
+    use_processes=os.getenv("WHISPER_POOL", "process") == "process",
+    cpus=cpu_share(),
+)
+WHISPER_DECODE_PIPE = os.getenv("WHISPER_DECODE_PIPE", "true").lower() == "true"
+# Longest recording decoded in the web worker: ten minutes is ~19 MB of PCM
+WHISPER_MAX_SECONDS = float(os.getenv("WHISPER_MAX_SECONDS", "600"))
+
+# Upload caps, enforced while the body streams in
+MB = 1024 * 1024
+WHISPER_MAX_UPLOAD_BYTES = int(float(os.getenv("WHISPER_MAX_UPLOAD_MB", "25")) * MB)
+SCROLL_MAX_UPLOAD_BYTES = int(float(os.getenv("SCROLL_MAX_UPLOAD_MB", "50")) * MB)
+SCROLL_MAX_BATCH_BYTES = int(float(os.getenv("SCROLL_MAX_BATCH_MB", "200")) * MB)
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/whisper": WHISPER_MAX_UPLOAD_BYTES,
+    "/upload_scroll": SCROLL_MAX_UPLOAD_BYTES,
+    "/upload_scrolls": SCROLL_MAX_BATCH_BYTES,
+})
+
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large(request: Request, exc: UploadTooLarge):
+    return JSONResponse(content={"error": exc.detail}, status_code=413)
+
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.35"))
+RETRIEVAL_SYNC_INTERVAL = float(os.getenv("RETRIEVAL_SYNC_INTERVAL", "60"))
+scroll_index = ScrollIndex.from_env()
+leader = LeaderElection()
+if RETRIEVAL_ENABLED and WEB_WORKERS > 1 and not scroll_index.remote:
+    print(f"Retrieval uses the embedded index with {WEB_WORKERS} workers: only the leader writes it and "
+          "others see new scrolls after its next sync. Set RETRIEVAL_CHROMA_URL to share a Chroma server.")
+INGEST_REQUEUE_INTERVAL = float(os.getenv("INGEST_REQUEUE_INTERVAL", "60"))
+
+def writes_index() -> bool:
+    """The embedded index takes a single writer: with several workers only the leader
+    writes, and its periodic sync picks up scrolls the others ingested."""
+    return WEB_WORKERS == 1 or scroll_index.remote or leader.is_leader
+
+def index_scroll(scroll: dict):
+    if RETRIEVAL_ENABLED and scroll["extracted_text"] and writes_index():
+        scroll_index.add_scroll(scroll["scroll_id"], scroll["uploader_id"], scroll["filename"],
+                                scroll["extracted_text"], source_id=scroll["sha256"])
+
+def index_ready_blob(blob: dict):
+    """Runs after ingestion finishes extracting a blob: index every scroll that shares it."""
+    for scroll in store.list_scrolls_for_blob(blob["sha256"]):
+        index_scroll(scroll)
+
+ingestion_queue = IngestionQueue(
+    workers=int(os.getenv("INGEST_WORKERS", str(cpu_share()))),
+    pages_per_task=int(os.getenv("INGEST_PAGES_PER_TASK", "8")),
+    concurrent_jobs=int(os.getenv("INGEST_CONCURRENT_JOBS", "2")),
+    on_ready=index_ready_blob,
+)
+
+ORACLE_CACHE_ENABLED = os.getenv("ORACLE_CACHE_ENABLED", "true").lower() == "true"
+oracle_cache = OracleCache(
+    maxsize=int(os.getenv("ORACLE_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ORACLE_CACHE_TTL", "86400")),
+    # e.g. 0.95 to also answer near-identical wording from the cache; off by default
+    semantic_threshold=float(os.getenv("ORACLE_CACHE_SEMANTIC_THRESHOLD", "0")) or None,
+    embed=lambda texts: scroll_index.embed(texts),
+)
+TTS_MODEL = "tts-1"
+TTS_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", "2"))
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+tts_cache = TTSAudioCache(
+    AUDIO_DIR,
+    max_bytes=int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024,
+    ttl=float(os.getenv("TTS_CACHE_TTL", str(7 * 86400))),
+)
+
+AUDIO_MAX_BYTES = int(os.getenv("AUDIO_MAX_MB", "1024")) * 1024 * 1024
+AUDIO_MAX_AGE = float(os.getenv("AUDIO_MAX_AGE", str(7 * 86400)))
+AUDIO_SWEEP_INTERVAL = float(os.getenv("AUDIO_SWEEP_INTERVAL", "300"))
+speech_tasks = set()  # Keeps in-flight synthesis tasks referenced until they finish
+
+log_writer = OracleLogWriter(
+    LOG_DIR,
+    segment_max_bytes=int(os.getenv("ORACLE_LOG_SEGMENT_MB", "64")) * 1024 * 1024,
+    flush_interval=float(os.getenv("ORACLE_LOG_FLUSH_INTERVAL", "0.5")),
+    max_pending=int(os.getenv("ORACLE_LOG_MAX_PENDING", "10000")),
+    # Entries are written from worker threads, so a full queue may hold one up briefly before dropping
+    put_timeout=float(os.getenv("ORACLE_LOG_PUT_TIMEOUT", "1")),
+    fsync=os.getenv("ORACLE_LOG_FSYNC", "false").lower() == "true",
+    profile=log_profile(LLAMA_ENABLED),
+)
+
+# Daily token budgets; 0 disables a limit. Registered seekers are held to the
+# seeker limit, anonymous visitors to the visitor limit.
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+BUDGET_FLUSH_INTERVAL = float(os.getenv("BUDGET_FLUSH_INTERVAL", "5"))
+token_budget = TokenBudget(
+    limits={
+        "visitor": int(os.getenv("VISITOR_DAILY_TOKEN_LIMIT", "20000")),
+        "seeker": int(os.getenv("SEEKER_DAILY_TOKEN_LIMIT", "100000")),
+    },
+    load=store.get_tokens_today,
+    flush=store.record_token_usage,
+    idle_ttl=float(os.getenv("BUDGET_IDLE_TTL", "600")),
+)
 
 def save_log(entry):
+    """Hand the entry to the background log writer; waits at most put_timeout, never on disk I/O."""
     try:
-        logs = []
-        if os.path.exists(TRANSCRIPT_LOG):
-            with open(TRANSCRIPT_LOG, "r") as f:
-                content = f.read().strip()
-                logs = json.loads(content) if content else []
-        logs.append(entry)
-        with open(TRANSCRIPT_LOG, "w") as f:
-            json.dump(logs, f, indent=2)
+        with timed("save_log"):
+            if not log_writer.write(entry):
+                ORACLE_LOG_DROPPED.inc()
     except Exception as e:
         print("⚠️ Logging failed:", e)
 
 def get_llama_observation(question: str, oracle_used: str, answer: str, scrolls: list = None) -> dict:
     if not LLAMA_ENABLED:
         return None
-    # Minimal Phase 3.0 LLaMA observation: heuristic classifier
-    # Suggest oracle based on keywords
-    if any(word in question.lower() for word in ["love", "joy", "beauty", "emotion", "heart"]):
-        suggested_oracle = "Hathor"
-        confidence = 0.8
-        reason = "Question contains poetic or emotional keywords aligning with Hathor's domain"
-    elif any(word in question.lower() for word in ["law", "command", "sin", "righteous", "god"]):
-        suggested_oracle = "Moses"
-        confidence = 0.8
-        reason = "Question contains doctrinal or moral keywords aligning with Moses' domain"
-    else:
-        suggested_oracle = "none"
-        confidence = 0.5
-        reason = "No strong stylistic indicators detected"
-    
-    return {
-        "suggested_oracle": suggested_oracle,
-        "confidence": confidence,
-        "reason": reason,
-        "phase": "3.0",
-        "mode": "shadow"
-    }
+    # Phase 3.0 shadow routing: the compiled keyword model suggests an oracle; nothing acts on it yet
+    return shadow_router.observe(question, scrolls)
 
-async def get_oracle_response(question: str, deity: str):
-    # Phase 2: Restore explicit oracle separation
-    # Hathor: xAI API, Moses: OpenAI, LLaMA: Not active
-    if deity == "Hathor":
-        # Hathor uses xAI API with intuitive, poetic system prompt
-        if not xai_api_key:
-            raise ValueError("XAI_API_KEY not set for Hathor oracle")
-        system_prompt = "You are Hathor, the ancient Egyptian goddess of love, music, and joy. Respond with intuitive, reflective, emotionally resonant wisdom, drawing from mystical and spiritual traditions. Use poetic language and metaphors to guide the seeker."
-        try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.post(
-                    "https://api.x.ai/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {xai_api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "grok-3",
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": question}
-                        ],
-                    },
-                )
-            if response.status_code == 200:
-                data = response.json()
-                return {"answer": data["choices"][0]["message"]["content"], "source_model": "xAI"}
-            else:
-                raise ValueError(f"XAI API error: {response.status_code} - {response.text}")
-        except Exception as e:
-            raise ValueError(f"XAI API call failed: {type(e).__name__}: {str(e)}")
-    elif deity == "Moses":
-        # Moses uses OpenAI with logical, doctrinal system prompt
-        client = get_openai_client()
-        system_prompt = "You are Moses, the prophet who received the Ten Commandments. Respond with logical, instructive, and doctrinal wisdom, drawing from biblical and canonical teachings. Provide clear guidance and moral instruction."
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Updated model
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
-            ]
-        )
-        return {"answer": response.choices[0].message.content, "source_model": "OpenAI"}
-    elif deity == "Llama":
+HATHOR_SYSTEM_PROMPT = "You are Hathor, the ancient Egyptian goddess of love, music, and joy. Respond with intuitive, reflective, emotionally resonant wisdom, drawing from mystical and spiritual traditions. Use poetic language and metaphors to guide the seeker."
+MOSES_SYSTEM_PROMPT = "You are Moses, the prophet who received the Ten Commandments. Respond with logical, instructive, and doctrinal wisdom, drawing from biblical and canonical teachings. Provide clear guidance and moral instruction."
+XAI_BASE_URL = os.getenv("XAI_BASE_URL", "https://api.x.ai/v1").rstrip("/")
+XAI_CHAT_URL = f"{XAI_BASE_URL}/chat/completions"
+# Cached answers are keyed on these, so editing a prompt retires its old answers
+PROMPT_VERSIONS = {
+    deity: hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+    for deity, prompt in (("Hathor", HATHOR_SYSTEM_PROMPT), ("Moses", MOSES_SYSTEM_PROMPT))
+}
+
+def with_scroll_context(system_prompt: str, passages: list = None) -> str:
+    """Append retrieved scroll passages to a deity's system prompt."""
+    if not passages:
+        return system_prompt
+    excerpts = "\n\n".join(f"[{p['filename'] or 'scroll'}] {p['text']}" for p in passages)
+    return (system_prompt + "\n\nSeekers have offered these scrolls to the temple. "
+            "Draw on them where they are relevant:\n\n" + excerpts)
+
+def check_deity(deity: str):
+    if deity == "Llama":
         # LLaMA is NOT a responder in Phase 2
         raise ValueError("LLaMA is not yet active as a responder in Phase 2. It will be introduced later as a learner/router.")
-    else:
+    if deity not in ("Hathor", "Moses"):
         raise ValueError(f"Unknown deity: {deity}")
 
-def architect_observe_v3(question: str, deity: str, session_id: str) -> dict:
-    # Phase 3.0 Architect Observation Schema
-    seeker_choice_explicit = True  # User selects via form
-    oracle_selected = deity
-    override_attempted = False
-    override_performed = False
-    llama_status = "shadow" if LLAMA_ENABLED else "disabled"
-    architect_status = "observer_only"
-    routing_active = False
-    synthetic_generation = False
-    phase_compliant = True
-    authority_compliant = True
-    oracle_authoritative = True
-    notes = "All constraints honored"
-    timestamp = datetime.datetime.now().isoformat()
-    
+def xai_request(question: str, stream: bool = False, passages: list = None) -> dict:
+    if not xai_api_key:
+        raise ValueError("XAI_API_KEY not set for Hathor oracle")
+    payload = {
+        "model": "grok-3",
+        "messages": [
+            {"role": "system", "content": with_scroll_context(HATHOR_SYSTEM_PROMPT, passages)},
+            {"role": "user", "content": question}
+        ],
+    }
+    if stream:
+        payload["stream"] = True
     return {
-        "phase": "3.0",
-        "role": "observer",
-        "authority_context": {
-            "seeker_choice_explicit": seeker_choice_explicit,
-            "oracle_selected": oracle_selected,
-            "override_attempted": override_attempted,
-            "override_performed": override_performed
-        },
-        "system_state": {
-            "llama_status": llama_status,
-            "architect_status": architect_status,
-            "routing_active": routing_active,
-            "synthetic_generation": synthetic_generation
+        "url": XAI_CHAT_URL,
+        "headers": {
+            "Authorization": f"Bearer {xai_api_key}",
+            "Content-Type": "application/json",
         },
-        "compliance_check": {
-            "phase_compliant": phase_compliant,
-            "authority_compliant": authority_compliant,
-            "oracle_authoritative": oracle_authoritative,
-            "notes": notes
-        },
-        "temporal_context": {
-            "timestamp": timestamp,
-            "session_id": session_id,
-            "interaction_id": str(uuid.uuid4())
-        }
+        "json": payload,
     }
 
-def extract_text_from_scroll(file_path):
-    text = ""
-    ext = os.path.splitext(file_path)[1].lower()
+def moses_messages(question: str, passages: list = None) -> list:
+    return [
+        {"role": "system", "content": with_scroll_context(MOSES_SYSTEM_PROMPT, passages)},
+        {"role": "user", "content": question}
+    ]
+
+async def call_xai(question: str, passages: list = None) -> dict:
+    request = xai_request(question, passages=passages)
+    response = await get_http_client().post(request["url"], headers=request["headers"], json=request["json"])
+    if response.status_code != 200:
+        raise UpstreamError(f"XAI API error: {response.status_code} - {response.text}", response.status_code,
+                            parse_retry_after(response.headers.get("retry-after")))
+    data = response.json()
+    return {"answer": data["choices"][0]["message"]["content"], "source_model": "xAI"}
+
+async def call_openai(question: str, passages: list = None) -> dict:
+    client = get_openai_client()
+    response = await client.chat.completions.create(
+        model="gpt-4o",  # Updated model
+        messages=moses_messages(question, passages)
+    )
+    return {"answer": response.choices[0].message.content, "source_model": "OpenAI"}
+
+async def get_oracle_response(question: str, deity: str, passages: list = None):
+    # Phase 2: Restore explicit oracle separation
+    # Hathor: xAI API, Moses: OpenAI, LLaMA: Not active
+    check_deity(deity)
+    governor = oracle_governors[deity]
+    with timed_oracle(deity, ORACLE_SOURCE_MODELS[deity], "blocking"):
+        if deity == "Hathor":
+            # Hathor uses xAI API with intuitive, poetic system prompt
+            try:
+                return await governor.call(lambda: call_xai(question, passages))
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                raise ValueError(f"XAI API call failed: {type(e).__name__}: {str(e)}")
+        # Moses uses OpenAI with logical, doctrinal system prompt
+        return await governor.call(lambda: call_openai(question, passages))
+
+ORACLE_SOURCE_MODELS = {"Hathor": "xAI", "Moses": "OpenAI"}
+
+def governor_setting(deity: str, name: str, default: str) -> str:
+    """Per-deity override (HATHOR_MAX_CONCURRENCY) falling back to the shared ORACLE_ setting."""
+    return os.getenv(f"{deity.upper()}_{name}", os.getenv(f"ORACLE_{name}", default))
+
+oracle_governors = {
+    deity: UpstreamGovernor(
+        source_model,
+        max_concurrency=int(governor_setting(deity, "MAX_CONCURRENCY", "16")),
+        max_queue=int(governor_setting(deity, "MAX_QUEUE", "64")),
+        queue_timeout=float(governor_setting(deity, "QUEUE_TIMEOUT", "10")),
+        max_retries=int(governor_setting(deity, "MAX_RETRIES", "2")),
+        backoff_base=float(governor_setting(deity, "BACKOFF_BASE", "0.5")),
+        backoff_max=float(governor_setting(deity, "BACKOFF_MAX", "8")),
+        failure_threshold=int(governor_setting(deity, "BREAKER_FAILURES", "5")),
+        reset_timeout=float(governor_setting(deity, "BREAKER_RESET", "30")),
+        deadline=float(governor_setting(deity, "CALL_DEADLINE", "60")),
+        retry_timeouts=governor_setting(deity, "RETRY_TIMEOUTS", "false").lower() == "true",
+    )
+    for deity, source_model in ORACLE_SOURCE_MODELS.items()
+}
+
+def oracle_unavailable(e: UpstreamUnavailable) -> JSONResponse:
+    retry_after = max(1, round(e.retry_after))
+    return JSONResponse(content={"error": str(e), "reason": e.reason, "retry_after": retry_after},
+                        status_code=503, headers={"Retry-After": str(retry_after)})
+
+async def replay_answer(answer: str):
+    """Stand-in for an upstream stream when the answer comes from the cache."""
+    yield answer
+
+def oracle_cache_lookup(question: str, deity: str, passages: list = None):
+    """Return (cache key, semantic bucket, cached result or None)."""
+    context_key = ",".join(f"{p['scroll_id']}:{p['chunk']}" for p in passages or [])
+    key = OracleCache.make_key(question, deity, PROMPT_VERSIONS[deity], context_key)
+    # Similar questions only share an answer when they were asked over the same retrieved passages
+    bucket = f"{deity}:{PROMPT_VERSIONS[deity]}:{context_key}"
+    cached = oracle_cache.get(key, question, bucket)
+    CACHE_LOOKUPS.labels("oracle", "miss" if cached is None else "hit").inc()
+    return key, bucket, cached
+
+async def get_cached_oracle_response(question: str, deity: str, passages: list = None, bypass: bool = False):
+    """get_oracle_response behind the answer cache; the result carries "cached"."""
+    check_deity(deity)
+    if not ORACLE_CACHE_ENABLED or bypass:
+        if bypass:
+            oracle_cache.record_bypass()
+            CACHE_LOOKUPS.labels("oracle", "bypass").inc()
+        return {**await get_oracle_response(question, deity, passages), "cached": False}
+    key, bucket, cached = await asyncio.to_thread(oracle_cache_lookup, question, deity, passages)
+    if cached is not None:
+        return {**cached, "cached": True}
+    result = await get_oracle_response(question, deity, passages)
+    await asyncio.to_thread(oracle_cache.put, key, result, question, bucket)
+    return {**result, "cached": False}
+
+async def stream_oracle_response(question: str, deity: str, passages: list = None):
+    """Yield answer text fragments as the upstream model produces them."""
+    check_deity(deity)
+    source_model = ORACLE_SOURCE_MODELS[deity]
+    upstream = stream_xai if deity == "Hathor" else stream_openai
+    started = time.perf_counter()
+    first = True
     try:
-        if ext == ".pdf":
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                text += page.extract_text() or ""
-        elif ext == ".docx":
-            doc = Document(file_path)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
-        elif ext in [".txt", ".md", ".rtf"]:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                text = f.read()
+        async for delta in oracle_governors[deity].stream(lambda: upstream(question, passages)):
+            if first:
+                ORACLE_FIRST_TOKEN.labels(deity, source_model).observe(time.perf_counter() - started)
+                first = False
+            yield delta
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
-        print(f"Failed to extract text: {e}")
-    return text.strip()
+        ERRORS.labels("oracle").inc()
+        if deity == "Hathor":
+            raise ValueError(f"XAI API call failed: {type(e).__name__}: {str(e)}")
+        raise
+    ORACLE_LATENCY.labels(deity, source_model, "stream").observe(time.perf_counter() - started)
+
+async def stream_xai(question: str, passages: list = None):
+    request = xai_request(question, stream=True, passages=passages)
+    async with get_http_client().stream("POST", request["url"], headers=request["headers"], json=request["json"]) as response:
+        if response.status_code != 200:
+            body = (await response.aread()).decode("utf-8", errors="replace")
+            raise UpstreamError(f"XAI API error: {response.status_code} - {body}", response.status_code,
+                                parse_retry_after(response.headers.get("retry-after")))
+        async for line in response.aiter_lines():
+            # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                yield delta
+
+async def stream_openai(question: str, passages: list = None):
+    client = get_openai_client()
+    stream = await client.chat.completions.create(
+        model="gpt-4o",
+        messages=moses_messages(question, passages),
+        stream=True
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
 
 def reset_scroll_system():
     """Helper function to reset the scroll ingestion system safely."""
-    # Clear all files in scrolls_uploads/
+    # Clear all files in scrolls_uploads/, including the blobs/ and .incoming/ trees
     for filename in os.listdir(UPLOAD_DIR):
         file_path = os.path.join(UPLOAD_DIR, filename)
         if os.path.isfile(file_path):
             os.remove(file_path)
+        elif os.path.isdir(file_path):
+            shutil.rmtree(file_path, ignore_errors=True)
     
-    # Reset scroll_data.json to empty list
-    with open(SCROLL_DB, "w") as f:
-        json.dump([], f)
+    # Drop every scroll row and its indexed passages
+    store.clear_scrolls()
+    if RETRIEVAL_ENABLED:
+        scroll_index.clear()
 
-def load_scroll_data():
-    """Load scroll data from JSON, return list of scrolls."""
+def sync_scroll_index():
+    """Index any stored scrolls that are missing from the retrieval index."""
     try:
-        with open(SCROLL_DB, "r") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-    except (FileNotFoundError, json.JSONDecodeError):
-        pass
-    return []
-
-def save_scroll_data(scrolls):
-    """Save list of scrolls to JSON."""
-    with open(SCROLL_DB, "w") as f:
-        json.dump(scrolls, f, indent=2)
-
-def load_seekers():
-    """Load seekers data from JSON, return dict of seekers."""
-    try:
-        with open(SEEKERS_DB, "r") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return data
-    except (FileNotFoundError, json.JSONDecodeError):
-        pass
-    return {}
-
-def save_seekers(seekers):
-    """Save dict of seekers to JSON."""
-    with open(SEEKERS_DB, "w") as f:
-        json.dump(seekers, f, indent=2)
-
-def load_visitors():
-    """Load visitors data from JSON, return dict of visitors."""
+        indexed = scroll_index.indexed_scroll_ids()
+        added = 0
+        for scroll_id, uploader_id, filename, text, source_id in store.iter_scroll_texts():
+            if scroll_id not in indexed and text:
+                scroll_index.add_scroll(scroll_id, uploader_id, filename, text, source_id=source_id)
+                added += 1
+        if added:
+            print(f"Indexed {added} scrolls for retrieval")
+    except Exception as e:
+        print("Scroll index sync failed:", e)
+
+async def requeue_orphaned_blobs():
+    """Submit unfinished blobs whose worker is gone (a restart or a crashed worker) to this one."""
+    requeued = 0
+    for blob in await asyncio.to_thread(store.list_unfinished_blobs):
+        owner = blob["owner"]
+        if owner is not None and await asyncio.to_thread(worker_alive, owner):
+            continue
+        if await asyncio.to_thread(store.claim_blob, blob["sha256"], WORKER_ID, owner):
+            await ingestion_queue.submit(blob["sha256"], os.path.join(UPLOAD_DIR, blob["stored_filename"]))
+            requeued += 1
+    if requeued:
+        print(f"Requeued {requeued} interrupted scroll ingestions")
+
+async def requeue_orphaned_blobs_forever():
+    while True:
+        try:
+            await requeue_orphaned_blobs()
+            await asyncio.to_thread(prune_worker_locks)
+        except Exception as e:
+            print("Ingestion requeue failed:", e)
+        await asyncio.sleep(INGEST_REQUEUE_INTERVAL)
+
+async def sync_scroll_index_forever():
+    # Only needed when other workers skip indexing (several workers, embedded index)
+    while True:
+        await asyncio.to_thread(sync_scroll_index)
+        if WEB_WORKERS == 1 or scroll_index.remote:
+            return
+        await asyncio.sleep(RETRIEVAL_SYNC_INTERVAL)
+
+async def run_housekeeping():
+    """Deployment-wide background work, run by the leader worker only."""
+    jobs = [requeue_orphaned_blobs_forever(), sweep_audio_forever()]
+    if RETRIEVAL_ENABLED:
+        jobs.append(sync_scroll_index_forever())
+    await asyncio.gather(*jobs)
+
+async def retrieve_context(question: str, seeker_id: str = None) -> dict:
+    """Top scroll passages for a question; empty when retrieval is off or fails."""
+    empty = {"passages": [], "personal_retrieval_score": None, "global_retrieval_score": None}
+    if not RETRIEVAL_ENABLED:
+        return empty
     try:
-        with open(VISITORS_DB, "r") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return data
-    except (FileNotFoundError, json.JSONDecodeError):
-        pass
-    return {}
-
-def save_visitors(visitors):
-    """Save dict of visitors to JSON."""
-    with open(VISITORS_DB, "w") as f:
-        json.dump(visitors, f, indent=2)
+        with timed("retrieval", "query"):
+            result = await asyncio.to_thread(scroll_index.query, question, RETRIEVAL_TOP_K, seeker_id)
+    except Exception as e:
+        print("Scroll retrieval failed:", e)
+        return empty
+    result["passages"] = [p for p in result["passages"] if p["score"] >= RETRIEVAL_MIN_SCORE]
+    return result
 
 def estimate_tokens(question: str, answer: str) -> int:
-    """Rough token estimation for Phase 3.1 logging."""
-    return len(question) // 4 + len(answer) // 4
+    """Token count of a question and its answer for Phase 3.1 metering."""
+    return count_tokens(question, TOKEN_ENCODING) + count_tokens(answer, TOKEN_ENCODING)
 
 def update_visitor(visitor_id: str, tokens_used: int):
-    """Update visitor ledger with token usage."""
-    visitors = load_visitors()
-    today = str(datetime.date.today())
-    if visitor_id not in visitors:
-        visitors[visitor_id] = {
-            "created_at": str(datetime.datetime.now()),
-            "last_seen": str(datetime.datetime.now()),
-            "last_seen_date": today,
-            "token_used_total": 0,
-            "token_used_today": 0,
-            "limit_state": "ok"
-        }
-    else:
-        visitor = visitors[visitor_id]
-        if visitor.get("last_seen_date") != today:
-            visitor["token_used_today"] = 0
-            visitor["last_seen_date"] = today
-        visitor["last_seen"] = str(datetime.datetime.now())
-    visitor["token_used_total"] += tokens_used
-    visitor["token_used_today"] += tokens_used
-    save_visitors(visitors)
+    """Add token usage to the visitor's in-memory budget; it reaches the ledger on the next flush."""
+    token_budget.charge("visitor", visitor_id, tokens_used)
+
+def client_address(request: Request) -> str:
+    return request.client.host if request.client else None
+
+def budget_subject(seeker_id: str = None, visitor_id: str = None, client_ip: str = None):
+    """Who a request is charged to. Callers sending no id share their address's visitor budget."""
+    if seeker_id:
+        return "seeker", seeker_id
+    if visitor_id:
+        return "visitor", visitor_id
+    return "visitor", f"ip:{client_ip}" if client_ip else None
+
+def budget_allows(kind: str, subject_id: str, question: str):
+    return token_budget.check(kind, subject_id, count_tokens(question, TOKEN_ENCODING))
+
+async def check_budget(question: str, seeker_id: str = None, visitor_id: str = None, client_ip: str = None):
+    """Return a 429 response if the caller has used up today's tokens, else None.
+
+    Runs before any upstream call so an exhausted budget costs nothing. Tokenizing
+    and a first-seen counter's database read happen in a worker thread.
+    """
+    kind, subject_id = budget_subject(seeker_id, visitor_id, client_ip)
+    allowed, usage = await asyncio.to_thread(budget_allows, kind, subject_id, question)
+    if allowed:
+        return None
+    BUDGET_REJECTIONS.labels(kind).inc()
+    retry_after = seconds_until_midnight()
+    return JSONResponse(
+        content={"error": "The oracle has spoken enough for today. Return tomorrow.", "retry_after": retry_after, **usage},
+        status_code=429,
+        headers={"Retry-After": str(retry_after)},
+    )
+
+async def flush_budget_forever():
+    while True:
+        await asyncio.sleep(BUDGET_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(token_budget.flush)
+        except Exception as e:
+            print("Token budget flush failed:", e)
+
+def record_interaction(question: str, deity: str, answer: str, source_model: str, session_id: str,
+                       seeker_id: str = None, visitor_id: str = None, retrieval: dict = None,
+                       client_ip: str = None):
+    """Meter tokens, gather observer payloads and append the oracle log entry for one answer.
+
+    Blocking (tokenizer, budget counter loads): call it with asyncio.to_thread.
+    """
+    # Phase 3.1: Token metering for anonymous continuity
+    estimated_tokens = estimate_tokens(question, answer)
+    if visitor_id:
+        update_visitor(visitor_id, estimated_tokens)
+    if seeker_id:
+        token_budget.charge("seeker", seeker_id, estimated_tokens)
+    if not (seeker_id or visitor_id):
+        # Charged to the caller's address, as check_budget checked it
+        update_visitor(budget_subject(client_ip=client_ip)[1], estimated_tokens)
+    usage_class = "registered" if seeker_id else "anonymous"
+    TOKENS.labels(deity, usage_class).inc(estimated_tokens)
+    
+    architect_obs = architect_observe_v3(deity, session_id)
+    retrieval = retrieval or {}
+    try:
+        with timed("router", "observe"):
+            llama_obs = get_llama_observation(question, deity, answer, retrieval.get("passages"))
+    except Exception as e:
+        print("LLaMA observation error:", str(e))
+        llama_obs = None
+    # Only per-request values: the constant fields are in the log profile (see log_schema.py)
+    save_log({
+        "log_profile": log_writer.profile_id,
+        "timestamp": str(datetime.datetime.now()),
+        "session_id": session_id,
+        "seeker_id": seeker_id,
+        "visitor_id": visitor_id,
+        "question": question,
+        "oracle_used": deity,
+        "answer": answer,
+        "architect_observation": architect_obs,
+        "llama_observation": llama_obs,
+        "source_model": source_model,
+        "personal_retrieval_score": retrieval.get("personal_retrieval_score"),
+        "global_retrieval_score": retrieval.get("global_retrieval_score"),
+        # Phase 3.1 anonymous metering
+        "estimated_tokens": estimated_tokens,
+        "usage_class": usage_class
+    })
+
+def sse_event(data: dict, event: str = None) -> str:
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @app.get("/", response_class=HTMLResponse)
 @app.get("/temple", response_class=HTMLResponse)
 def temple_page(request: Request):
     return templates.TemplateResponse("temple.html", {"request": request})
 
+@app.get("/metrics")
+def metrics_endpoint():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/transcription/stats")
+def transcription_stats():
+    return transcription_service.stats()
+
+@app.get("/ingestion/stats")
+def ingestion_stats():
+    return ingestion_queue.stats()
+
 @app.post("/reset_scrolls")
 def reset_scrolls():
     reset_scroll_system()
     return {"message": "Scroll system reset successfully."}
 
+SCROLLS_PAGE_SIZE = int(os.getenv("SCROLLS_PAGE_SIZE", "50"))
+SCROLLS_PAGE_MAX = int(os.getenv("SCROLLS_PAGE_MAX", "500"))
+
+def encode_scroll_cursor(after: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(after)).encode()).decode().rstrip("=")
+
+def decode_scroll_cursor(cursor: str) -> tuple:
+    """Inverse of encode_scroll_cursor; raises ValueError for anything it did not produce."""
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not (isinstance(after, list) and len(after) == 2 and all(isinstance(v, str) for v in after)):
+        raise ValueError("Invalid cursor")
+    return tuple(after)
+
+def scrolls_etag() -> str:
+    # One revision covers every listing and count; clients revalidate per URL
+    return f'W/"scrolls-{store.scroll_revision()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def cache_headers(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"  # Always revalidate, usually for a 304
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    cache_headers(response, etag)
+    return response
+
+@app.get("/scrolls/count")
+def scroll_count(request: Request, response: Response, uploader_id: str = None):
+    """Number of scrolls, read from a maintained counter instead of the scroll rows."""
+    etag = scrolls_etag()
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    cache_headers(response, etag)
+    count = store.count_scrolls() if uploader_id is None else store.count_uploader_scrolls(uploader_id)
+    return {"count": count}
+
 @app.get("/scrolls")
-def get_scroll_count():
-    scrolls = load_scroll_data()
+def list_scrolls(request: Request, response: Response,
+                 limit: int = Query(SCROLLS_PAGE_SIZE, ge=1, le=SCROLLS_PAGE_MAX),
+                 cursor: str = None, fields: str = None, uploader_id: str = None):
+    """A page of scrolls, oldest first. Follow next_cursor for the next page.
+
+    ``fields`` is a comma-separated projection; extracted_text is left out
+    unless it is named there.
+    """
+    projection = store.SCROLL_LIST_FIELDS
+    if fields:
+        projection = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in projection if f not in store.SCROLL_FIELDS]
+        if unknown or not projection:
+            return JSONResponse(content={"error": f"Unknown fields: {', '.join(unknown)}",
+                                         "fields": list(store.SCROLL_FIELDS)}, status_code=400)
+    try:
+        after = decode_scroll_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    # Read the revision before the rows: a write in between leaves a stale tag, never stale content
+    etag = scrolls_etag()
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    rows, next_after = store.list_scroll_page(limit, after, uploader_id, projection)
+    cache_headers(response, etag)
     return {
-        "count": len(scrolls),
-        "files": scrolls
+        "count": store.count_scrolls() if uploader_id is None else store.count_uploader_scrolls(uploader_id),
+        "files": rows,
+        "next_cursor": encode_scroll_cursor(next_after) if next_after else None,
     }
 
 class RegisterInput(BaseModel):
@@ -319,8 +705,7 @@ class RegisterInput(BaseModel):
 @app.post("/register")
 def register_seeker(payload: RegisterInput):
     seeker_id = str(uuid.uuid4())
-    seekers = load_seekers()
-    seekers[seeker_id] = {
+    store.create_seeker({
         "seeker_id": seeker_id,
         "created_at": str(datetime.datetime.now()),
         "display_name": payload.display_name,
@@ -329,164 +714,354 @@ def register_seeker(payload: RegisterInput):
         "donation_total": 0.0,
         "influence_state": "disabled",
         "eligibility_flags": []
-    }
-    save_seekers(seekers)
+    })
     return {"seeker_id": seeker_id, "message": "Registration successful. Welcome to the temple."}
 
-@app.post("/upload_scroll")
-async def upload_scroll(scroll: UploadFile = File(...), seeker_id: str = Form(None), visitor_id: str = Form(None)):
-    # Use seeker_id if provided, else generate temp uploader_id
-    uploader_id = seeker_id if seeker_id else str(uuid.uuid4())
-    
-    # Save the file with safe name to prevent overwrites
-    safe_name = f"{uuid.uuid4()}_{scroll.filename}"
-    file_path = os.path.join(UPLOAD_DIR, safe_name)
-    with open(file_path, "wb") as f:
-        shutil.copyfileobj(scroll.file, f)
-    
-    # Extract text
-    extracted_text = extract_text_from_scroll(file_path)
-    
-    # Create scroll entry
-    scroll_entry = {
-        "scroll_id": str(uuid.uuid4()),
+def store_scroll_blob(src, filename: str):
+    """Copy an upload into the content-addressed blob store, hashing as it streams.
+
+    Returns (sha256, path relative to UPLOAD_DIR, size). Identical content lands
+    on the same path, so a duplicate upload leaves no second copy behind; the
+    path keeps the extension extraction needs, so ``record_upload`` removes the
+    copy when the same bytes arrive under a different one.
+    Raises UploadTooLarge once the file passes SCROLL_MAX_UPLOAD_BYTES.
+    """
+    incoming_dir = os.path.join(UPLOAD_DIR, ".incoming")
+    os.makedirs(incoming_dir, exist_ok=True)
+    part_path = os.path.join(incoming_dir, f"{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    try:
+        with open(part_path, "wb") as out:
+            size = copy_limited(src, out, SCROLL_MAX_UPLOAD_BYTES, on_chunk=digest.update)
+        sha256 = digest.hexdigest()
+        ext = os.path.splitext(filename or "")[1].lower()
+        relative = os.path.join("blobs", sha256[:2], sha256 + ext)
+        final_path = os.path.join(UPLOAD_DIR, relative)
+        if os.path.exists(final_path):
+            os.remove(part_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(part_path, final_path)
+        return sha256, relative, size
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+def record_upload(sha256: str, stored_filename: str, size: int, filename: str, uploader_id: str,
+                  seeker_id: str = None):
+    """Record a stored upload. Returns (blob, scroll_id, needs_ingestion).
+
+    Runs in a worker thread: a write may wait up to busy_timeout on another worker's lock.
+    """
+    blob, created = store.get_or_create_blob(sha256, stored_filename, size, owner=WORKER_ID)
+    if blob["stored_filename"] != stored_filename:
+        # The content is already stored under another extension and the row points there
+        try:
+            os.remove(os.path.join(UPLOAD_DIR, stored_filename))
+        except FileNotFoundError:
+            pass
+    # Every upload gets its own scroll entry; text and status come from the shared blob
+    scroll_id = str(uuid.uuid4())
+    store.add_scroll({
+        "scroll_id": scroll_id,
         "uploader_id": uploader_id,
-        "filename": scroll.filename,  # Original filename for display
-        "safe_filename": safe_name,  # Safe filename for storage
-        "extracted_text": extracted_text,
+        "filename": filename,  # Original filename for display
+        "safe_filename": blob["stored_filename"],  # Blob path for storage
+        "blob_sha256": sha256,
+        "extracted_text": None,
         "timestamp": str(datetime.datetime.now())
-    }
-    
-    # Load existing scrolls, append, save
-    scrolls = load_scroll_data()
-    scrolls.append(scroll_entry)
-    save_scroll_data(scrolls)
-    
+    })
+    needs_ingestion = created or store.retry_failed_blob(sha256, owner=WORKER_ID)
     # Update seeker scroll_count if seeker_id provided
     if seeker_id:
-        seekers = load_seekers()
-        if seeker_id in seekers:
-            seekers[seeker_id]["scroll_count"] += 1
-            save_seekers(seekers)
+        store.increment_seeker_scroll_count(seeker_id)
+    return blob, scroll_id, needs_ingestion
+
+def index_uploaded_scroll(scroll_id: str):
+    index_scroll(store.get_scroll(scroll_id))
+
+async def accept_scroll(scroll: UploadFile, seeker_id: str = None) -> dict:
+    """Store an uploaded file, record its scroll entry and queue new content for extraction."""
+    # Use seeker_id if provided, else generate temp uploader_id
+    uploader_id = seeker_id if seeker_id else str(uuid.uuid4())
     
-    return {"message": "📜 Your scroll has been uploaded.", "scroll_id": scroll_entry["scroll_id"]}
+    sha256, stored_filename, size = await asyncio.to_thread(store_scroll_blob, scroll.file, scroll.filename)
+    blob, scroll_id, needs_ingestion = await asyncio.to_thread(
+        record_upload, sha256, stored_filename, size, scroll.filename, uploader_id, seeker_id)
+    if needs_ingestion:
+        await ingestion_queue.submit(sha256, os.path.join(UPLOAD_DIR, blob["stored_filename"]))
+        status = "pending"
+    else:
+        status = blob["status"]
+        if status == "ready":
+            # Already extracted: only the new scroll needs indexing, reusing stored embeddings
+            try:
+                await asyncio.to_thread(index_uploaded_scroll, scroll_id)
+            except Exception as e:
+                print("Scroll indexing failed:", e)
+    
+    return {"scroll_id": scroll_id, "filename": scroll.filename, "status": status, "sha256": sha256}
+
+@app.post("/upload_scroll")
+async def upload_scroll(scroll: UploadFile = File(...), seeker_id: str = Form(None), visitor_id: str = Form(None)):
+    accepted = await accept_scroll(scroll, seeker_id)
+    return {"message": "📜 Your scroll has been received and is being read.", **accepted}
+
+@app.post("/upload_scrolls")
+async def upload_scrolls(scrolls: List[UploadFile] = File(...), seeker_id: str = Form(None), visitor_id: str = Form(None)):
+    accepted = [await accept_scroll(scroll, seeker_id) for scroll in scrolls]
+    return {"message": f"📜 {len(accepted)} scrolls received and are being read.", "scrolls": accepted}
+
+@app.get("/scrolls/{scroll_id}/status")
+def scroll_status(scroll_id: str):
+    status = store.get_scroll_status(scroll_id)
+    if status is None:
+        return JSONResponse(content={"error": "Unknown scroll"}, status_code=404)
+    return status
 
 class QuestionInput(BaseModel):
     question: str
     deity: str = "Hathor"  # Default to Hathor
     seeker_id: str = None
     visitor_id: str = None
+    no_cache: bool = False  # Always ask the upstream oracle
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {"oracle": oracle_cache.stats(), "tts": tts_cache.stats()}
+
+@app.get("/oracle/status")
+def oracle_status():
+    """Health of each upstream backend as seen by its governor."""
+    return {deity: governor.status() for deity, governor in oracle_governors.items()}
+
+@app.get("/budget/stats")
+def budget_stats():
+    return token_budget.stats()
 
 @app.post("/ask")
-async def ask_oracle(payload: QuestionInput):
+async def ask_oracle(payload: QuestionInput, request: Request):
     try:
         question = payload.question
         deity = payload.deity
         print("ASK:", deity, "len(question) =", len(question))
         session_id = str(uuid.uuid4())
+        rejected = await check_budget(question, payload.seeker_id, payload.visitor_id, client_address(request))
+        if rejected:
+            return rejected
 
-        result = await get_oracle_response(question, deity)
+        retrieval = await retrieve_context(question, payload.seeker_id)
+        result = await get_cached_oracle_response(question, deity, retrieval["passages"], bypass=payload.no_cache)
         answer = result["answer"]
         source_model = result["source_model"]
-        print("ANSWER len =", len(answer))
+        print("ANSWER len =", len(answer), "(cached)" if result["cached"] else "")
         
-        # Phase 3.1: Token metering for anonymous continuity
-        estimated_tokens = estimate_tokens(question, answer)
-        if payload.visitor_id:
-            update_visitor(payload.visitor_id, estimated_tokens)
-        usage_class = "registered" if payload.seeker_id else "anonymous"
-        
-        architect_obs = architect_observe_v3(question, deity, session_id)
-        scrolls = load_scroll_data()  # For LLaMA analysis
-        try:
-            llama_obs = get_llama_observation(question, deity, answer, scrolls)
-        except Exception as e:
-            print("LLaMA observation error:", str(e))
-            llama_obs = None
-        save_log({
-            "timestamp": str(datetime.datetime.now()),
-            "session_id": session_id,
-            "seeker_id": payload.seeker_id,
-            "visitor_id": payload.visitor_id,
-            "question": question,
-            "oracle_used": deity,
-            "answer": answer,
-            "architect_observation": architect_obs,
-            "llama_observation": llama_obs,
-            "source_model": source_model,
-            "phase": "3.0",
-            "corpus_intent": "authoritative_training_data",
-            # Phase 3.1 influence fields (defaults)
-            "personal_retrieval_score": None,
-            "global_retrieval_score": None,
-            "shadow_delta": None,
-            "influence_state": "disabled",
-            # Phase 3.1 anonymous metering
-            "estimated_tokens": estimated_tokens,
-            "usage_class": usage_class
-        })
+        await asyncio.to_thread(record_interaction, question, deity, answer, source_model, session_id,
+                                seeker_id=payload.seeker_id, visitor_id=payload.visitor_id, retrieval=retrieval,
+                                client_ip=client_address(request))
         return {"answer": answer}
 
+    except UpstreamUnavailable as e:
+        return oracle_unavailable(e)
     except Exception as e:
         print("Error:", str(e))
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
-@app.post("/whisper")
-async def whisper_audio(request: Request, file: UploadFile = File(...), voice: str = Form("Hathor"), seeker_id: str = Form(None), visitor_id: str = Form(None)):
-    global whisper_model
-    if whisper_model is None:
-        whisper_model = whisper.load_model("base")
+@app.post("/ask/stream")
+async def ask_oracle_stream(payload: QuestionInput, request: Request):
+    """Stream the answer as server-sent events: {"delta"} frames, then a "done" or "error" event."""
+    question = payload.question
+    deity = payload.deity
+    print("ASK (stream):", deity, "len(question) =", len(question))
+    session_id = str(uuid.uuid4())
+    rejected = await check_budget(question, payload.seeker_id, payload.visitor_id, client_address(request))
+    if rejected:
+        return rejected
+
+    async def events():
+        started = time.perf_counter()
+        first_token_ms = None
+        parts = []
+        try:
+            check_deity(deity)
+            retrieval = await retrieve_context(question, payload.seeker_id)
+            cache_key = cached = None
+            if ORACLE_CACHE_ENABLED and not payload.no_cache:
+                cache_key, bucket, cached = await asyncio.to_thread(oracle_cache_lookup, question, deity, retrieval["passages"])
+            elif payload.no_cache:
+                oracle_cache.record_bypass()
+                CACHE_LOOKUPS.labels("oracle", "bypass").inc()
+            if cached is not None:
+                upstream = replay_answer(cached["answer"])
+            else:
+                upstream = stream_oracle_response(question, deity, retrieval["passages"])
+            async for delta in upstream:
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                    print("TTFT ms =", first_token_ms, "(cached)" if cached is not None else "")
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+        except UpstreamUnavailable as e:
+            yield sse_event({"error": str(e), "reason": e.reason, "retry_after": max(1, round(e.retry_after))}, event="error")
+            return
+        except Exception as e:
+            print("Error:", str(e))
+            yield sse_event({"error": str(e)}, event="error")
+            return
+        answer = "".join(parts)
+        print("ANSWER len =", len(answer))
+        if cache_key is not None and cached is None and answer:
+            await asyncio.to_thread(oracle_cache.put, cache_key, {"answer": answer, "source_model": ORACLE_SOURCE_MODELS[deity]},
+                                    question, bucket)
+        # Metering and logging only happen once the full answer has been delivered
+        await asyncio.to_thread(record_interaction, question, deity, answer, ORACLE_SOURCE_MODELS[deity], session_id,
+                                seeker_id=payload.seeker_id, visitor_id=payload.visitor_id, retrieval=retrieval,
+                                client_ip=client_address(request))
+        yield sse_event({"session_id": session_id, "time_to_first_token_ms": first_token_ms}, event="done")
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def start_speech(answer: str, selected_voice: str, bypass: bool = False) -> Optional[str]:
+    """Begin voicing an answer into AUDIO_DIR and return the file name to serve.
+
+    Synthesis streams into ``<name>.part`` in the background, so the audio URL
+    can be played (via /audio) before the whole clip exists. Cached clips, or
+    ones another request is already synthesizing, are reused. Returns None when
+    synthesis cannot start (e.g. no OpenAI key), so no URL is handed out that
+    would only 404.
+    """
+    cacheable = TTS_CACHE_ENABLED and not bypass
+    if cacheable:
+        audio_name = TTSAudioCache.filename(TTS_MODEL, selected_voice, answer)
+        hit = tts_cache.get(audio_name)
+        CACHE_LOOKUPS.labels("tts", "hit" if hit else "miss").inc()
+        if hit:
+            return audio_name
+    else:
+        if bypass:
+            tts_cache.record_bypass()
+            CACHE_LOOKUPS.labels("tts", "bypass").inc()
+        audio_name = f"{uuid.uuid4()}.mp3"
+
     try:
-        session_id = str(uuid.uuid4())
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".webm")
-        temp_file.write(await file.read())
-        temp_file.close()
+        # The governors own retries for chat calls; speech keeps the client's own retry loop
+        client = get_openai_client().with_options(max_retries=TTS_MAX_RETRIES)
+    except Exception as e:
+        print("TTS synthesis unavailable:", e)
+        return None
+    audio_path = os.path.join(AUDIO_DIR, audio_name)
+    try:
+        # O_EXCL claims the clip; if it fails, an identical clip is already in flight
+        os.close(os.open(part_path(audio_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return audio_name
+    task = asyncio.create_task(synthesize_speech(client, answer, selected_voice, audio_path, cacheable))
+    speech_tasks.add(task)
+    task.add_done_callback(speech_tasks.discard)
+    return audio_name
+
+async def synthesize_speech(client, answer: str, selected_voice: str, audio_path: str, cacheable: bool):
+    """Stream TTS output to ``<audio_path>.part`` chunk by chunk, then rename it into place."""
+    partial = part_path(audio_path)
+    try:
+        with timed("tts", selected_voice):
+            async with client.audio.speech.with_streaming_response.create(
+                model=TTS_MODEL,
+                voice=selected_voice,
+                input=answer
+            ) as response:
+                with open(partial, "ab") as f:
+                    async for chunk in response.iter_bytes(AUDIO_CHUNK_SIZE):
+                        f.write(chunk)
+                        f.flush()
+        os.replace(partial, audio_path)
+        if cacheable:
+            tts_cache.put(os.path.basename(audio_path))
+    except Exception as e:
+        print("TTS synthesis failed:", e)
+        if os.path.exists(partial):
+            os.remove(partial)
+
+async def sweep_audio_forever():
+    while True:
+        await asyncio.sleep(AUDIO_SWEEP_INTERVAL)
+        try:
+            result = await asyncio.to_thread(sweep_audio_dir, AUDIO_DIR, AUDIO_MAX_BYTES, AUDIO_MAX_AGE)
+            if result["removed"]:
+                print(f"🧹 Audio sweep removed {result['removed']} files ({result['freed_bytes']} bytes)")
+        except Exception as e:
+            print("Audio sweep failed:", e)
+
+@app.get("/audio/{audio_name}")
+async def get_audio(audio_name: str):
+    """Serve voiced answers: finished files support range requests; clips still being
+    synthesized are streamed as they are written."""
+    if not AUDIO_NAME_RE.match(audio_name):
+        return JSONResponse(content={"error": "Unknown audio"}, status_code=404)
+    audio_path = os.path.join(AUDIO_DIR, audio_name)
+    if not os.path.exists(audio_path) and os.path.exists(part_path(audio_path)):
+        return StreamingResponse(follow_audio(audio_path), media_type="audio/mpeg",
+                                 headers={"Cache-Control": "no-cache"})
+    if os.path.exists(audio_path):
+        return FileResponse(audio_path, media_type="audio/mpeg")
+    return JSONResponse(content={"error": "Unknown audio"}, status_code=404)
 
-        result = whisper_model.transcribe(temp_file.name)
+async def load_whisper_clip(file: UploadFile):
+    """Turn an uploaded recording into something the transcription workers can read.
+
+    The upload is already spooled by the form parser, so it is decoded straight
+    from that file through an ffmpeg pipe. If that is unavailable it is copied
+    once, in chunks, to a named temp file and the path is handed over instead.
+    """
+    if WHISPER_DECODE_PIPE:
+        try:
+            return await decode_audio(file.file, WHISPER_MAX_SECONDS)
+        except (FileNotFoundError, RuntimeError) as e:
+            print("Piped audio decode unavailable, falling back to a temp file:", e)
+            await file.seek(0)
+    suffix = os.path.splitext(file.filename or "")[1] or ".webm"
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with temp_file:
+            await asyncio.to_thread(copy_limited, file.file, temp_file, WHISPER_MAX_UPLOAD_BYTES)
+    except BaseException:
         os.unlink(temp_file.name)
+        raise
+    return temp_file.name
+
+@app.post("/whisper")
+async def whisper_audio(request: Request, file: UploadFile = File(...), voice: str = Form("Hathor"), seeker_id: str = Form(None), visitor_id: str = Form(None), no_cache: bool = Form(False)):
+    try:
+        session_id = str(uuid.uuid4())
+        # Checked before transcription too, so an exhausted budget does not tie up a Whisper worker
+        rejected = await check_budget("", seeker_id, visitor_id, client_address(request))
+        if rejected:
+            return rejected
+        with timed("whisper", "decode"):
+            clip = await load_whisper_clip(file)
+        try:
+            with timed("whisper", "transcribe"):
+                result = await transcription_service.transcribe(clip)
+        finally:
+            if isinstance(clip, str):
+                os.unlink(clip)
 
         question = result["text"].strip()
         print(f"🎤 Whisper transcription: {question}")
+        rejected = await check_budget(question, seeker_id, visitor_id, client_address(request))
+        if rejected:
+            return rejected
 
-        result_oracle = await get_oracle_response(question, voice)
+        retrieval = await retrieve_context(question, seeker_id)
+        result_oracle = await get_cached_oracle_response(question, voice, retrieval["passages"], bypass=no_cache)
         answer = result_oracle["answer"]
         source_model = result_oracle["source_model"]
         
-        # Phase 3.1: Token metering for anonymous continuity
-        estimated_tokens = estimate_tokens(question, answer)
-        if visitor_id:
-            update_visitor(visitor_id, estimated_tokens)
-        usage_class = "registered" if seeker_id else "anonymous"
-        
-        architect_obs = architect_observe_v3(question, voice, session_id)
-        scrolls = load_scroll_data()  # For LLaMA analysis
-        try:
-            llama_obs = get_llama_observation(question, voice, answer, scrolls)
-        except Exception as e:
-            print("LLaMA observation error:", str(e))
-            llama_obs = None
-        save_log({
-            "timestamp": str(datetime.datetime.now()),
-            "session_id": session_id,
-            "seeker_id": seeker_id,
-            "visitor_id": visitor_id,
-            "question": question,
-            "oracle_used": voice,
-            "answer": answer,
-            "architect_observation": architect_obs,
-            "llama_observation": llama_obs,
-            "source_model": source_model,
-            "phase": "3.0",
-            "corpus_intent": "authoritative_training_data",
-            # Phase 3.1 influence fields (defaults)
-            "personal_retrieval_score": None,
-            "global_retrieval_score": None,
-            "shadow_delta": None,
-            "influence_state": "disabled",
-            # Phase 3.1 anonymous metering
-            "estimated_tokens": estimated_tokens,
-            "usage_class": usage_class
-        })
+        await asyncio.to_thread(record_interaction, question, voice, answer, source_model, session_id,
+                                seeker_id=seeker_id, visitor_id=visitor_id, retrieval=retrieval,
+                                client_ip=client_address(request))
 
         # Voice TTS generation using OpenAI
         voice_map = {
@@ -496,19 +1071,16 @@ async def whisper_audio(request: Request, file: UploadFile = File(...), voice: s
         }
         selected_voice = voice_map.get(voice, "onyx")
 
-        client = get_openai_client()
-        tts_response = client.audio.speech.create(
-            model="tts-1",
-            voice=selected_voice,
-            input=answer
-        )
-
-        audio_id = str(uuid.uuid4())
-        audio_path = os.path.join(AUDIO_DIR, f"{audio_id}.mp3")
-        with open(audio_path, "wb") as f:
-            f.write(tts_response.content)
+        audio_name = start_speech(answer, selected_voice, bypass=no_cache)
 
-        return {"transcription": question, "answer": answer, "audio_url": f"/audio/{audio_id}.mp3"}
+        return {"transcription": question, "answer": answer,
+                "audio_url": f"/audio/{audio_name}" if audio_name else None}
 
+    except UploadTooLarge:
+        raise
+    except ClipTooLong as e:
+        return JSONResponse(content={"error": str(e)}, status_code=413)
+    except UpstreamUnavailable as e:
+        return oracle_unavailable(e)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
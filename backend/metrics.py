@@ -0,0 +1,201 @@
+"""Prometheus metrics and optional OpenTelemetry tracing.
+
+Every stage of the ask pipeline records into ``temple_stage_seconds`` through
+``timed``. Upstream oracle calls get their own histogram labelled by deity and
+source model, and ``MetricsMiddleware`` records per-route request latency.
+``/metrics`` renders the default registry.
+
+With several workers, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does):
+every process then writes its samples there and ``render`` aggregates them,
+so a scrape sees the whole deployment whichever worker answers it.
+
+Tracing is off unless OTEL_EXPORTER_OTLP_ENDPOINT is set. When it is on,
+``timed`` also opens a span per stage, so one trace shows where a slow
+request spent its time.
+"""
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUESTS = Counter("temple_http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("temple_http_request_seconds", "HTTP request latency", ["method", "route"],
+                         buckets=LATENCY_BUCKETS)
+STAGE_LATENCY = Histogram("temple_stage_seconds", "Latency of one pipeline stage", ["stage", "op"],
+                          buckets=LATENCY_BUCKETS)
+ORACLE_LATENCY = Histogram("temple_oracle_seconds", "Upstream oracle call latency",
+                           ["deity", "source_model", "mode"], buckets=LATENCY_BUCKETS)
+ORACLE_FIRST_TOKEN = Histogram("temple_oracle_first_token_seconds", "Time to the first streamed token",
+                               ["deity", "source_model"], buckets=LATENCY_BUCKETS)
+ERRORS = Counter("temple_errors_total", "Errors by pipeline stage", ["stage"])
+TOKENS = Counter("temple_tokens_total", "Metered tokens", ["deity", "usage_class"])
+CACHE_LOOKUPS = Counter("temple_cache_lookups_total", "Cache lookups", ["cache", "result"])
+BUDGET_REJECTIONS = Counter("temple_budget_rejections_total", "Requests refused for an exhausted token budget",
+                            ["kind"])
+ORACLE_LOG_DROPPED = Counter("temple_oracle_log_dropped_total",
+                             "Oracle log entries dropped because the writer's queue stayed full")
+UPSTREAM_RETRIES = Counter("temple_upstream_retries_total", "Retried upstream oracle calls", ["backend"])
+UPSTREAM_REJECTIONS = Counter("temple_upstream_rejections_total", "Upstream calls refused by the governor",
+                              ["backend", "reason"])
+# Each worker has its own breaker; across workers the worst live state is reported
+CIRCUIT_STATE = Gauge("temple_upstream_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+                      ["backend"], multiprocess_mode="livemax")
+
+_tracer = None
+
+
+def init_tracing(service_name: str = "temple"):
+    """Export spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is configured."""
+    global _tracer
+    if _tracer is not None or not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    except ImportError as e:
+        print("Tracing disabled, OpenTelemetry exporter unavailable:", e)
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("temple")
+    print("Tracing enabled, exporting to", os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"))
+
+
+def shutdown_tracing():
+    if _tracer is not None:
+        from opentelemetry import trace
+        trace.get_tracer_provider().shutdown()
+
+
+@contextmanager
+def _span(name: str, attributes: dict = None):
+    if _tracer is None:
+        yield
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes):
+        yield
+
+
+@contextmanager
+def timed(stage: str, op: str = ""):
+    """Time a block into temple_stage_seconds; exceptions also count toward temple_errors_total."""
+    started = time.perf_counter()
+    with _span(f"{stage}.{op}" if op else stage):
+        try:
+            yield
+        except BaseException:
+            ERRORS.labels(stage).inc()
+            raise
+        finally:
+            STAGE_LATENCY.labels(stage, op).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def timed_oracle(deity: str, source_model: str, mode: str):
+    started = time.perf_counter()
+    with _span("oracle", {"deity": deity, "source_model": source_model, "mode": mode}):
+        try:
+            yield
+        except BaseException:
+            ERRORS.labels("oracle").inc()
+            raise
+        finally:
+            ORACLE_LATENCY.labels(deity, source_model, mode).observe(time.perf_counter() - started)
+
+
+def timed_iteration(items, stage: str, op: str = ""):
+    """Yield from ``items``, recording the time spent producing them (not the consumer's) as one sample."""
+    elapsed = 0.0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration as stop:
+                return stop.value
+            except BaseException:
+                ERRORS.labels(stage).inc()
+                raise
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        items.close()
+        STAGE_LATENCY.labels(stage, op).observe(elapsed)
+
+
+def instrument_module(module, stage: str, names=None):
+    """Wrap a module's public functions so every call is timed under ``stage``.
+
+    Callers that go through the module attribute (``store.add_scroll(...)``)
+    pick up the wrapper; it must run before anything binds the functions directly.
+    Generator functions are timed over their whole iteration, not just the call.
+    """
+    import functools
+    import inspect
+    for name in names or [n for n in dir(module) if not n.startswith("_")]:
+        func = getattr(module, name)
+        if not inspect.isfunction(func) or func.__module__ != module.__name__:
+            continue
+
+        def wrap(func=func, name=name):
+            if inspect.isgeneratorfunction(func):
+                @functools.wraps(func)
+                def generator_wrapper(*args, **kwargs):
+                    return (yield from timed_iteration(func(*args, **kwargs), stage, name))
+                return generator_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with timed(stage, name):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        setattr(module, name, wrap())
+
+
+def render():
+    """(body, content type) for the /metrics endpoint."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request counts and latency per route template."""
+
+    def __init__(self, app, skip=("/metrics",)):
+        self.app = app
+        self.skip = set(skip)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with _span(f"{scope['method']} {scope['path']}"):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                # Route templates keep label cardinality bounded (/audio/{audio_name}, not every file)
+                path = getattr(route, "path", None) or ("/static" if scope["path"].startswith("/static/") else "unmatched")
+                HTTP_REQUESTS.labels(scope["method"], path, str(status)).inc()
+                HTTP_LATENCY.labels(scope["method"], path).observe(time.perf_counter() - started)
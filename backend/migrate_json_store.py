@@ -0,0 +1,92 @@
+"""Import the legacy JSON files (scroll_data.json, seekers.json, visitors.json) into SQLite.
+
+Runs automatically on app startup; can also be run by hand:
+
+    python migrate_json_store.py [--keep]
+
+Each imported file is renamed to ``<name>.migrated`` unless --keep is given.
+Rows are upserted by id, so running the import twice is harmless.
+"""
+import os
+import sys
+import json
+import store
+from database import DATA_DIR
+
+SCROLL_DB = os.path.join(DATA_DIR, "scroll_data.json")
+SEEKERS_DB = os.path.join(DATA_DIR, "seekers.json")
+VISITORS_DB = os.path.join(DATA_DIR, "visitors.json")
+
+SCROLL_FIELDS = ("scroll_id", "uploader_id", "filename", "safe_filename", "extracted_text", "timestamp")
+SEEKER_FIELDS = ("seeker_id", "created_at", "display_name", "title", "scroll_count",
+                 "donation_total", "influence_state", "eligibility_flags")
+VISITOR_FIELDS = ("created_at", "last_seen", "last_seen_date", "token_used_total",
+                  "token_used_today", "limit_state")
+
+def _load_json(path, expected_type):
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+            if isinstance(data, expected_type):
+                return data
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return None
+
+def _retire(path, keep):
+    if not keep and os.path.exists(path):
+        os.replace(path, path + ".migrated")
+
+def migrate_scrolls(path=SCROLL_DB, keep=False) -> int:
+    data = _load_json(path, list)
+    if data is None:
+        return 0
+    rows = [{k: s.get(k) for k in SCROLL_FIELDS} for s in data if s.get("scroll_id")]
+    for row in rows:
+        row["timestamp"] = row["timestamp"] or ""  # Listings page by timestamp; NULL would fall out
+    store.upsert_scrolls(rows)
+    _retire(path, keep)
+    return len(rows)
+
+def migrate_seekers(path=SEEKERS_DB, keep=False) -> int:
+    data = _load_json(path, dict)
+    if data is None:
+        return 0
+    rows = []
+    for seeker_id, seeker in data.items():
+        row = {k: seeker.get(k) for k in SEEKER_FIELDS}
+        row["seeker_id"] = seeker_id
+        row["scroll_count"] = row["scroll_count"] or 0
+        row["donation_total"] = row["donation_total"] or 0.0
+        row["eligibility_flags"] = row["eligibility_flags"] or []
+        rows.append(row)
+    store.upsert_seekers(rows)
+    _retire(path, keep)
+    return len(rows)
+
+def migrate_visitors(path=VISITORS_DB, keep=False) -> int:
+    data = _load_json(path, dict)
+    if data is None:
+        return 0
+    rows = []
+    for visitor_id, visitor in data.items():
+        row = {k: visitor.get(k) for k in VISITOR_FIELDS}
+        row["visitor_id"] = visitor_id
+        row["token_used_total"] = row["token_used_total"] or 0
+        row["token_used_today"] = row["token_used_today"] or 0
+        rows.append(row)
+    store.upsert_visitors(rows)
+    _retire(path, keep)
+    return len(rows)
+
+def migrate_all(keep=False) -> dict:
+    store.init_store()
+    return {
+        "scrolls": migrate_scrolls(keep=keep),
+        "seekers": migrate_seekers(keep=keep),
+        "visitors": migrate_visitors(keep=keep),
+    }
+
+if __name__ == "__main__":
+    counts = migrate_all(keep="--keep" in sys.argv[1:])
+    print(f"Imported {counts['scrolls']} scrolls, {counts['seekers']} seekers, {counts['visitors']} visitors.")
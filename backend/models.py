@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, JSON, ForeignKey, Index
+from sqlalchemy.orm import relationship
 from database import Base
 
 class ScrollUpload(Base):
@@ -19,3 +20,147 @@ class OracleQuestion(Base):
     timestamp = Column(DateTime)
     session_id = Column(String)
 
+
+def _status_dict(source) -> dict:
+    progress = None
+    if source.pages_total:
+        progress = round((source.pages_done or 0) / source.pages_total, 4)
+    elif source.status == "ready":
+        progress = 1.0
+    return {
+        "status": source.status,
+        "pages_total": source.pages_total,
+        "pages_done": source.pages_done or 0,
+        "progress": progress,
+        "error": source.error,
+    }
+
+class ScrollBlob(Base):
+    """One stored file per distinct content hash, extracted once however often it is uploaded."""
+    __tablename__ = "scroll_blobs"
+
+    sha256 = Column(String, primary_key=True)
+    stored_filename = Column(String, nullable=False)  # Relative to UPLOAD_DIR
+    size = Column(Integer)
+    created_at = Column(String)
+    extracted_text = Column(Text)
+    # Ingestion state: pending -> processing -> ready | failed
+    status = Column(String, default="pending", index=True)
+    pages_total = Column(Integer)
+    pages_done = Column(Integer, default=0)
+    error = Column(String)
+    owner = Column(String)  # WORKER_ID of the worker running (or queued to run) its ingestion
+
+    def to_dict(self):
+        return {
+            "sha256": self.sha256,
+            "stored_filename": self.stored_filename,
+            "size": self.size,
+            "created_at": self.created_at,
+            "status": self.status,
+            "owner": self.owner,
+        }
+
+class Scroll(Base):
+    __tablename__ = "scrolls"
+
+    scroll_id = Column(String, primary_key=True)
+    uploader_id = Column(String, index=True)
+    filename = Column(String)
+    safe_filename = Column(String)
+    extracted_text = Column(Text)
+    timestamp = Column(String, index=True)
+    blob_sha256 = Column(String, ForeignKey("scroll_blobs.sha256"), index=True)
+    # Text and ingestion state for scrolls stored before content addressing;
+    # scrolls with a blob read both from the blob instead.
+    status = Column(String, default="ready", index=True)
+    pages_total = Column(Integer)
+    pages_done = Column(Integer, default=0)
+    error = Column(String)
+
+    blob = relationship(ScrollBlob, lazy="joined")
+
+    # Keyset pagination walks (timestamp, scroll_id), optionally within one uploader
+    __table_args__ = (
+        Index("ix_scrolls_page", "timestamp", "scroll_id"),
+        Index("ix_scrolls_uploader_page", "uploader_id", "timestamp", "scroll_id"),
+    )
+
+    def to_dict(self):
+        source = self.blob or self
+        return {
+            "scroll_id": self.scroll_id,
+            "uploader_id": self.uploader_id,
+            "filename": self.filename,
+            "safe_filename": self.safe_filename,
+            "sha256": self.blob_sha256,
+            "extracted_text": source.extracted_text,
+            "timestamp": self.timestamp,
+            "status": source.status,
+        }
+
+    def status_dict(self):
+        return {
+            "scroll_id": self.scroll_id,
+            "filename": self.filename,
+            "sha256": self.blob_sha256,
+            **_status_dict(self.blob or self),
+        }
+
+class StoreCounter(Base):
+    """Running totals kept in step with the rows they describe, so reading one never scans a table."""
+    __tablename__ = "store_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0, nullable=False)
+
+class Seeker(Base):
+    __tablename__ = "seekers"
+
+    seeker_id = Column(String, primary_key=True)
+    created_at = Column(String)
+    display_name = Column(String)
+    title = Column(String, default="Seeker")
+    scroll_count = Column(Integer, default=0, nullable=False)
+    donation_total = Column(Float, default=0.0, nullable=False)
+    influence_state = Column(String, default="disabled")
+    eligibility_flags = Column(JSON, default=list)
+    token_used_total = Column(Integer, default=0, nullable=False)
+    token_used_today = Column(Integer, default=0, nullable=False)
+    token_usage_date = Column(String)
+
+    def to_dict(self):
+        return {
+            "seeker_id": self.seeker_id,
+            "created_at": self.created_at,
+            "display_name": self.display_name,
+            "title": self.title,
+            "scroll_count": self.scroll_count,
+            "donation_total": self.donation_total,
+            "influence_state": self.influence_state,
+            "eligibility_flags": self.eligibility_flags or [],
+            "token_used_total": self.token_used_total,
+            "token_used_today": self.token_used_today,
+            "token_usage_date": self.token_usage_date,
+        }
+
+class Visitor(Base):
+    __tablename__ = "visitors"
+
+    visitor_id = Column(String, primary_key=True)
+    created_at = Column(String)
+    last_seen = Column(String)
+    last_seen_date = Column(String)
+    token_used_total = Column(Integer, default=0, nullable=False)
+    token_used_today = Column(Integer, default=0, nullable=False)
+    limit_state = Column(String, default="ok")
+
+    def to_dict(self):
+        return {
+            "created_at": self.created_at,
+            "last_seen": self.last_seen,
+            "last_seen_date": self.last_seen_date,
+            "token_used_total": self.token_used_total,
+            "token_used_today": self.token_used_today,
+            "limit_state": self.limit_state,
+        }
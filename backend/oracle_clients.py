@@ -0,0 +1,79 @@
+"""App-scoped upstream clients for the oracle backends.
+
+One connection-pooled ``httpx.AsyncClient`` (HTTP/2 + keep-alive) is shared by
+the xAI calls and the ``AsyncOpenAI`` client, so repeat requests reuse warm
+TLS connections instead of paying a handshake each time. Both are created on
+first use and closed by ``close_clients()`` on shutdown; the openai package
+itself is only imported then, since a worker may never serve Moses.
+"""
+import os
+import httpx
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("ORACLE_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("ORACLE_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("ORACLE_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("ORACLE_HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("ORACLE_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_CONNECT_RETRIES = int(os.getenv("ORACLE_HTTP_CONNECT_RETRIES", "2"))
+HTTP2_ENABLED = os.getenv("ORACLE_HTTP2", "true").lower() == "true"
+# Chat calls are retried by the per-deity governors (governor.py), so the client does not retry by default
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0"))
+
+_http_client = None
+_openai_client = None
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None:
+        http2 = HTTP2_ENABLED and _http2_available()
+        # Pool limits live on the transport; retries only cover failed connects, never a sent request.
+        transport = httpx.AsyncHTTPTransport(
+            http2=http2,
+            retries=HTTP_CONNECT_RETRIES,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _http_client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        )
+    return _http_client
+
+def get_openai_client() -> "AsyncOpenAI":
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not set")
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=HTTP_TIMEOUT,
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=get_http_client(),
+        )
+    return _openai_client
+
+async def close_clients():
+    global _http_client, _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
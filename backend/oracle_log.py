@@ -0,0 +1,310 @@
+"""Append-only oracle log.
+
+Entries are written as JSON lines into segment files under a log directory.
+A single background thread drains an in-memory queue, batches entries and
+appends them with one write per batch, so request handlers never touch the
+disk. Segments rotate once they grow past a size limit and are never
+rewritten, which keeps each append O(1) regardless of how large the corpus
+becomes.
+
+Entries are compact: fields that only change with the phase or configuration
+(the architect's constant state, phase, corpus_intent, ...) form a *profile*,
+stored once under profiles/<id>.json, where the id is a hash of its content.
+An entry carries only its per-request values and ``log_profile: <id>``, and
+a nested dict in it only holds what differs from the profile.
+``iter_log_entries`` and ``expand_entry`` merge the profile back in, so
+readers see the full entry shape. Entries without a profile (older segments)
+are read as they are.
+"""
+import os
+import json
+import time
+import queue
+import hashlib
+import threading
+import datetime
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+SEGMENT_PREFIX = "oracle-"
+SEGMENT_SUFFIX = ".jsonl"
+LEGACY_SEGMENT = f"{SEGMENT_PREFIX}00000000T000000000000-legacy{SEGMENT_SUFFIX}"
+PROFILE_DIR = "profiles"
+PROFILE_KEY = "log_profile"
+
+_FLUSH = object()
+_STOP = object()
+
+
+def _segment_name() -> str:
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    return f"{SEGMENT_PREFIX}{stamp}-{os.getpid()}{SEGMENT_SUFFIX}"
+
+
+def _serialize(entry: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(entry, default=str, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def profile_id(profile: dict) -> str:
+    """Content hash of a profile: the same constant fields always get the same id."""
+    canonical = json.dumps(profile, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def save_profile(log_dir: str, profile: dict) -> str:
+    """Store a profile in the log directory unless it is already there. Returns its id.
+
+    Workers with the same configuration write the same file, so whichever
+    rename lands last changes nothing.
+    """
+    pid = profile_id(profile)
+    path = os.path.join(log_dir, PROFILE_DIR, f"{pid}.json")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    return pid
+
+
+class LogProfiles:
+    """The profiles of one log directory, each read on first use."""
+
+    def __init__(self, log_dir: str):
+        self.log_dir = log_dir
+        self._profiles = {}
+
+    def get(self, pid: str):
+        if pid not in self._profiles:
+            try:
+                with open(os.path.join(self.log_dir, PROFILE_DIR, f"{pid}.json"), "rb") as f:
+                    self._profiles[pid] = _loads(f.read())
+            except FileNotFoundError:
+                return None  # Not cached: it may yet be written by a worker starting up
+        return self._profiles[pid]
+
+
+def merge_profile(base: dict, inline: dict) -> dict:
+    """``inline`` laid over ``base``, nested dicts merged key by key.
+
+    Builds new dicts all the way down, so callers may modify what they get.
+    """
+    merged = {}
+    for key, value in base.items():
+        if isinstance(value, dict):
+            override = inline.get(key)
+            value = merge_profile(value, override if isinstance(override, dict) else {})
+        merged[key] = value
+    for key, value in inline.items():
+        if not (isinstance(value, dict) and isinstance(base.get(key), dict)):
+            merged[key] = value
+    return merged
+
+
+def expand_entry(entry: dict, profiles: LogProfiles) -> dict:
+    """The full entry a compact one stands for. Entries without a (known) profile come back unchanged."""
+    pid = entry.get(PROFILE_KEY) if isinstance(entry, dict) else None
+    profile = profiles.get(pid) if pid else None
+    if profile is None:
+        return entry
+    return merge_profile(profile, {k: v for k, v in entry.items() if k != PROFILE_KEY})
+
+
+class OracleLogWriter:
+    """Batches log entries on a background thread into rotating JSONL segments."""
+
+    def __init__(self, log_dir: str, segment_max_bytes: int = 64 * 1024 * 1024,
+                 flush_interval: float = 0.5, batch_size: int = 256,
+                 max_pending: int = 10000, fsync: bool = False, profile: dict = None,
+                 put_timeout: float = 1.0):
+        self.log_dir = log_dir
+        # Entries reference the profile by this id; it is saved when the writer starts
+        self.profile = profile
+        self.profile_id = profile_id(profile) if profile is not None else None
+        self.segment_max_bytes = segment_max_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.put_timeout = put_timeout  # Longest a write waits for room in the queue
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0  # Entries given up on because the queue stayed full
+        self._warned_at = None
+        self._thread = None
+        self._file = None
+        self._segment_bytes = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.log_dir, exist_ok=True)
+        if self.profile is not None:
+            save_profile(self.log_dir, self.profile)
+        self._thread = threading.Thread(target=self._run, name="oracle-log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, entry: dict) -> bool:
+        """Queue an entry for the writer thread, waiting at most ``put_timeout`` for room.
+
+        If the queue stays full (the disk is not keeping up) the entry is
+        dropped, counted in ``dropped`` and False returned, so a stalled disk
+        cannot hold up answers indefinitely.
+        """
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put(entry, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+                dropped = self.dropped
+                now = time.monotonic()
+                warn = self._warned_at is None or now - self._warned_at >= 10
+                if warn:
+                    self._warned_at = now
+            if warn:
+                print(f"⚠️ Oracle log queue full for {self.put_timeout}s, {dropped} entries dropped so far")
+            return False
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until everything queued so far has been written. False if ``timeout`` passed first."""
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    def close(self, timeout: float = 10):
+        """Write what is queued and stop, waiting at most ``timeout`` seconds."""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print(f"⚠️ Oracle log writer did not drain within {timeout}s; {self._queue.qsize()} entries unwritten")
+            self._thread = None
+            return
+        self._thread.join(max(0, deadline - time.monotonic()))
+        self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, tuple) and item and item[0] is _FLUSH:
+                    waiters.append(item[1])
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=self.flush_interval if batch else 0)
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._append(batch)
+                except Exception as e:
+                    print("⚠️ Logging failed:", e)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._close_segment()
+                return
+
+    def _append(self, batch):
+        data = b"".join(_serialize(entry) for entry in batch)
+        if self._file is None or self._segment_bytes >= self.segment_max_bytes:
+            self._open_segment()
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._segment_bytes += len(data)
+
+    def _open_segment(self):
+        self._close_segment()
+        path = os.path.join(self.log_dir, _segment_name())
+        self._file = open(path, "ab")
+        self._segment_bytes = self._file.tell()
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def list_segments(log_dir: str) -> list:
+    """Return segment paths in write order (oldest first)."""
+    try:
+        names = os.listdir(log_dir)
+    except FileNotFoundError:
+        return []
+    names = sorted(n for n in names if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+    return [os.path.join(log_dir, n) for n in names]
+
+
+def iter_segment(path: str, profiles: LogProfiles = None):
+    """Yield entries from one segment, skipping a torn trailing line.
+
+    With ``profiles``, compact entries are expanded; without, they are yielded as stored.
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = _loads(line)
+            except ValueError:
+                continue
+            yield expand_entry(entry, profiles) if profiles is not None else entry
+
+
+def iter_log_entries(log_dir: str, expand: bool = True):
+    """Yield every logged entry, oldest segment first, in full shape unless ``expand`` is False."""
+    profiles = LogProfiles(log_dir) if expand else None
+    for path in list_segments(log_dir):
+        yield from iter_segment(path, profiles)
+
+
+def migrate_json_log(legacy_path: str, log_dir: str) -> int:
+    """One-time import of the old JSON-array oracle_log.json into a segment.
+
+    The legacy file is renamed to ``<name>.migrated`` afterwards so the import
+    never runs twice. Returns the number of migrated entries.
+    """
+    if not os.path.exists(legacy_path):
+        return 0
+    os.makedirs(log_dir, exist_ok=True)
+    target = os.path.join(log_dir, LEGACY_SEGMENT)
+    count = 0
+    if not os.path.exists(target):
+        with open(legacy_path, "r") as f:
+            content = f.read().strip()
+        entries = json.loads(content) if content else []
+        tmp_path = target + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for entry in entries:
+                f.write(_serialize(entry))
+        os.replace(tmp_path, target)
+        count = len(entries)
+    os.replace(legacy_path, legacy_path + ".migrated")
+    return count
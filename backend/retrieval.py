@@ -0,0 +1,198 @@
+"""Semantic retrieval over uploaded scrolls.
+
+Scroll text is split into overlapping chunks, embedded locally with Chroma's
+default ONNX MiniLM model and kept in a persistent HNSW index under
+temple_memory/. Scrolls are added or removed incrementally; a question is
+answered with its top-k passages plus the best similarity scores that feed the
+``personal_retrieval_score`` / ``global_retrieval_score`` log fields.
+"""
+import os
+import re
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_DIR = os.path.join(os.getenv("TEMPLE_DATA_DIR", BASE_DIR), "temple_memory")
+COLLECTION_NAME = "scroll_chunks"
+
+
+def chunk_text(text: str, chunk_chars: int = 1200, overlap: int = 200) -> list:
+    """Split text into ~chunk_chars pieces, breaking on whitespace and overlapping by ``overlap``."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_chars)
+        if end < len(text):
+            space = text.rfind(" ", start + chunk_chars // 2, end)
+            if space != -1:
+                end = space
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in chunks if c]
+
+
+class ScrollIndex:
+    """Persistent vector index of scroll chunks."""
+
+    def __init__(self, path: str = DEFAULT_INDEX_DIR, chunk_chars: int = 1200, overlap: int = 200,
+                 embedding_function=None, server_url: str = None):
+        self.path = path
+        self.server_url = server_url  # A Chroma server shared by every worker, instead of files under path
+        self.embedding_function = embedding_function  # None = Chroma's local ONNX MiniLM
+        self.chunk_chars = chunk_chars
+        self.overlap = overlap
+        self._client = None
+        self._collection = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, path: str = DEFAULT_INDEX_DIR) -> "ScrollIndex":
+        """The index as the app configures it through RETRIEVAL_* settings."""
+        return cls(
+            path,
+            chunk_chars=int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1200")),
+            overlap=int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "200")),
+            server_url=os.getenv("RETRIEVAL_CHROMA_URL"),
+        )
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    self._client = self._client or self._make_client()
+                    kwargs = {"embedding_function": self.embedding_function} if self.embedding_function else {}
+                    self._collection = self._client.get_or_create_collection(
+                        COLLECTION_NAME, metadata={"hnsw:space": "cosine"}, **kwargs
+                    )
+        return self._collection
+
+    @property
+    def remote(self) -> bool:
+        return bool(self.server_url)
+
+    def _make_client(self):
+        import chromadb
+        if self.server_url:
+            from urllib.parse import urlparse
+            url = urlparse(self.server_url)
+            return chromadb.HttpClient(host=url.hostname, port=url.port or (443 if url.scheme == "https" else 8000),
+                                       ssl=url.scheme == "https")
+        return chromadb.PersistentClient(path=self.path)
+
+    def embed(self, texts: list) -> list:
+        """Embed texts with the same local model the index uses."""
+        if self.embedding_function is None:
+            from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+            self.embedding_function = DefaultEmbeddingFunction()
+        return self.embedding_function(texts)
+
+    def add_scroll(self, scroll_id: str, uploader_id: str, filename: str, text: str, source_id: str = None) -> int:
+        """Index (or re-index) one scroll. Returns the number of chunks stored.
+
+        ``source_id`` identifies the content (its hash); scrolls sharing it reuse
+        the chunks and embeddings already computed instead of embedding again.
+        """
+        source_id = source_id or scroll_id
+        self.delete_scroll(scroll_id)
+        chunks, embeddings = self._existing_chunks(source_id)
+        if not chunks:
+            chunks = chunk_text(text, self.chunk_chars, self.overlap)
+        if not chunks:
+            return 0
+        kwargs = {"embeddings": embeddings} if embeddings is not None else {}
+        self.collection.upsert(
+            ids=[f"{scroll_id}:{i}" for i in range(len(chunks))],
+            documents=chunks,
+            metadatas=[
+                {"scroll_id": scroll_id, "source_id": source_id, "uploader_id": uploader_id or "",
+                 "filename": filename or "", "chunk": i}
+                for i in range(len(chunks))
+            ],
+            **kwargs,
+        )
+        return len(chunks)
+
+    def _existing_chunks(self, source_id: str):
+        existing = self.collection.get(where={"source_id": source_id}, include=["documents", "metadatas", "embeddings"])
+        if not existing["ids"]:
+            return [], None
+        # Several scrolls may share the source; copy the chunks of just one of them
+        first = existing["metadatas"][0]["scroll_id"]
+        rows = sorted(
+            (meta["chunk"], doc, emb)
+            for doc, meta, emb in zip(existing["documents"], existing["metadatas"], existing["embeddings"])
+            if meta["scroll_id"] == first
+        )
+        return [doc for _, doc, _ in rows], [list(emb) for _, _, emb in rows]
+
+    def delete_scroll(self, scroll_id: str):
+        self.collection.delete(where={"scroll_id": scroll_id})
+
+    def delete_source(self, source_id: str):
+        """Drop every scroll's chunks of one content, e.g. before re-indexing changed text."""
+        self.collection.delete(where={"source_id": source_id})
+
+    def clear(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._make_client()
+            try:
+                self._client.delete_collection(COLLECTION_NAME)
+            except Exception:
+                pass
+            self._collection = None
+
+    def indexed_scroll_ids(self) -> set:
+        metadatas = self.collection.get(include=["metadatas"])["metadatas"] or []
+        return {m["scroll_id"] for m in metadatas if m}
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def _search(self, question: str, k: int, where: dict = None) -> list:
+        available = self.collection.count()
+        if available == 0:
+            return []
+        # Over-fetch so passages repeated across identical uploads can be collapsed
+        result = self.collection.query(
+            query_texts=[question],
+            n_results=min(k * 3, available),
+            where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+        passages = []
+        seen = set()
+        for doc, meta, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0]):
+            key = (meta.get("source_id") or meta.get("scroll_id"), meta.get("chunk"))
+            if key in seen:
+                continue
+            seen.add(key)
+            passages.append({
+                "scroll_id": meta.get("scroll_id"),
+                "uploader_id": meta.get("uploader_id"),
+                "filename": meta.get("filename"),
+                "chunk": meta.get("chunk"),
+                "text": doc,
+                "score": round(1.0 - distance, 4),  # cosine similarity
+            })
+        return passages[:k]
+
+    def query(self, question: str, k: int = 4, uploader_id: str = None) -> dict:
+        """Top-k passages for a question, with the best global and personal similarity."""
+        passages = self._search(question, k)
+        personal_score = None
+        if uploader_id:
+            own = [p for p in passages if p.get("uploader_id") == uploader_id]
+            if not own:
+                own = self._search(question, 1, where={"uploader_id": uploader_id})
+            personal_score = own[0]["score"] if own else None
+        return {
+            "passages": passages,
+            "global_retrieval_score": passages[0]["score"] if passages else None,
+            "personal_retrieval_score": personal_score,
+        }
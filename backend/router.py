@@ -0,0 +1,160 @@
+"""Shadow router: suggests which oracle a question belongs to, without acting on it.
+
+The keyword model is compiled once into a vocabulary holding every inflected
+form of every keyword (``command`` -> "commands", "commandments", ...) mapped
+to its feature number. Scoring is one tokenizing regex pass over the text and
+a hash lookup per word, and a feature-by-oracle weight matrix turns the
+counts into per-oracle scores with NumPy. Keywords therefore match whole
+words only: ``god`` matches "godly" but not "goddess", ``sin`` not "since".
+
+Retrieved scroll passages count too, at a lower weight than the question.
+
+``score_batch`` scores many texts in one matrix product for offline
+evaluation against historical logs:
+
+    python router.py evaluate            # agreement with the oracle seekers chose
+    python router.py evaluate --limit 100000 --log-dir /path/to/oracle_log
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import numpy as np
+
+PHASE = "3.0"
+
+# oracle -> (keywords, reason given when it wins)
+DEFAULT_MODEL = {
+    "Hathor": (("love", "joy", "beauty", "emotion", "heart"),
+               "Question contains poetic or emotional keywords aligning with Hathor's domain"),
+    "Moses": (("law", "command", "sin", "righteous", "god"),
+              "Question contains doctrinal or moral keywords aligning with Moses' domain"),
+}
+SUFFIXES = ("s", "es", "d", "ed", "ing", "al", "ally", "ly", "ful", "ness", "ment", "ments", "'s")
+NO_SIGNAL_REASON = "No strong stylistic indicators detected"
+TIE_REASON = "Keywords for several oracles carry equal weight"
+_WORD = re.compile(r"\w+(?:'s)?")
+
+
+class ShadowRouter:
+    """A compiled keyword model scoring texts against each oracle."""
+
+    def __init__(self, model: dict = None, scroll_weight: float = 0.25):
+        model = model or DEFAULT_MODEL
+        self.oracles = list(model)
+        self.reasons = {oracle: reason for oracle, (_, reason) in model.items()}
+        self.scroll_weight = scroll_weight
+        self.features = [keyword.lower() for keywords, _ in model.values() for keyword in keywords]
+        self.weights = np.zeros((len(self.features), len(self.oracles)))
+        self.vocabulary = {}  # Every accepted word form -> feature number
+        index = 0
+        for oracle_index, (keywords, _) in enumerate(model.values()):
+            for keyword in keywords:
+                self.weights[index, oracle_index] = 1.0
+                for suffix in ("",) + SUFFIXES:
+                    self.vocabulary.setdefault(keyword.lower() + suffix, index)
+                index += 1
+
+    def feature_ids(self, text: str) -> list:
+        vocabulary = self.vocabulary
+        return [vocabulary[word] for word in _WORD.findall(text.lower()) if word in vocabulary] if text else []
+
+    def feature_counts(self, text: str) -> np.ndarray:
+        return np.bincount(self.feature_ids(text), minlength=len(self.features)).astype(float)
+
+    def scores(self, question: str, passages: list = None) -> np.ndarray:
+        counts = self.feature_counts(question)
+        if passages and self.scroll_weight:
+            counts += self.scroll_weight * self.feature_counts(" ".join(p.get("text") or "" for p in passages))
+        return counts @ self.weights
+
+    def observe(self, question: str, passages: list = None) -> dict:
+        """The shadow observation logged with each answer."""
+        scores = self.scores(question, passages)
+        suggested, confidence, reason = self._decide(scores)
+        return {
+            "suggested_oracle": suggested,
+            "confidence": confidence,
+            "reason": reason,
+            "scores": {oracle: round(float(s), 3) for oracle, s in zip(self.oracles, scores)},
+            "phase": PHASE,
+            "mode": "shadow",
+        }
+
+    def _decide(self, scores: np.ndarray):
+        if not scores.any():
+            return "none", 0.5, NO_SIGNAL_REASON
+        order = np.argsort(scores)[::-1]
+        margin = float(scores[order[0]] - (scores[order[1]] if len(order) > 1 else 0))
+        if margin == 0:
+            return "none", 0.5, TIE_REASON
+        best = self.oracles[order[0]]
+        # One keyword of margin gives ~0.8, more evidence approaches 1
+        return best, round(1 - 0.5 * float(np.exp(-margin)), 3), self.reasons[best]
+
+    def score_batch(self, texts: list) -> np.ndarray:
+        """(len(texts), len(oracles)) scores in a single matrix product."""
+        width = len(self.features)
+        cells = [row * width + feature for row, text in enumerate(texts) for feature in self.feature_ids(text)]
+        counts = np.bincount(np.array(cells, dtype=np.intp), minlength=len(texts) * width)
+        return counts.reshape(len(texts), width).astype(float) @ self.weights
+
+    def suggest_batch(self, texts: list) -> list:
+        """Suggested oracle (or "none") per text, as ``observe`` would decide without passages."""
+        scores = self.score_batch(texts)
+        ranked = np.sort(scores, axis=1)
+        decided = ranked[:, -1] > (ranked[:, -2] if scores.shape[1] > 1 else 0)
+        best = scores.argmax(axis=1)
+        return [self.oracles[b] if d else "none" for b, d in zip(best, decided)]
+
+
+def evaluate(entries, router: ShadowRouter = None, batch_size: int = 10000, limit: int = None) -> dict:
+    """Compare suggestions with the oracle each logged question was actually put to."""
+    router = router or ShadowRouter()
+    confusion = {}
+    total = 0
+    batch = []
+
+    def flush():
+        for (question, chosen), suggested in zip(batch, router.suggest_batch([q for q, _ in batch])):
+            row = confusion.setdefault(chosen, {})
+            row[suggested] = row.get(suggested, 0) + 1
+        batch.clear()
+
+    for entry in entries:
+        if limit is not None and total >= limit:
+            break
+        if not entry.get("question"):
+            continue
+        batch.append((entry["question"], entry.get("oracle_used")))
+        total += 1
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    decided = sum(n for row in confusion.values() for s, n in row.items() if s != "none")
+    agreed = sum(row.get(chosen, 0) for chosen, row in confusion.items())
+    return {
+        "entries": total,
+        "coverage": round(decided / total, 4) if total else None,  # Share with a suggestion at all
+        "agreement": round(agreed / decided, 4) if decided else None,  # Of those, share matching the seeker
+        "confusion": confusion,  # chosen oracle -> suggested oracle -> count
+    }
+
+
+def main(argv=None) -> int:
+    from oracle_log import iter_log_entries
+    from database import DATA_DIR
+    parser = argparse.ArgumentParser(description="Offline evaluation of the shadow router")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("evaluate", help="Score the logged questions and compare with the chosen oracle")
+    command.add_argument("--log-dir", help="Oracle log directory (defaults to the app's)")
+    command.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+    log_dir = args.log_dir or os.path.join(DATA_DIR, "oracle_log")
+    print(json.dumps(evaluate(iter_log_entries(log_dir), limit=args.limit), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""Offline maintenance of the scroll corpus: re-extraction, reindexing and consistency checks.
+
+    python scroll_maintenance.py reextract                     # every stored file, on all cores
+    python scroll_maintenance.py reextract --status failed     # only what failed before
+    python scroll_maintenance.py reextract --resume            # continue an interrupted run
+    python scroll_maintenance.py reindex [--full]
+    python scroll_maintenance.py check [--fix]
+    python scroll_maintenance.py dump-index [--scroll-id ID]
+
+``reextract`` re-runs text extraction for the files under scrolls_uploads/
+that the store refers to, one file per task on a process pool, and writes
+each result back to the store as it arrives. Completed files are recorded in a
+checkpoint, so an interrupted run picks up where it stopped with --resume.
+Scrolls whose text changed are re-indexed at the end.
+
+``reindex`` indexes every scroll missing from the retrieval index and drops
+entries for scrolls that no longer exist; --full rebuilds the index first.
+
+``check`` reports, one kind at a time, what ``reset_scroll_system`` can only
+wipe wholesale: files no row refers to, rows whose file is gone, blobs no
+scroll uses, leftover partial uploads and index entries out of step with the
+store. --fix removes the orphans and indexes missing scrolls; rows whose file
+is gone are only reported, as nothing short of a new upload restores them.
+
+It can run next to the app: blobs a live worker is still extracting are left
+to it, and orphans younger than --grace are kept, since an upload writes its
+file a moment before its row. The embedded index takes a single writer, so
+stop the app (or share a server via RETRIEVAL_CHROMA_URL) before ``reindex``.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import store
+import extraction
+from database import DATA_DIR
+from coordination import WORKER_ID, hold_worker_lock, release_worker_lock, worker_alive
+
+UPLOAD_DIR = os.path.join(DATA_DIR, "scrolls_uploads")
+INCOMING_DIR = os.path.join(UPLOAD_DIR, ".incoming")
+CHECKPOINT = os.path.join(DATA_DIR, "reextract.checkpoint.json")
+CHECKPOINT_EVERY = 50  # Results between checkpoint writes
+GRACE_SECONDS = 3600
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+UNFINISHED = ("pending", "processing")
+SAMPLE = 10  # Items listed per problem in a check report
+
+
+class Progress:
+    """Prints done/total, rate and time left, at most every ``interval`` seconds."""
+
+    def __init__(self, label: str, total: int, interval: float = 2.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.started = self._printed = time.perf_counter()
+
+    def advance(self, amount: int = 1):
+        self.done += amount
+        now = time.perf_counter()
+        if now - self._printed < self.interval and self.done < self.total:
+            return
+        self._printed = now
+        rate = self.done / max(now - self.started, 1e-9)
+        left = (self.total - self.done) / rate if rate else 0
+        print(f"{self.label}: {self.done}/{self.total} ({self.done / max(self.total, 1):.0%}), "
+              f"{rate:.1f}/s, {left:.0f}s left", flush=True)
+
+
+def _extract(key: str, path: str):
+    # Runs in a pool process
+    try:
+        units, text = extraction.extract_document(path)
+        return key, units, text, None
+    except Exception as e:
+        return key, None, None, f"{type(e).__name__}: {e}"
+
+
+def reextract_jobs(statuses=None) -> list:
+    """(key, path) for every stored file to extract: blobs as ``blob:<sha256>``, legacy scrolls as ``scroll:<id>``.
+
+    Unfinished blobs are claimed for this process first, so the app's leader
+    does not queue them again meanwhile; those a live worker owns are skipped.
+    """
+    jobs = []
+    for blob in store.list_blobs():
+        if statuses and blob["status"] not in statuses:
+            continue
+        if blob["status"] in UNFINISHED:
+            owner = blob["owner"]
+            if owner is not None and owner != WORKER_ID and worker_alive(owner):
+                continue
+            if not store.claim_blob(blob["sha256"], WORKER_ID, owner):
+                continue
+        jobs.append((f"blob:{blob['sha256']}", os.path.join(UPLOAD_DIR, blob["stored_filename"])))
+    for scroll_id, safe_filename, status in store.list_legacy_scrolls():
+        if safe_filename and not (statuses and status not in statuses):
+            jobs.append((f"scroll:{scroll_id}", os.path.join(UPLOAD_DIR, safe_filename)))
+    return jobs
+
+
+def _store_result(key: str, units: int, text: str, error: str) -> bool:
+    """Write one extraction result. Returns True if the scroll text changed."""
+    kind, ident = key.split(":", 1)
+    if kind == "scroll":
+        return store.replace_scroll_text(ident, text, units, error)
+    if error is not None:
+        store.finish_blob_ingestion(ident, error)
+        return False
+    return store.replace_blob_text(ident, text, units)
+
+
+def _load_checkpoint():
+    try:
+        with open(CHECKPOINT) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(checkpoint: dict):
+    with open(CHECKPOINT + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(CHECKPOINT + ".tmp", CHECKPOINT)
+
+
+def reextract(workers: int = None, statuses=None, resume: bool = False, reindex_changed: bool = True) -> dict:
+    """Extract every stored file again on a process pool and store the results."""
+    store.init_store()
+    hold_worker_lock()  # Lets the leader tell our claimed blobs from orphans
+    try:
+        checkpoint = (_load_checkpoint() if resume else None) or {
+            "started": str(datetime.datetime.now()), "statuses": statuses, "done": [], "changed": []}
+        statuses = checkpoint["statuses"]
+        done, changed = set(checkpoint["done"]), set(checkpoint["changed"])
+        jobs = [job for job in reextract_jobs(statuses) if job[0] not in done]
+        progress = Progress("reextract", len(jobs))
+        workers = max(1, workers or os.cpu_count() or 1)
+        failed = 0
+        already_done = saved = len(done)
+        started = time.perf_counter()
+
+        def save():
+            checkpoint.update(done=sorted(done), changed=sorted(changed))
+            _save_checkpoint(checkpoint)
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            queued = iter(jobs)
+            running = set()
+
+            def fill():
+                # A bounded window keeps memory flat however many files there are
+                while len(running) < workers * 2:
+                    job = next(queued, None)
+                    if job is None:
+                        return
+                    running.add(pool.submit(_extract, *job))
+
+            fill()
+            while running:
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key, units, text, error = future.result()
+                    if error is not None:
+                        failed += 1
+                        print(f"{key}: {error}")
+                    if _store_result(key, units, text, error):
+                        changed.add(key)
+                    done.add(key)
+                    progress.advance()
+                if len(done) - saved >= CHECKPOINT_EVERY:
+                    save()
+                    saved = len(done)
+                fill()
+        save()
+
+        indexed = reindex_scrolls(changed) if reindex_changed and RETRIEVAL_ENABLED and changed else 0
+        os.remove(CHECKPOINT)
+        return {"extracted": len(jobs), "already_done": already_done, "failed": failed, "changed": len(changed),
+                "reindexed": indexed, "workers": workers, "seconds": round(time.perf_counter() - started, 2)}
+    finally:
+        release_worker_lock()
+
+
+def _index_scroll(index, scroll: dict) -> bool:
+    if not scroll["extracted_text"]:
+        return False
+    index.add_scroll(scroll["scroll_id"], scroll["uploader_id"], scroll["filename"], scroll["extracted_text"],
+                     source_id=scroll["sha256"] or scroll["scroll_id"])
+    return True
+
+
+def reindex_scrolls(keys, index=None) -> int:
+    """Replace the indexed chunks of re-extracted blobs and scrolls (``reextract`` keys)."""
+    from retrieval import ScrollIndex
+    index = index or ScrollIndex.from_env()
+    indexed = 0
+    for key in sorted(keys):
+        kind, ident = key.split(":", 1)
+        if kind == "blob":
+            # Chunks are shared by content, so the old text must go before any scroll is re-added
+            index.delete_source(ident)
+            scrolls = store.list_scrolls_for_blob(ident)
+        else:
+            scrolls = [scroll for scroll in [store.get_scroll(ident)] if scroll]
+        for scroll in scrolls:
+            indexed += _index_scroll(index, scroll)
+    return indexed
+
+
+def _sync_index(index) -> dict:
+    """Drop index entries of deleted scrolls and index the scrolls it is missing."""
+    indexed = index.indexed_scroll_ids()
+    stale = indexed - store.scroll_ids()
+    for scroll_id in stale:
+        index.delete_scroll(scroll_id)
+    missing = [row for row in store.iter_scroll_texts() if row[0] not in indexed and row[3]]
+    progress = Progress("reindex", len(missing))
+    for scroll_id, uploader_id, filename, text, source_id in missing:
+        index.add_scroll(scroll_id, uploader_id, filename, text, source_id=source_id)
+        progress.advance()
+    return {"removed": len(stale), "added": len(missing)}
+
+
+def reindex(full: bool = False) -> dict:
+    """Bring the retrieval index in line with the store; ``full`` rebuilds it from nothing."""
+    from retrieval import ScrollIndex
+    store.init_store()
+    index = ScrollIndex.from_env()
+    started = time.perf_counter()
+    if full:
+        index.clear()
+    result = _sync_index(index)
+    return {**result, "chunks": index.count(), "seconds": round(time.perf_counter() - started, 2)}
+
+
+def _older_than(path: str, cutoff: float) -> bool:
+    try:
+        return os.path.getmtime(path) < cutoff
+    except OSError:
+        return False
+
+
+def _index_problems(index) -> dict:
+    indexed = index.indexed_scroll_ids()
+    return {
+        "index_entries_without_scroll": sorted(indexed - store.scroll_ids()),
+        "scrolls_missing_from_index": sorted(row[0] for row in store.iter_scroll_texts()
+                                             if row[0] not in indexed and row[3]),
+    }
+
+
+def check(fix: bool = False, grace: float = GRACE_SECONDS, index=None) -> dict:
+    """Find orphaned files and rows (and, with ``fix``, remove them). Returns problem -> items."""
+    store.init_store()
+    cutoff = time.time() - grace
+    blobs = store.list_blobs()
+    legacy = store.list_legacy_scrolls()
+    referenced = {os.path.normpath(b["stored_filename"]) for b in blobs}
+    referenced |= {os.path.normpath(name) for _, name, _ in legacy if name}
+
+    orphan_files, partial_uploads = [], []
+    for root, _, files in os.walk(UPLOAD_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, UPLOAD_DIR)
+            if not _older_than(path, cutoff):
+                continue
+            if os.path.commonpath([path, INCOMING_DIR]) == INCOMING_DIR:
+                partial_uploads.append(relative)
+            elif relative not in referenced:
+                orphan_files.append(relative)
+
+    created_cutoff = str(datetime.datetime.fromtimestamp(cutoff))
+    problems = {
+        "files_without_row": sorted(orphan_files),
+        "partial_uploads": sorted(partial_uploads),
+        "blobs_without_scroll": sorted(b["sha256"] for b in store.list_unreferenced_blobs()
+                                       if (b["created_at"] or "") < created_cutoff),
+        "blobs_missing_file": sorted(b["sha256"] for b in blobs
+                                     if not os.path.exists(os.path.join(UPLOAD_DIR, b["stored_filename"]))),
+        "scrolls_missing_file": sorted(scroll_id for scroll_id, name, _ in legacy
+                                       if not name or not os.path.exists(os.path.join(UPLOAD_DIR, name))),
+    }
+    if RETRIEVAL_ENABLED:
+        from retrieval import ScrollIndex
+        index = index or ScrollIndex.from_env()
+        if index.remote or os.path.isdir(index.path):
+            problems.update(_index_problems(index))
+
+    if fix:
+        for relative in problems["files_without_row"] + problems["partial_uploads"]:
+            os.remove(os.path.join(UPLOAD_DIR, relative))
+        paths = {b["sha256"]: b["stored_filename"] for b in blobs}
+        for sha256 in problems["blobs_without_scroll"]:
+            # One at a time, so a file is only removed with the row that owned it
+            if store.delete_unreferenced_blobs([sha256]):
+                path = os.path.join(UPLOAD_DIR, paths[sha256])
+                if os.path.exists(path):
+                    os.remove(path)
+        if "index_entries_without_scroll" in problems:
+            _sync_index(index)
+    return problems
+
+
+def print_report(problems: dict, fixed: bool):
+    unfixable = ("blobs_missing_file", "scrolls_missing_file")
+    for name, items in problems.items():
+        status = "ok" if not items else ("reported" if name in unfixable or not fixed else "fixed")
+        print(f"{name:<30} {len(items):>8}  {status}")
+        for item in items[:SAMPLE]:
+            print(f"    {item}")
+        if len(items) > SAMPLE:
+            print(f"    ... {len(items) - SAMPLE} more")
+
+
+def dump_index(scroll_id: str = None, limit: int = None):
+    """Print indexed chunks with their scroll metadata."""
+    from retrieval import ScrollIndex
+    where = {"scroll_id": scroll_id} if scroll_id else None
+    chunks = ScrollIndex.from_env().collection.get(where=where, limit=limit, include=["documents", "metadatas"])
+    for doc, chunk_id, meta in zip(chunks["documents"], chunks["ids"], chunks["metadatas"]):
+        print(f"ID: {chunk_id}")
+        print(f"Text: {doc}")
+        print(f"Scroll: {meta.get('filename', 'Unknown')} ({meta.get('scroll_id', 'Unknown')})")
+        print(f"Uploader: {meta.get('uploader_id', 'Unknown')}")
+        print("------")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the scroll corpus offline")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("reextract", help="Re-run text extraction for every stored file")
+    command.add_argument("--workers", type=int, help="Pool processes (default: all cores)")
+    command.add_argument("--status", action="append", choices=("pending", "processing", "ready", "failed"),
+                         help="Only files in this ingestion state; repeatable")
+    command.add_argument("--resume", action="store_true", help="Skip files the interrupted run already did")
+    command.add_argument("--no-reindex", action="store_true", help="Leave the retrieval index alone")
+    command = commands.add_parser("reindex", help="Index missing scrolls and drop stale index entries")
+    command.add_argument("--full", action="store_true", help="Clear the index and rebuild it")
+    command = commands.add_parser("check", help="Report orphaned files, rows and index entries")
+    command.add_argument("--fix", action="store_true", help="Remove orphans and index missing scrolls")
+    command.add_argument("--grace", type=float, default=GRACE_SECONDS,
+                         help="Seconds before a new file or blob counts as orphaned")
+    command = commands.add_parser("dump-index", help="Print the indexed chunks")
+    command.add_argument("--scroll-id")
+    command.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "reextract":
+        if args.resume and _load_checkpoint() is None:
+            print("No interrupted run to resume; starting from the beginning")
+        result = reextract(args.workers, args.status, args.resume, not args.no_reindex)
+        print(json.dumps(result, indent=2))
+        return 1 if result["failed"] else 0
+    if args.command == "reindex":
+        print(json.dumps(reindex(args.full), indent=2))
+    elif args.command == "check":
+        problems = check(args.fix, args.grace)
+        print_report(problems, args.fix)
+        if args.fix:
+            problems = check(grace=args.grace)
+        return 1 if any(problems.values()) else 0
+    else:
+        dump_index(args.scroll_id, args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,7 +19,7 @@ document.addEventListener("DOMContentLoaded", function () {
   let seekerId = localStorage.getItem("seeker_id") || null;
 
   // Fetch scroll count on load
-  fetch("/scrolls")
+  fetch("/scrolls/count")
     .then((res) => res.json())
     .then((data) => {
       scrollCount.textContent = data.count;
@@ -45,15 +45,15 @@ document.addEventListener("DOMContentLoaded", function () {
     const formData = new FormData(scrollForm);
     formData.append("visitor_id", visitorId);
     if (seekerId) formData.append("seeker_id", seekerId);
-    fetch("/upload_scroll", {
+    fetch("/upload_scrolls", {
       method: "POST",
       body: formData,
     })
       .then((res) => res.json())
       .then((data) => {
-        alert(data.message);
+        alert(data.message || data.error);
         scrollInput.value = ""; // Clear file input after upload
-        return fetch("/scrolls");
+        return fetch("/scrolls/count");
       })
       .then((res) => res.json())
       .then((data) => {
@@ -74,25 +74,17 @@ document.addEventListener("DOMContentLoaded", function () {
     // Disable Ask button
     askButton.disabled = true;
 
-    fetch("/ask", {
+    fetch("/ask/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ question, deity: voice, visitor_id: visitorId, seeker_id: seekerId }),
     })
-      .then((res) => {
+      .then(async (res) => {
         if (!res.ok) {
-          throw new Error(`HTTP ${res.status}: ${res.statusText}`);
-        }
-        return res.json();
-      })
-      .then((data) => {
-        if (data.answer) {
-          oracleAnswer.textContent = data.answer;
-        } else if (data.error) {
-          oracleAnswer.textContent = "⚠️ Error: " + data.error;
-        } else {
-          oracleAnswer.textContent = "⚠️ No response received.";
+          const data = await res.json().catch(() => ({}));
+          throw new Error(data.error || `HTTP ${res.status}: ${res.statusText}`);
         }
+        return readOracleStream(res);
       })
       .catch((err) => {
         oracleAnswer.textContent = "⚠️ Error: " + err.message;
@@ -102,6 +94,43 @@ document.addEventListener("DOMContentLoaded", function () {
       });
   });
 
+  // Render server-sent events from /ask/stream as they arrive
+  async function readOracleStream(res) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let answer = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = "message";
+        let data = "";
+        frame.split("\n").forEach((line) => {
+          if (line.startsWith("event:")) event = line.slice(6).trim();
+          else if (line.startsWith("data:")) data += line.slice(5).trim();
+        });
+        if (!data) continue;
+        const payload = JSON.parse(data);
+        if (event === "error") {
+          oracleAnswer.textContent = "⚠️ Error: " + payload.error;
+          return;
+        }
+        if (payload.delta) {
+          answer += payload.delta;
+          oracleAnswer.textContent = answer;
+        }
+      }
+    }
+    if (!answer) {
+      oracleAnswer.textContent = "⚠️ No response received.";
+    }
+  }
+
   // Voice input and TTS output
   speakButton.addEventListener("click", function () {
     if (!navigator.mediaDevices) {
@@ -133,7 +162,7 @@ document.addEventListener("DOMContentLoaded", function () {
         })
           .then((res) => res.json())
           .then((data) => {
-            oracleAnswer.textContent = data.answer || "⚠️ No response";
+            oracleAnswer.textContent = data.answer || (data.error ? "⚠️ Error: " + data.error : "⚠️ No response");
             seekerInput.value = "";
 
             if (data.audio_url) {
@@ -0,0 +1,469 @@
+"""SQLite-backed persistence for scrolls, seekers and visitors.
+
+Every function runs in its own short transaction and touches only the rows it
+needs, so concurrent requests never overwrite each other's changes the way a
+whole-file JSON rewrite did.
+"""
+import datetime
+from sqlalchemy import select, delete, update, func, case, bindparam, tuple_, exists
+from sqlalchemy.dialects.sqlite import insert
+from database import SessionLocal, init_db
+from models import ScrollBlob, Scroll, Seeker, Visitor, StoreCounter
+
+def init_store():
+    init_db()
+    with SessionLocal() as session, session.begin():
+        # Keyset pagination compares timestamps, which NULL would drop out of
+        session.execute(update(Scroll).where(Scroll.timestamp.is_(None)).values(timestamp=""))
+        if session.get(StoreCounter, SCROLL_COUNT) is None:
+            # Databases created before the counters existed: count once
+            _set_counter(session, SCROLL_COUNT, session.scalar(select(func.count()).select_from(Scroll)))
+
+# --- Counters ---
+
+SCROLL_COUNT = "scrolls"
+SCROLL_REVISION = "scrolls_revision"  # Bumped by every change visible in a scroll listing
+
+def _counter_upsert(name: str, value, increment: bool):
+    stmt = insert(StoreCounter).values(name=name, value=value)
+    new_value = StoreCounter.value + stmt.excluded.value if increment else stmt.excluded.value
+    return stmt.on_conflict_do_update(index_elements=[StoreCounter.name], set_={"value": new_value})
+
+def _bump_counter(session, name: str, amount: int = 1):
+    session.execute(_counter_upsert(name, amount, increment=True))
+
+def _set_counter(session, name: str, value: int):
+    session.execute(_counter_upsert(name, value, increment=False))
+
+def _read_counter(session, name: str) -> int:
+    return session.scalar(select(StoreCounter.value).where(StoreCounter.name == name)) or 0
+
+def _scrolls_changed(session, added: int = 0):
+    """Record a scroll change in the same transaction as the change itself."""
+    _bump_counter(session, SCROLL_REVISION)
+    if added:
+        _bump_counter(session, SCROLL_COUNT, added)
+
+# --- Scrolls ---
+
+# Fields a scroll listing can project; extracted_text is only sent when asked for
+SCROLL_FIELDS = ("scroll_id", "uploader_id", "filename", "safe_filename", "sha256", "timestamp", "status",
+                 "extracted_text")
+SCROLL_LIST_FIELDS = tuple(f for f in SCROLL_FIELDS if f != "extracted_text")
+
+def _scroll_columns() -> dict:
+    # Scrolls with a blob take text and status from it, like Scroll.to_dict
+    return {
+        "scroll_id": Scroll.scroll_id,
+        "uploader_id": Scroll.uploader_id,
+        "filename": Scroll.filename,
+        "safe_filename": Scroll.safe_filename,
+        "sha256": Scroll.blob_sha256,
+        "timestamp": Scroll.timestamp,
+        "status": func.coalesce(ScrollBlob.status, Scroll.status),
+        "extracted_text": func.coalesce(ScrollBlob.extracted_text, Scroll.extracted_text),
+    }
+
+def add_scroll(entry: dict):
+    with SessionLocal() as session, session.begin():
+        session.add(Scroll(**entry))
+        _scrolls_changed(session, added=1)
+
+def list_scroll_page(limit: int, after: tuple = None, uploader_id: str = None, fields=SCROLL_LIST_FIELDS):
+    """One page of scrolls in (timestamp, scroll_id) order, projected to ``fields``.
+
+    ``after`` is the (timestamp, scroll_id) of the last row already seen.
+    Returns (rows, next_after), where next_after is None on the last page.
+    Only the requested columns are read, so a listing without extracted_text
+    never touches the stored text.
+    """
+    columns = _scroll_columns()
+    wanted = [columns[f].label(f) for f in fields]
+    stmt = select(Scroll.timestamp, Scroll.scroll_id, *wanted)
+    if "status" in fields or "extracted_text" in fields:
+        stmt = stmt.outerjoin(ScrollBlob, Scroll.blob_sha256 == ScrollBlob.sha256)
+    if uploader_id is not None:
+        stmt = stmt.where(Scroll.uploader_id == uploader_id)
+    if after is not None:
+        stmt = stmt.where(tuple_(Scroll.timestamp, Scroll.scroll_id) > tuple_(*after))
+    stmt = stmt.order_by(Scroll.timestamp, Scroll.scroll_id).limit(limit + 1)
+    with SessionLocal() as session:
+        result = session.execute(stmt).all()
+    rows = [{f: row[i + 2] for i, f in enumerate(fields)} for row in result[:limit]]
+    next_after = tuple(result[limit - 1][:2]) if len(result) > limit else None
+    return rows, next_after
+
+def count_uploader_scrolls(uploader_id: str) -> int:
+    with SessionLocal() as session:
+        return session.scalar(select(func.count()).select_from(Scroll).where(Scroll.uploader_id == uploader_id))
+
+def scroll_revision() -> int:
+    """Changes whenever any scroll listing would; used as the listing ETag."""
+    with SessionLocal() as session:
+        return _read_counter(session, SCROLL_REVISION)
+
+def get_scroll(scroll_id: str):
+    with SessionLocal() as session:
+        row = session.get(Scroll, scroll_id)
+        return row.to_dict() if row else None
+
+def list_scrolls_for_blob(sha256: str) -> list:
+    with SessionLocal() as session:
+        rows = session.scalars(select(Scroll).where(Scroll.blob_sha256 == sha256).order_by(Scroll.timestamp))
+        return [row.to_dict() for row in rows]
+
+def iter_scroll_texts(batch_size: int = 100):
+    """Yield (scroll_id, uploader_id, filename, extracted_text, source_id) without loading every row at once.
+
+    source_id is the content hash for deduplicated scrolls (shared by identical
+    uploads) and the scroll_id for older ones.
+    """
+    with SessionLocal() as session:
+        stmt = (
+            select(
+                Scroll.scroll_id, Scroll.uploader_id, Scroll.filename,
+                func.coalesce(ScrollBlob.extracted_text, Scroll.extracted_text),
+                func.coalesce(Scroll.blob_sha256, Scroll.scroll_id),
+            )
+            .outerjoin(ScrollBlob, Scroll.blob_sha256 == ScrollBlob.sha256)
+        )
+        for row in session.execute(stmt.execution_options(yield_per=batch_size)):
+            yield tuple(row)
+
+def scroll_ids() -> set:
+    with SessionLocal() as session:
+        return set(session.scalars(select(Scroll.scroll_id)))
+
+def list_legacy_scrolls() -> list:
+    """(scroll_id, safe_filename, status) of scrolls stored before content addressing, which own their file."""
+    with SessionLocal() as session:
+        return [tuple(row) for row in session.execute(
+            select(Scroll.scroll_id, Scroll.safe_filename, Scroll.status).where(Scroll.blob_sha256.is_(None)))]
+
+def replace_scroll_text(scroll_id: str, text: str, pages_total: int = None, error: str = None) -> bool:
+    """Store freshly extracted text for a legacy scroll (or mark it failed). Returns True if the text changed."""
+    with SessionLocal() as session, session.begin():
+        row = session.get(Scroll, scroll_id)
+        if row is None:
+            return False
+        changed = error is None and (row.extracted_text or "") != text
+        if error is None:
+            row.extracted_text, row.status, row.error = text, "ready", None
+            row.pages_total = row.pages_done = pages_total
+        else:
+            row.status, row.error = "failed", error
+        _scrolls_changed(session)
+        return changed
+
+def get_scroll_status(scroll_id: str):
+    with SessionLocal() as session:
+        row = session.get(Scroll, scroll_id)
+        return row.status_dict() if row else None
+
+# --- Scroll blobs (content-addressed files and their extracted text) ---
+
+def get_or_create_blob(sha256: str, stored_filename: str, size: int, owner: str = None):
+    """Return (blob dict, created). Concurrent uploads of the same content create one row,
+    owned by the worker whose insert won."""
+    stmt = insert(ScrollBlob).values(
+        sha256=sha256,
+        stored_filename=stored_filename,
+        size=size,
+        created_at=str(datetime.datetime.now()),
+        extracted_text="",
+        status="pending",
+        pages_done=0,
+        owner=owner,
+    ).on_conflict_do_nothing(index_elements=[ScrollBlob.sha256])
+    with SessionLocal() as session, session.begin():
+        created = session.execute(stmt).rowcount > 0
+        return session.get(ScrollBlob, sha256).to_dict(), created
+
+def retry_failed_blob(sha256: str, owner: str = None) -> bool:
+    """Put a failed blob back to pending. Returns True if it should be re-ingested (by ``owner``)."""
+    with SessionLocal() as session, session.begin():
+        result = session.execute(
+            update(ScrollBlob)
+            .where(ScrollBlob.sha256 == sha256, ScrollBlob.status == "failed")
+            .values(status="pending", error=None, owner=owner)
+        )
+        if result.rowcount:
+            _scrolls_changed(session)
+        return result.rowcount > 0
+
+def list_blobs() -> list:
+    with SessionLocal() as session:
+        return [row.to_dict() for row in session.scalars(select(ScrollBlob))]
+
+def replace_blob_text(sha256: str, text: str, pages_total: int) -> bool:
+    """Store freshly extracted text for a blob in one step, marking it ready. Returns True if the text changed."""
+    with SessionLocal() as session, session.begin():
+        row = session.get(ScrollBlob, sha256)
+        if row is None:
+            return False
+        changed = (row.extracted_text or "") != text
+        row.extracted_text, row.status, row.error = text, "ready", None
+        row.pages_total = row.pages_done = pages_total
+        _scrolls_changed(session)
+        return changed
+
+def list_unreferenced_blobs() -> list:
+    """Blobs no scroll points at any more."""
+    with SessionLocal() as session:
+        rows = session.scalars(select(ScrollBlob).where(~_blob_referenced()))
+        return [row.to_dict() for row in rows]
+
+def delete_unreferenced_blobs(sha256s: list) -> int:
+    """Delete the given blobs, skipping any a scroll has started to use since they were listed."""
+    if not sha256s:
+        return 0
+    with SessionLocal() as session, session.begin():
+        return session.execute(delete(ScrollBlob).where(ScrollBlob.sha256.in_(sha256s), ~_blob_referenced())).rowcount
+
+def _blob_referenced():
+    return exists().where(Scroll.blob_sha256 == ScrollBlob.sha256)
+
+def list_unfinished_blobs() -> list:
+    """Blobs whose ingestion never completed (e.g. the server restarted mid-job)."""
+    with SessionLocal() as session:
+        rows = session.scalars(select(ScrollBlob).where(ScrollBlob.status.in_(("pending", "processing"))))
+        return [row.to_dict() for row in rows]
+
+def claim_blob(sha256: str, owner: str, previous_owner: str = None) -> bool:
+    """Take over an unfinished blob from ``previous_owner`` (None for unowned).
+
+    The compare-and-set means two workers can never both win the same blob.
+    """
+    with SessionLocal() as session, session.begin():
+        result = session.execute(
+            update(ScrollBlob)
+            .where(ScrollBlob.sha256 == sha256,
+                   ScrollBlob.status.in_(("pending", "processing")),
+                   ScrollBlob.owner.is_(previous_owner) if previous_owner is None else ScrollBlob.owner == previous_owner)
+            .values(owner=owner)
+        )
+        return result.rowcount > 0
+
+def start_blob_ingestion(sha256: str, pages_total: int):
+    with SessionLocal() as session, session.begin():
+        session.execute(
+            update(ScrollBlob)
+            .where(ScrollBlob.sha256 == sha256)
+            .values(status="processing", pages_total=pages_total, pages_done=0, extracted_text="", error=None)
+        )
+        _scrolls_changed(session)
+
+def append_blob_text(sha256: str, text: str, pages_done: int):
+    """Append the next in-order piece of extracted text and advance progress."""
+    with SessionLocal() as session, session.begin():
+        session.execute(
+            update(ScrollBlob)
+            .where(ScrollBlob.sha256 == sha256)
+            .values(extracted_text=func.coalesce(ScrollBlob.extracted_text, "") + text, pages_done=pages_done)
+        )
+        _scrolls_changed(session)
+
+def set_blob_progress(sha256: str, pages_done: int):
+    with SessionLocal() as session, session.begin():
+        session.execute(update(ScrollBlob).where(ScrollBlob.sha256 == sha256).values(pages_done=pages_done))
+
+def finish_blob_ingestion(sha256: str, error: str = None) -> dict:
+    """Mark ingestion ready (trimming the text) or failed. Returns the blob."""
+    with SessionLocal() as session, session.begin():
+        row = session.get(ScrollBlob, sha256)
+        if row is None:
+            return None
+        if error is None:
+            row.extracted_text = (row.extracted_text or "").strip()
+            row.status = "ready"
+        else:
+            row.status = "failed"
+            row.error = error
+        _scrolls_changed(session)
+        return row.to_dict()
+
+def count_scrolls() -> int:
+    """Read from the running counter, not a COUNT(*) over the table."""
+    with SessionLocal() as session:
+        return _read_counter(session, SCROLL_COUNT)
+
+def clear_scrolls():
+    with SessionLocal() as session, session.begin():
+        session.execute(delete(Scroll))
+        session.execute(delete(ScrollBlob))
+        _set_counter(session, SCROLL_COUNT, 0)
+        _scrolls_changed(session)
+
+def upsert_scrolls(entries: list):
+    """Insert or replace scroll rows in one transaction (used by migration)."""
+    if not entries:
+        return
+    stmt = insert(Scroll)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Scroll.scroll_id],
+        set_={c.name: stmt.excluded[c.name] for c in Scroll.__table__.columns if c.name != "scroll_id"},
+    )
+    with SessionLocal() as session, session.begin():
+        session.execute(stmt, entries)
+        # Upserts may replace existing rows, so recount rather than add len(entries)
+        _set_counter(session, SCROLL_COUNT, session.scalar(select(func.count()).select_from(Scroll)))
+        _scrolls_changed(session)
+
+# --- Seekers ---
+
+def create_seeker(record: dict):
+    with SessionLocal() as session, session.begin():
+        session.add(Seeker(**record))
+
+def get_seeker(seeker_id: str):
+    with SessionLocal() as session:
+        row = session.get(Seeker, seeker_id)
+        return row.to_dict() if row else None
+
+def increment_seeker_scroll_count(seeker_id: str, amount: int = 1) -> bool:
+    """Atomically bump scroll_count. Returns False if the seeker does not exist."""
+    with SessionLocal() as session, session.begin():
+        result = session.execute(
+            update(Seeker)
+            .where(Seeker.seeker_id == seeker_id)
+            .values(scroll_count=Seeker.scroll_count + amount)
+        )
+        return result.rowcount > 0
+
+def upsert_seekers(records: list):
+    if not records:
+        return
+    stmt = insert(Seeker)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Seeker.seeker_id],
+        set_={c.name: stmt.excluded[c.name] for c in Seeker.__table__.columns if c.name != "seeker_id"},
+    )
+    with SessionLocal() as session, session.begin():
+        session.execute(stmt, records)
+
+# --- Visitors ---
+
+def get_visitor(visitor_id: str):
+    with SessionLocal() as session:
+        row = session.get(Visitor, visitor_id)
+        return row.to_dict() if row else None
+
+def _rolled_usage(column_today, column_date, date, tokens):
+    """New token_used_today for usage dated ``date``: add on the same day, restart on a newer one."""
+    return case(
+        (column_date == date, column_today + tokens),
+        (column_date < date, tokens),
+        else_=column_today,  # Late usage from an earlier day only counts toward the total
+    )
+
+def _visitor_usage_upsert():
+    stmt = insert(Visitor)
+    new = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[Visitor.visitor_id],
+        set_={
+            "last_seen": new.last_seen,
+            "last_seen_date": case((Visitor.last_seen_date < new.last_seen_date, new.last_seen_date),
+                                   else_=Visitor.last_seen_date),
+            "token_used_total": Visitor.token_used_total + new.token_used_total,
+            "token_used_today": _rolled_usage(Visitor.token_used_today, Visitor.last_seen_date,
+                                              new.last_seen_date, new.token_used_today),
+            "limit_state": new.limit_state,
+        },
+    )
+
+def _seeker_usage_update():
+    date = bindparam("usage_date")
+    tokens = bindparam("tokens")
+    usage_date = func.coalesce(Seeker.token_usage_date, "")
+    return (
+        update(Seeker)
+        .where(Seeker.seeker_id == bindparam("usage_seeker_id"))
+        .values(
+            token_used_total=Seeker.token_used_total + tokens,
+            token_used_today=_rolled_usage(Seeker.token_used_today, usage_date, date, tokens),
+            token_usage_date=case((usage_date < date, date), else_=Seeker.token_usage_date),
+        )
+    )
+
+def _visitor_usage_row(visitor_id: str, tokens_used: int, date: str, limit_state: str, now: str) -> dict:
+    return {
+        "visitor_id": visitor_id,
+        "created_at": now,
+        "last_seen": now,
+        "last_seen_date": date,
+        "token_used_total": tokens_used,
+        "token_used_today": tokens_used,
+        "limit_state": limit_state or "ok",
+    }
+
+def record_visitor_tokens(visitor_id: str, tokens_used: int, date: str = None, limit_state: str = "ok"):
+    """Add token usage to a visitor row, creating it or rolling the day over as needed."""
+    row = _visitor_usage_row(visitor_id, tokens_used, date or str(datetime.date.today()), limit_state,
+                             str(datetime.datetime.now()))
+    with SessionLocal() as session, session.begin():
+        session.connection().execute(_visitor_usage_upsert(), [row])
+
+def record_seeker_tokens(seeker_id: str, tokens_used: int, date: str = None):
+    """Add token usage to a registered seeker. Unknown seeker ids are ignored."""
+    params = {"usage_seeker_id": seeker_id, "tokens": tokens_used, "usage_date": date or str(datetime.date.today())}
+    with SessionLocal() as session, session.begin():
+        session.connection().execute(_seeker_usage_update(), [params])
+
+def get_tokens_today(kind: str, subject_id: str, date: str = None) -> int:
+    """Tokens already recorded for a visitor or seeker on ``date`` (default today)."""
+    date = date or str(datetime.date.today())
+    if kind == "visitor":
+        query = select(Visitor.token_used_today, Visitor.last_seen_date).where(Visitor.visitor_id == subject_id)
+    else:
+        query = select(Seeker.token_used_today, Seeker.token_usage_date).where(Seeker.seeker_id == subject_id)
+    with SessionLocal() as session:
+        row = session.execute(query).first()
+    return row[0] if row and row[1] == date else 0
+
+def record_token_usage(usages: list) -> dict:
+    """Write a batch of budget usages in one transaction.
+
+    Each usage is {"kind", "id", "date", "tokens", "limit_state"}. Returns
+    {(kind, id): token_used_today} as stored afterwards, for today's rows.
+    """
+    today = str(datetime.date.today())
+    now = str(datetime.datetime.now())
+    visitor_rows = [_visitor_usage_row(u["id"], u["tokens"], u["date"], u.get("limit_state"), now)
+                    for u in usages if u["kind"] == "visitor"]
+    seeker_params = [{"usage_seeker_id": u["id"], "tokens": u["tokens"], "usage_date": u["date"]}
+                     for u in usages if u["kind"] == "seeker"]
+    with SessionLocal() as session, session.begin():
+        # One executemany per table rather than a statement per usage
+        connection = session.connection()
+        if visitor_rows:
+            connection.execute(_visitor_usage_upsert(), visitor_rows)
+        if seeker_params:
+            connection.execute(_seeker_usage_update(), seeker_params)
+        visitor_ids = [row["visitor_id"] for row in visitor_rows]
+        seeker_ids = [params["usage_seeker_id"] for params in seeker_params]
+        stored = {}
+        if visitor_ids:
+            rows = session.execute(
+                select(Visitor.visitor_id, Visitor.token_used_today)
+                .where(Visitor.visitor_id.in_(visitor_ids), Visitor.last_seen_date == today)
+            )
+            stored.update({("visitor", vid): used for vid, used in rows})
+        if seeker_ids:
+            rows = session.execute(
+                select(Seeker.seeker_id, Seeker.token_used_today)
+                .where(Seeker.seeker_id.in_(seeker_ids), Seeker.token_usage_date == today)
+            )
+            stored.update({("seeker", sid): used for sid, used in rows})
+    return stored
+
+def upsert_visitors(records: list):
+    if not records:
+        return
+    stmt = insert(Visitor)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Visitor.visitor_id],
+        set_={c.name: stmt.excluded[c.name] for c in Visitor.__table__.columns if c.name != "visitor_id"},
+    )
+    with SessionLocal() as session, session.begin():
+        session.execute(stmt, records)
@@ -0,0 +1,16 @@
+import os
+import sys
+import shutil
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The backend modules read TEMPLE_DATA_DIR on import, so it is set before any test imports them
+DATA_DIR = tempfile.mkdtemp(prefix="temple-tests-")
+os.environ["TEMPLE_DATA_DIR"] = DATA_DIR
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "bench"))  # fake_upstream
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
@@ -0,0 +1,55 @@
+"""Daily token budgets: anonymous callers are metered too, and idle counters are dropped."""
+import httpx
+import oracle_clients
+from budget import TokenBudget
+
+
+def test_idle_counters_are_dropped_after_a_flush_and_reloaded():
+    stored = {}
+    loads = []
+
+    def load(kind, subject_id, date):
+        loads.append(subject_id)
+        return stored.get((kind, subject_id), 0)
+
+    def flush(usages):
+        for u in usages:
+            stored[(u["kind"], u["id"])] = stored.get((u["kind"], u["id"]), 0) + u["tokens"]
+        return {(u["kind"], u["id"]): stored[(u["kind"], u["id"])] for u in usages}
+
+    budget = TokenBudget({"visitor": 100}, load, flush, idle_ttl=0)
+    budget.charge("visitor", "v1", 60)
+    budget.check("visitor", "v2")
+    assert budget.stats()["tracked"] == 2
+    budget.flush()
+    assert budget.stats()["tracked"] == 0
+    allowed, usage = budget.check("visitor", "v1", 50)
+    assert not allowed and usage["used_today"] == 60
+    assert loads == ["v1", "v2", "v1"]
+
+
+def test_counters_with_unflushed_usage_are_kept():
+    budget = TokenBudget({"visitor": 100}, lambda *a: 0, lambda usages: {}, idle_ttl=0)
+    budget.charge("visitor", "v1", 10)
+    budget._evict()
+    assert budget.stats()["tracked"] == 1 and budget.stats()["pending_tokens"] == 10
+
+
+def test_requests_without_an_id_are_charged_to_their_address(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+    answer = {"choices": [{"message": {"content": "the answer is long enough words"}}]}
+    monkeypatch.setattr(oracle_clients, "_http_client",
+                        httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, json=answer))))
+    monkeypatch.setattr(main, "xai_api_key", "test")
+    monkeypatch.setitem(main.token_budget.limits, "visitor", 30)
+
+    with TestClient(main.app) as client:
+        statuses = [client.post("/ask", json={"question": f"what is truth {i}", "deity": "Hathor",
+                                              "no_cache": True}).status_code
+                    for i in range(4)]
+        # Another caller with an id of its own still has its whole budget
+        other = client.post("/ask", json={"question": "what is truth", "deity": "Hathor", "visitor_id": "v-other",
+                                          "no_cache": True})
+    assert statuses[0] == 200 and statuses[-1] == 429
+    assert other.status_code == 200
@@ -0,0 +1,63 @@
+"""Several worker processes writing the shared SQLite store at once must not lose an update."""
+import uuid
+import datetime
+import multiprocessing
+
+PROCESSES = 4
+ITERATIONS = 60
+SEEKERS = 5
+VISITORS = 10
+TOKENS = 7
+
+
+def seeker_id(i: int) -> str:
+    return f"writers-seeker-{i % SEEKERS}"
+
+
+def visitor_id(i: int) -> str:
+    return f"writers-visitor-{i % VISITORS}"
+
+
+def write(index: int, start, results):
+    # What one web worker does per upload and per budget flush
+    import store
+    today = str(datetime.date.today())
+    start.wait()
+    for i in range(ITERATIONS):
+        store.add_scroll({"scroll_id": str(uuid.uuid4()), "uploader_id": seeker_id(i),
+                          "filename": f"w{index}-{i}.txt", "timestamp": str(datetime.datetime.now())})
+        store.increment_seeker_scroll_count(seeker_id(i))
+        store.record_token_usage([{"kind": "visitor", "id": visitor_id(index + i), "date": today,
+                                   "tokens": TOKENS, "limit_state": "ok"}])
+    results.put(index)
+
+
+def test_parallel_writers_keep_every_counter():
+    import store
+    store.init_store()
+    now = str(datetime.datetime.now())
+    store.upsert_seekers([{"seeker_id": seeker_id(i), "created_at": now, "scroll_count": 0, "donation_total": 0.0,
+                           "eligibility_flags": []} for i in range(SEEKERS)])
+    scrolls_before = store.count_scrolls()
+    revision_before = store.scroll_revision()
+
+    ctx = multiprocessing.get_context("spawn")
+    start, results = ctx.Event(), ctx.Queue()
+    processes = [ctx.Process(target=write, args=(i, start, results)) for i in range(PROCESSES)]
+    for p in processes:
+        p.start()
+    start.set()
+    finished = sorted(results.get(timeout=300) for _ in processes)
+    for p in processes:
+        p.join(timeout=60)
+    assert finished == list(range(PROCESSES))
+    assert all(p.exitcode == 0 for p in processes)
+
+    written = PROCESSES * ITERATIONS
+    assert store.count_scrolls() == scrolls_before + written
+    # One revision per added scroll: no bump lost to a concurrent transaction
+    assert store.scroll_revision() == revision_before + written
+    assert [store.get_seeker(seeker_id(i))["scroll_count"] for i in range(SEEKERS)] == \
+        [written // SEEKERS] * SEEKERS
+    assert [store.get_visitor(visitor_id(i))["token_used_total"] for i in range(VISITORS)] == \
+        [written // VISITORS * TOKENS] * VISITORS
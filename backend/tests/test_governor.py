@@ -0,0 +1,235 @@
+"""Circuit breaker, retries and deadlines of UpstreamGovernor against bench/fake_upstream.py."""
+import time
+import asyncio
+import httpx
+import pytest
+import fake_upstream
+from governor import UpstreamGovernor, UpstreamError, UpstreamUnavailable, parse_retry_after
+
+DEFAULT_SETTINGS = dict(fake_upstream.settings)
+
+
+@pytest.fixture(autouse=True)
+def upstream():
+    fake_upstream.settings.update(DEFAULT_SETTINGS, latency=0, jitter=0, token_delay=0)
+    fake_upstream.counts.clear()
+    yield fake_upstream
+    fake_upstream.settings.update(DEFAULT_SETTINGS)
+
+
+def run(scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=fake_upstream.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://fake") as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def chat(client):
+    async def make_call():
+        response = await client.post("/v1/chat/completions", json={"model": "fake", "messages": []})
+        if response.status_code != 200:
+            raise UpstreamError(f"fake error: {response.status_code}", response.status_code,
+                                parse_retry_after(response.headers.get("retry-after")))
+        return response.json()["choices"][0]["message"]["content"]
+    return make_call
+
+
+def governor(**kwargs) -> UpstreamGovernor:
+    options = dict(max_retries=0, backoff_base=0, failure_threshold=2, reset_timeout=0.2)
+    return UpstreamGovernor("fake", **{**options, **kwargs})
+
+
+def test_circuit_opens_probes_once_and_closes(upstream):
+    async def scenario(client):
+        gov = governor()
+        upstream.settings["error_rate"] = 1
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await gov.call(chat(client))
+        assert gov.status()["state"] == "open"
+        with pytest.raises(UpstreamUnavailable) as refused:
+            await gov.call(chat(client))
+        assert refused.value.reason == "circuit_open"
+        assert upstream.counts["chat"] == 2  # Refused without calling the backend
+
+        await asyncio.sleep(0.25)
+        assert gov.status()["state"] == "half_open"
+        upstream.settings.update(error_rate=0, latency=0.1)
+        probe = asyncio.create_task(gov.call(chat(client)))
+        await asyncio.sleep(0.02)
+        with pytest.raises(UpstreamUnavailable):
+            await gov.call(chat(client))  # Only one probe at a time
+        assert await probe == upstream.settings["answer"]
+        assert gov.status()["state"] == "closed"
+        assert await gov.call(chat(client)) == upstream.settings["answer"]
+
+    run(scenario)
+
+
+def test_failed_probe_reopens(upstream):
+    async def scenario(client):
+        gov = governor(failure_threshold=1)
+        upstream.settings["error_rate"] = 1
+        with pytest.raises(UpstreamError):
+            await gov.call(chat(client))
+        await asyncio.sleep(0.25)
+        with pytest.raises(UpstreamError):
+            await gov.call(chat(client))
+        assert gov.status()["state"] == "open"
+        with pytest.raises(UpstreamUnavailable):
+            await gov.call(chat(client))
+
+    run(scenario)
+
+
+def test_call_admitted_before_opening_does_not_release_the_probe(upstream):
+    async def scenario(client):
+        gov = governor(failure_threshold=1)
+
+        async def slow_bad_request():
+            await asyncio.sleep(0.4)
+            raise UpstreamError("bad request", 400)
+
+        stale = asyncio.create_task(gov.call(slow_bad_request))
+        upstream.settings["error_rate"] = 1
+        with pytest.raises(UpstreamError):
+            await gov.call(chat(client))
+        assert gov.status()["state"] == "open"
+
+        await asyncio.sleep(0.25)
+        upstream.settings.update(error_rate=0, latency=0.3)
+        probe = asyncio.create_task(gov.call(chat(client)))
+        with pytest.raises(UpstreamError):
+            await stale  # Ends while the probe is still in flight
+        with pytest.raises(UpstreamUnavailable) as refused:
+            await gov.call(chat(client))
+        assert refused.value.reason == "circuit_open"
+        assert await probe == upstream.settings["answer"]
+        assert gov.status()["state"] == "closed"
+
+    run(scenario)
+
+
+def test_retries_until_exhausted(upstream):
+    async def scenario(client):
+        gov = governor(max_retries=2, failure_threshold=5)
+        upstream.settings["error_rate"] = 1
+        with pytest.raises(UpstreamError) as failed:
+            await gov.call(chat(client))
+        assert failed.value.status_code == 503
+        assert upstream.counts["chat"] == 3
+        status = gov.status()
+        assert (status["retries"], status["failed"], status["consecutive_failures"]) == (2, 1, 1)
+
+        # Client errors are not retried and say nothing about the backend's health
+        upstream.settings["error_status"] = 400
+        with pytest.raises(UpstreamError):
+            await gov.call(chat(client))
+        assert upstream.counts["chat"] == 4
+        assert gov.status()["consecutive_failures"] == 1
+
+    run(scenario)
+
+
+def test_retry_recovers_from_transient_failure(upstream):
+    async def scenario(client):
+        gov = governor(max_retries=2)
+        calls = 0
+
+        async def flaky():
+            nonlocal calls
+            calls += 1
+            upstream.settings["error_rate"] = 1 if calls == 1 else 0
+            return await chat(client)()
+
+        assert await gov.call(flaky) == upstream.settings["answer"]
+        assert calls == 2
+        assert gov.status()["retries"] == 1 and gov.status()["state"] == "closed"
+
+    run(scenario)
+
+
+def test_deadline_bounds_a_hung_upstream(upstream):
+    async def scenario(client):
+        gov = governor(max_retries=2, deadline=0.3)
+        upstream.settings["latency"] = 5
+        started = time.monotonic()
+        with pytest.raises(UpstreamUnavailable) as refused:
+            await gov.call(chat(client))
+        assert refused.value.reason == "timeout"
+        assert time.monotonic() - started < 1
+        assert upstream.counts["chat"] == 1  # Not retried
+        assert gov.status()["consecutive_failures"] == 1 and gov.status()["in_flight"] == 0
+
+    run(scenario)
+
+
+def test_read_timeouts_are_not_retried_by_default(upstream):
+    async def scenario(client):
+        for retry_timeouts, calls_expected in ((False, 1), (True, 3)):
+            gov = governor(max_retries=2, retry_timeouts=retry_timeouts)
+            calls = 0
+
+            async def times_out():
+                nonlocal calls
+                calls += 1
+                raise httpx.ReadTimeout("upstream hung")
+
+            with pytest.raises(httpx.ReadTimeout):
+                await gov.call(times_out)
+            assert calls == calls_expected
+
+    run(scenario)
+
+
+def test_retry_after_is_honoured_beyond_backoff_max(upstream):
+    async def scenario(client):
+        gov = governor(max_retries=1, backoff_max=0.01, deadline=5)
+        upstream.settings.update(error_status=429, retry_after=0.3)
+        calls = 0
+
+        async def rate_limited_once():
+            nonlocal calls
+            calls += 1
+            upstream.settings["error_rate"] = 1 if calls == 1 else 0
+            return await chat(client)()
+
+        started = time.monotonic()
+        assert await gov.call(rate_limited_once) == upstream.settings["answer"]
+        assert time.monotonic() - started >= 0.3
+
+    run(scenario)
+
+
+def test_retry_after_past_the_deadline_fails_fast(upstream):
+    async def scenario(client):
+        gov = governor(max_retries=2, deadline=5)
+        upstream.settings.update(error_rate=1, error_status=503, retry_after=120)
+        started = time.monotonic()
+        with pytest.raises(UpstreamUnavailable) as refused:
+            await gov.call(chat(client))
+        assert (refused.value.reason, refused.value.retry_after) == ("upstream_busy", 120)
+        assert time.monotonic() - started < 1
+        assert upstream.counts["chat"] == 1
+
+    run(scenario)
+
+
+def test_stream_under_deadline(upstream):
+    async def scenario(client):
+        gov = governor(deadline=1)
+
+        async def words():
+            for word in ("the", "temple"):
+                yield word
+
+        async def nothing():
+            return
+            yield
+
+        assert [item async for item in gov.stream(words)] == ["the", "temple"]
+        assert [item async for item in gov.stream(nothing)] == []
+        assert gov.status()["succeeded"] == 2
+
+    run(scenario)
@@ -0,0 +1,38 @@
+"""IngestionQueue keeps working after an extraction process dies."""
+import os
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+import store
+from ingestion import IngestionQueue
+
+
+def blob_status(sha256: str) -> str:
+    return next(b["status"] for b in store.list_blobs() if b["sha256"] == sha256)
+
+
+def test_broken_pool_fails_the_blob_and_is_replaced(tmp_path):
+    store.init_store()
+    path = tmp_path / "scroll.txt"
+    path.write_text("The temple keeps its silence.")
+    for sha256 in ("crashed-blob", "next-blob"):
+        store.get_or_create_blob(sha256, str(path), path.stat().st_size)
+
+    async def scenario():
+        ingestion = IngestionQueue(workers=1)
+        ingestion.start()
+        try:
+            crashed = ingestion._pool
+            crashed.submit(os._exit, 1)  # Kills the only worker, breaking the pool
+            with pytest.raises(BrokenProcessPool):
+                await ingestion._ingest("crashed-blob", str(path))
+            assert ingestion._pool is not crashed
+            await ingestion._ingest("next-blob", str(path))
+            return ingestion.stats()
+        finally:
+            await ingestion.close()
+
+    stats = asyncio.run(scenario())
+    assert (stats["failed"], stats["completed"]) == (1, 1)
+    assert blob_status("crashed-blob") == "failed"
+    assert blob_status("next-blob") == "ready"
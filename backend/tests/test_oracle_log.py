@@ -0,0 +1,40 @@
+"""OracleLogWriter waits a bounded time for a disk that falls behind, then gives up."""
+import time
+import threading
+from oracle_log import OracleLogWriter, iter_log_entries
+
+
+def stalled_writer(log_dir: str):
+    """A writer whose queue (two entries) is full while the writer thread is stuck on the disk."""
+    writer = OracleLogWriter(log_dir, max_pending=2, batch_size=1, flush_interval=0.01, put_timeout=0.1)
+    disk = threading.Event()
+    append = writer._append
+    writer._append = lambda batch: (disk.wait(10), append(batch))
+
+    assert writer.write({"i": 0})
+    deadline = time.monotonic() + 5
+    while not writer._queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)  # The writer thread has taken entry 0 and is stuck appending it
+    assert writer.write({"i": 1}) and writer.write({"i": 2})
+    return writer, disk
+
+
+def test_write_drops_after_put_timeout_when_the_queue_stays_full(tmp_path):
+    writer, disk = stalled_writer(str(tmp_path))
+    started = time.perf_counter()
+    assert not writer.write({"i": 3})
+    assert 0.1 <= time.perf_counter() - started < 0.5
+    assert writer.dropped == 1
+
+    disk.set()
+    writer.close()
+    assert [entry["i"] for entry in iter_log_entries(str(tmp_path))] == [0, 1, 2]
+
+
+def test_flush_and_close_honour_their_timeout(tmp_path):
+    writer, disk = stalled_writer(str(tmp_path))
+    started = time.perf_counter()
+    assert writer.flush(timeout=0.1) is False
+    writer.close(timeout=0.1)
+    assert time.perf_counter() - started < 1
+    disk.set()
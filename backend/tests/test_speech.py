@@ -0,0 +1,20 @@
+"""Voiced answers: no audio URL is handed out when synthesis cannot start."""
+import os
+import asyncio
+
+
+def test_no_audio_name_without_a_tts_client(monkeypatch):
+    import main
+
+    def no_client():
+        raise ValueError("OPENAI_API_KEY not set")
+
+    monkeypatch.setattr(main, "get_openai_client", no_client)
+    before = set(os.listdir(main.AUDIO_DIR))
+
+    async def run():
+        return main.start_speech("The oracle is silent.", "onyx", bypass=True)
+
+    assert asyncio.run(run()) is None
+    assert not main.speech_tasks
+    assert set(os.listdir(main.AUDIO_DIR)) == before
@@ -0,0 +1,8 @@
+"""Importing main must not pull in any of the heavy packages; features load them on first use."""
+from startup import HEAVY_MODULES, run_once
+
+
+def test_import_main_loads_no_heavy_modules():
+    result = run_once({})
+    loaded = [name for name in HEAVY_MODULES if name in result["heavy"]]
+    assert not loaded, f"import main loaded {', '.join(loaded)}"
@@ -0,0 +1,38 @@
+"""TranscriptionService spreads clips over idle workers before batching them."""
+import time
+import asyncio
+import transcription
+from transcription import TranscriptionService
+
+
+class SlowModel:
+    def transcribe(self, clip):
+        time.sleep(0.2)
+        return {"text": clip}
+
+
+def transcribe_all(service, clips):
+    async def scenario():
+        try:
+            return await asyncio.gather(*(service.transcribe(clip) for clip in clips))
+        finally:
+            await service.close()
+    return asyncio.run(scenario())
+
+
+def test_clips_go_to_idle_workers_first(monkeypatch):
+    monkeypatch.setattr(transcription, "_get_model", lambda model_name: SlowModel())
+    service = TranscriptionService(workers=3, batch_size=4, use_processes=False)
+    started = time.perf_counter()
+    results = transcribe_all(service, ["a", "b", "c"])
+    assert [r["text"] for r in results] == ["a", "b", "c"]
+    assert time.perf_counter() - started < 0.5  # In parallel, not one batch of three
+    assert service.stats()["batches"] == 3
+
+
+def test_backlog_is_batched_when_every_worker_is_busy(monkeypatch):
+    monkeypatch.setattr(transcription, "_get_model", lambda model_name: SlowModel())
+    service = TranscriptionService(workers=2, batch_size=4, use_processes=False)
+    results = transcribe_all(service, [str(i) for i in range(8)])
+    assert [r["text"] for r in results] == [str(i) for i in range(8)]
+    assert service.stats()["batches"] < 8
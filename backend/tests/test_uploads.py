@@ -0,0 +1,18 @@
+"""Duplicate uploads share one stored blob."""
+import io
+import os
+
+
+def test_same_content_under_another_extension_keeps_one_file():
+    import main
+    main.store.init_store()
+    content = b"The same words, offered twice."
+    blobs = []
+    for filename in ("first.txt", "second.md"):
+        sha256, stored_filename, size = main.store_scroll_blob(io.BytesIO(content), filename)
+        blob, _, _ = main.record_upload(sha256, stored_filename, size, filename, "uploader")
+        blobs.append(blob)
+
+    assert blobs[0]["stored_filename"] == blobs[1]["stored_filename"]
+    blob_dir = os.path.dirname(os.path.join(main.UPLOAD_DIR, blobs[0]["stored_filename"]))
+    assert os.listdir(blob_dir) == [os.path.basename(blobs[0]["stored_filename"])]
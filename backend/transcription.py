@@ -0,0 +1,249 @@
+"""Whisper transcription off the event loop.
+
+Clips are queued and handed to a pool of worker processes (or threads), each
+of which keeps one warm Whisper model. A clip goes straight to an idle worker;
+only when every worker is busy are queued clips grouped into a batch for the
+next one to free up. Request handlers simply ``await service.transcribe(path)``;
+the event loop never runs the model itself.
+"""
+import os
+import time
+import asyncio
+import threading
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_local = threading.local()
+
+SAMPLE_RATE = 16000
+DECODE_CHUNK_SIZE = 256 * 1024
+
+
+def _get_model(model_name: str):
+    model = getattr(_local, "model", None)
+    if model is None:
+        import whisper
+        model = whisper.load_model(model_name)
+        _local.model = model
+    return model
+
+
+def _init_worker(model_name: str, torch_threads: int):
+    if torch_threads:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+    _get_model(model_name)
+
+
+def _transcribe_batch(model_name: str, clips: list) -> list:
+    """Runs inside a worker. Returns one (result, error, seconds) tuple per clip."""
+    model = _get_model(model_name)
+    results = []
+    for clip in clips:
+        started = time.perf_counter()
+        try:
+            result = model.transcribe(clip)
+            results.append(({"text": result["text"]}, None, time.perf_counter() - started))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}", time.perf_counter() - started))
+    return results
+
+
+class ClipTooLong(ValueError):
+    def __init__(self, max_seconds: float):
+        super().__init__(f"Recording is longer than the {max_seconds:g} second limit")
+        self.max_seconds = max_seconds
+
+
+async def decode_audio(src, max_seconds: float = None):
+    """Decode an open audio file object to 16 kHz mono float32 by piping it through ffmpeg.
+
+    This is what ``whisper.load_audio`` does for a path, but fed from ``src``
+    in chunks so a spooled upload never has to be copied to a named file.
+    A small compressed upload can expand to hours of PCM, so decoding stops
+    and ClipTooLong is raised once the output passes ``max_seconds``.
+    Raises FileNotFoundError if ffmpeg is missing and RuntimeError if it
+    cannot decode the input.
+    """
+    import numpy as np
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", "pipe:0",
+           "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE,
+                                                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+    async def feed():
+        try:
+            while True:
+                chunk = await asyncio.to_thread(src.read, DECODE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg gave up on the input; its exit status reports why
+        finally:
+            proc.stdin.close()
+
+    max_bytes = int(max_seconds * SAMPLE_RATE) * 2 if max_seconds else None  # s16le: two bytes per sample
+
+    async def read_pcm():
+        out = bytearray()
+        while True:
+            chunk = await proc.stdout.read(DECODE_CHUNK_SIZE)
+            if not chunk:
+                return out
+            out += chunk
+            if max_bytes is not None and len(out) > max_bytes:
+                raise ClipTooLong(max_seconds)
+
+    tasks = [asyncio.ensure_future(step) for step in (feed(), read_pcm(), proc.stderr.read())]
+    try:
+        _, out, err = await asyncio.gather(*tasks)
+        await proc.wait()
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode audio: {err.decode(errors='ignore')[-300:]}")
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+class TranscriptionService:
+    """Queues clips and dispatches them to a warm worker pool, batching only under backlog."""
+
+    def __init__(self, model_name: str = "base", workers: int = 1, batch_size: int = 4,
+                 use_processes: bool = True, cpus: int = None):
+        self.model_name = model_name
+        self.cpus = cpus  # CPUs this service may use; less than the machine when several web workers share it
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.use_processes = use_processes
+        self._pool = None
+        self._queue = None
+        self._dispatchers = []
+        self._busy = 0  # Workers running a batch
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._batches = 0
+        self._latencies = collections.deque(maxlen=512)
+        self._queue_waits = collections.deque(maxlen=512)
+
+    def start(self):
+        if self._pool is not None:
+            return
+        self._pool = self._make_pool()
+        self._queue = asyncio.Queue()
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    def _make_pool(self):
+        cpus = self.cpus or os.cpu_count() or 1
+        init_args = (self.model_name, max(1, cpus // self.workers))
+        if self.use_processes:
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=init_args,
+            )
+        return ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="whisper",
+            initializer=_init_worker,
+            initargs=(self.model_name, 0),
+        )
+
+    async def close(self):
+        for task in self._dispatchers:
+            task.cancel()
+        self._dispatchers = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def transcribe(self, clip) -> dict:
+        """Transcribe an audio file path or decoded 16 kHz float32 array; returns Whisper's {"text": ...}."""
+        if self._pool is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((clip, future, time.perf_counter()))
+        return await future
+
+    async def _dispatch(self):
+        # One dispatcher per worker, each with at most one batch in the pool
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # A batch runs clip by clip on one worker, so only group clips no other worker is free to take
+            while len(batch) < self.batch_size and self._busy >= self.workers - 1 and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self._queue_waits.append(started - enqueued)
+            self._in_flight += len(batch)
+            self._busy += 1
+            self._batches += 1
+            pool = self._pool
+            try:
+                results = await loop.run_in_executor(
+                    pool, _transcribe_batch, self.model_name, [clip for clip, _, _ in batch]
+                )
+            except BrokenProcessPool as e:
+                # A worker died (e.g. OOM); replace the pool so later clips can proceed.
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = self._make_pool()
+                results = [(None, f"{type(e).__name__}: {e}", 0.0)] * len(batch)
+            except Exception as e:
+                results = [(None, f"{type(e).__name__}: {e}", 0.0)] * len(batch)
+            finally:
+                self._in_flight -= len(batch)
+                self._busy -= 1
+            for (_, future, _), (result, error, seconds) in zip(batch, results):
+                self._latencies.append(seconds)
+                if error is None:
+                    self._completed += 1
+                    if not future.done():
+                        future.set_result(result)
+                else:
+                    self._failed += 1
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"Transcription failed: {error}"))
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "workers": self.workers,
+            "mode": "process" if self.use_processes else "thread",
+            "running": self._pool is not None,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "failed": self._failed,
+            "batches": self._batches,
+            "clip_latency_seconds": _summarize(self._latencies),
+            "queue_wait_seconds": _summarize(self._queue_waits),
+        }
+
+
+def _summarize(samples) -> dict:
+    if not samples:
+        return {"count": 0, "avg": None, "p50": None, "p95": None, "max": None}
+    ordered = sorted(samples)
+    n = len(ordered)
+    return {
+        "count": n,
+        "avg": round(sum(ordered) / n, 4),
+        "p50": round(ordered[n // 2], 4),
+        "p95": round(ordered[min(n - 1, int(n * 0.95))], 4),
+        "max": round(ordered[-1], 4),
+    }
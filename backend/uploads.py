@@ -0,0 +1,81 @@
+"""Bounded-memory upload handling.
+
+``UploadLimitMiddleware`` caps request bodies per path. It rejects a request
+up front when Content-Length is already too large and otherwise counts bytes
+as they stream in, failing with 413 as soon as the cap is crossed instead of
+after the whole body has been spooled. ``copy_limited`` copies an upload in
+fixed-size chunks with a per-file cap.
+"""
+import json
+from fastapi import HTTPException
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+
+
+class UploadLimitMiddleware:
+    """Pure ASGI middleware enforcing a maximum request body size per path.
+
+    ``overhead`` is allowed on top of each limit for multipart framing and
+    form fields, so the limit reads as a file size.
+    """
+
+    def __init__(self, app, limits: dict, overhead: int = 64 * 1024):
+        self.app = app
+        self.limits = limits  # path -> max bytes
+        self.overhead = overhead
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        allowed = limit + self.overhead
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > allowed:
+                await self._reject(send, limit)
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > allowed:
+                    # Raised inside body parsing, so FastAPI turns it into a 413 response
+                    raise UploadTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({"error": UploadTooLarge(limit).detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def copy_limited(src, dst, max_bytes: int = None, on_chunk=None) -> int:
+    """Copy file object ``src`` to ``dst`` in chunks; raise UploadTooLarge past ``max_bytes``."""
+    size = 0
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            return size
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        if on_chunk is not None:
+            on_chunk(chunk)
+        dst.write(chunk)